@@ -14,3 +14,10 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Medicate.settings')
 
 application = get_asgi_application()
+
+# Build the prediction model at worker startup instead of on the first request
+from django.conf import settings  # noqa: E402
+
+if getattr(settings, 'PREDICTION_WARM_ON_STARTUP', False):
+    from prediction.registry import warm_model
+    warm_model()
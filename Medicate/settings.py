@@ -138,3 +138,54 @@ LOGOUT_REDIRECT_URL = 'home'
 
 # Email settings (for production)
 EMAIL_BACKEND = 'django.core.mail.backends.console.EmailBackend'
+
+# Disease prediction
+# Scoring engine used by predict_disease: 'index' (inverted index), 'bitset' (pure-Python bitsets),
+# 'matrix' (NumPy) or 'loop' (reference) score with the symptom-matching heuristic; 'bayes' is a
+# trained naive Bayes classifier (NumPy, weights from PREDICTION_BAYES_MODEL)
+PREDICTION_ENGINE = 'index'
+# Weights file written by `manage.py train_prediction_model` and loaded when the 'bayes' engine is
+# first used (e.g. BASE_DIR / 'prediction_bayes.npz'); None trains it from the disease profiles alone
+PREDICTION_BAYES_MODEL = None
+# Build the shared prediction model when the WSGI/ASGI app loads (with gunicorn --preload it is built once and shared by forked workers)
+PREDICTION_WARM_ON_STARTUP = False
+# Upper bound for the optional top_k (differential diagnosis) field of /prediction/predict/
+PREDICTION_MAX_TOP_K = 10
+# Seconds before a worker reloads its cached Disease rows and recommendation bundles
+# (saves/deletes in the same worker invalidate immediately)
+PREDICTION_CACHE_TTL = 300
+# Typed symptoms are matched to the vocabulary ignoring case and spacing, then through aliases
+# (prediction/data/symptom_aliases.json updated with this dict, e.g. {'tummy ache': 'stomach_pain'}),
+# then as a single typo (one insertion, deletion, substitution or transposition in one word of at least
+# PREDICTION_SYMPTOM_TYPO_MIN_LENGTH characters; 0 disables). Anything else stays an unknown symptom.
+PREDICTION_SYMPTOM_ALIASES = {}
+PREDICTION_SYMPTOM_TYPO_MIN_LENGTH = 5
+# Max symptoms returned by /prediction/symptoms/autocomplete/ (per-process prefix index over Symptom)
+PREDICTION_AUTOCOMPLETE_LIMIT = 20
+# Live scoring (/prediction/live/) while symptoms are toggled: per-session match counts kept in this
+# Django cache (use a shared one, e.g. Redis, with several workers), dropped after PREDICTION_LIVE_TTL
+# seconds without a toggle; PREDICTION_LIVE_TOP_K candidates are returned by default
+PREDICTION_LIVE_CACHE = 'default'
+PREDICTION_LIVE_TTL = 900
+PREDICTION_LIVE_TOP_K = 5
+# Chance that a patient's answer about one symptom disagrees with a disease's profile, used by
+# /prediction/next-question/ to rank the symptoms worth asking about next (0 < slip < 0.5; needs NumPy)
+PREDICTION_SYMPTOM_SLIP = 0.05
+# Max symptom combinations whose prediction is memoized per worker (LRU; 0 disables)
+PREDICTION_CACHE_SIZE = 1024
+# Seconds between knowledge-version checks per worker; a newer version is rebuilt in the background (0 disables)
+PREDICTION_KNOWLEDGE_CHECK_INTERVAL = 5
+# Micro-batching of prediction cache misses: requests arriving within this many milliseconds are
+# scored together in one engine call (0 disables). Worth it with threaded/ASGI workers and the
+# 'matrix' engine or an artifact; batch sizes and queueing delay are reported by /prediction/stats/
+PREDICTION_BATCH_WINDOW_MS = 0
+# A batch is scored as soon as this many requests are waiting, even before the window ends
+PREDICTION_BATCH_MAX_SIZE = 64
+# Serve /prediction/predict/ with the async view (async ORM, scoring on a thread pool); enable under
+# ASGI (Medicate.asgi). /prediction/predict/async/ always serves it
+PREDICTION_ASYNC_VIEW = False
+# Threads that score predictions for the async view; bounds the CPU work per worker process
+PREDICTION_ASYNC_WORKERS = 4
+# Compiled model file memory-mapped by every worker instead of building the engine in each
+# (e.g. BASE_DIR / 'prediction_model.bin'; write it with `manage.py build_prediction_model`). Needs NumPy.
+PREDICTION_MODEL_ARTIFACT = None
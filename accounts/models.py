@@ -1,3 +1,5 @@
+from datetime import date
+
 from django.db import models
 
 # Create your models here.
@@ -111,5 +113,14 @@ class PatientProfile(models.Model):
     
     def __str__(self):
         return f"{self.user.get_full_name()} - Patient"
+
+    @property
+    def age(self):
+        """Age in whole years today (0 when the date of birth is unknown)."""
+        dob = self.date_of_birth
+        if not dob:
+            return 0
+        today = date.today()
+        return today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
     
    
\ No newline at end of file
@@ -1,3 +1,23 @@
-from django.test import TestCase
+from datetime import date
+from unittest import mock
 
-# Create your tests here.
+from django.test import SimpleTestCase
+
+from .models import PatientProfile
+
+
+class FixedDate(date):
+    @classmethod
+    def today(cls):
+        return cls(2024, 6, 15)
+
+
+@mock.patch('accounts.models.date', FixedDate)
+class PatientAgeTests(SimpleTestCase):
+    def test_age_counts_whole_years(self):
+        for dob, age in ((date(1990, 6, 15), 34), (date(1990, 6, 16), 33), (date(2024, 1, 1), 0)):
+            with self.subTest(dob=dob):
+                self.assertEqual(PatientProfile(date_of_birth=dob).age, age)
+
+    def test_unknown_date_of_birth_is_zero(self):
+        self.assertEqual(PatientProfile(date_of_birth=None).age, 0)
@@ -1,3 +1,58 @@
+from datetime import date
+
 from django.test import TestCase
+from django.urls import reverse
+
+from accounts.models import DoctorProfile, PatientProfile, User
+from prediction.extraction import symptom_extractor
+from prediction.models import PredictionHistory
+
+from .models import Consultation
+
+
+class ConsultDoctorTests(TestCase):
+    def setUp(self):
+        symptom_extractor.invalidate()
+        doctor_user = User.objects.create_user(
+            username='doctor', email='doctor@example.com', password='pw', user_type='doctor', last_name='House'
+        )
+        self.doctor = DoctorProfile.objects.create(
+            user=doctor_user, specialization='other', qualification='md', registration_number='R1', address='-'
+        )
+        self.patient_user = User.objects.create_user(
+            username='patient', email='patient@example.com', password='pw', user_type='patient'
+        )
+        self.patient = PatientProfile.objects.create(
+            user=self.patient_user, date_of_birth=date(1990, 1, 1), gender='other', address='-',
+            emergency_contact='+123456789'
+        )
+        self.client.force_login(self.patient_user)
+
+    def request_consultation(self, complaint):
+        return self.client.post(
+            reverse('consultation:consult_doctor', args=[self.doctor.id]), {'chief_complaint': complaint}
+        )
+
+    def test_complaint_does_not_create_a_prediction(self):
+        self.request_consultation('Fever and chills since yesterday, no cough')
+        consultation = Consultation.objects.get()
+        self.assertIsNone(consultation.prediction)
+        self.assertFalse(PredictionHistory.objects.exists())
+
+    def test_view_lists_symptoms_mentioned_in_the_complaint(self):
+        self.request_consultation('Fever and chills since yesterday, no cough')
+        consultation = Consultation.objects.get()
+        response = self.client.get(reverse('consultation:consultation_view', args=[consultation.id]))
+        self.assertEqual(response.context['complaint_symptoms'], ['Fever', 'Chills'])
+        self.assertEqual(response.context['patient_age'], date.today().year - 1990)
 
-# Create your tests here.
+    def test_latest_prediction_is_attached_and_marked_consulted(self):
+        prediction = PredictionHistory.objects.create(
+            patient=self.patient, symptoms='["Fever"]', disease_name='Flu', confidence_score=50, patient_age=36
+        )
+        self.request_consultation('Still feverish')
+        consultation = Consultation.objects.get()
+        self.assertEqual(consultation.prediction, prediction)
+        prediction.refresh_from_db()
+        self.assertTrue(prediction.consulted_doctor)
+        self.assertEqual(PredictionHistory.objects.count(), 1)
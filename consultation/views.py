@@ -3,6 +3,7 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from django.db import transaction
 from django.utils import timezone
 import json
 
@@ -14,6 +15,7 @@ from .forms import (
     ConsultationUpdateForm,
 )
 from accounts.models import DoctorProfile, PatientProfile
+from prediction.extraction import symptom_extractor
 from prediction.models import PredictionHistory
 
 
@@ -64,11 +66,11 @@ def consult_doctor(request, doctor_id):
             consultation.doctor = doctor
             consultation.prediction = latest_prediction
             consultation.status = 'active'
-            consultation.save()
-
-            if latest_prediction:
-                latest_prediction.consulted_doctor = True
-                latest_prediction.save()
+            with transaction.atomic():
+                consultation.save()
+                if latest_prediction:
+                    latest_prediction.consulted_doctor = True
+                    latest_prediction.save(update_fields=['consulted_doctor'])
 
             messages.success(
                 request,
@@ -112,6 +114,10 @@ def consultation_view(request, consultation_id):
             prediction_symptoms = json.loads(consultation.prediction.symptoms)
         except Exception:
             prediction_symptoms = []
+    # No symptom check attached: show the symptoms the chief complaint mentions instead
+    complaint_symptoms = [] if consultation.prediction else [
+        symptom_extractor.label(name) for name in symptom_extractor.extract(consultation.chief_complaint)
+    ]
 
     is_patient = request.user == consultation.patient.user
     is_doctor = request.user == consultation.doctor.user
@@ -150,6 +156,11 @@ def consultation_view(request, consultation_id):
         'is_patient': is_patient,
         'is_doctor': is_doctor,
         'prediction_symptoms': prediction_symptoms,
+        'complaint_symptoms': complaint_symptoms,
+        'patient_age': (
+            consultation.prediction.patient_age if consultation.prediction
+            else consultation.patient.age
+        ),
         # patient can rate when they are the patient, consultation has no rating, and consultation is closed
         'can_rate': (
             is_patient and not hasattr(consultation, 'rating') and consultation.status == 'closed'
@@ -1,20 +1,38 @@
 from django.contrib import admin
 
-from .models import (Disease, Symptom, DiseasePrecaution, DiseaseDiet, 
+from .models import (Disease, Symptom, DiseaseSymptom, DiseasePrecaution, DiseaseDiet, 
                      DiseaseExercise, DiseaseMedicine, PredictionHistory,
-                     CustomSymptomSuggestion)
+                     CustomSymptomSuggestion, KnowledgeVersion)
+
+class DiseaseSymptomInline(admin.TabularInline):
+    model = DiseaseSymptom
+    autocomplete_fields = ['symptom']
+    extra = 1
 
 @admin.register(Disease)
 class DiseaseAdmin(admin.ModelAdmin):
     list_display = ['name', 'severity_level', 'specialist_required', 'created_at']
     list_filter = ['severity_level', 'specialist_required']
     search_fields = ['name', 'description']
+    inlines = [DiseaseSymptomInline]
 
 @admin.register(Symptom)
 class SymptomAdmin(admin.ModelAdmin):
     list_display = ['name']
     search_fields = ['name']
 
+@admin.register(DiseaseSymptom)
+class DiseaseSymptomAdmin(admin.ModelAdmin):
+    list_display = ['disease', 'symptom', 'weight']
+    list_filter = ['disease']
+    search_fields = ['disease__name', 'symptom__name']
+    autocomplete_fields = ['disease', 'symptom']
+
+@admin.register(KnowledgeVersion)
+class KnowledgeVersionAdmin(admin.ModelAdmin):
+    list_display = ['version', 'updated_at']
+    readonly_fields = ['version', 'updated_at']
+
 @admin.register(DiseasePrecaution)
 class DiseasePrecautionAdmin(admin.ModelAdmin):
     list_display = ['disease', 'priority', 'precaution']
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class PredictionConfig(AppConfig):
     name = 'prediction'
+
+    def ready(self):
+        from . import signals  # noqa: F401
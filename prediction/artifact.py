@@ -0,0 +1,216 @@
+"""
+On-disk compiled prediction model, opened with mmap.
+build_prediction_model writes the MatrixEngine arrays (symptom-major CSR
+incidence matrix, profile sizes/weights) plus the disease names and the
+sorted symptom vocabulary into one file. MappedEngine scores straight from
+the mapping: nothing is parsed on open, and every worker on the host shares
+the same physical pages through the page cache.
+
+Layout: MAGIC, then <format version, header length> as two little-endian
+uint32, a JSON header (knowledge version, sizes, array offsets) and the
+arrays, each 8-byte aligned.
+"""
+
+import json
+import mmap
+import os
+import struct
+import time
+
+from .engine import MatrixEngine, np
+
+MAGIC = b'AHCPRED\0'
+# Bump whenever the layout changes; files in another format are rebuilt
+FORMAT_VERSION = 1
+_PREAMBLE = struct.Struct('<II')
+_ALIGN = 8
+
+
+class ArtifactError(Exception):
+    """The file is missing, truncated or written by a different format version."""
+
+
+class StringTable:
+    """Read-only sequence of strings stored as UTF-8 bytes plus an offsets array; decodes on access."""
+
+    def __init__(self, offsets, blob):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self._bytes(i).decode('utf-8')
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self._bytes(i).decode('utf-8')
+
+    def _bytes(self, i):
+        return bytes(self.blob[int(self.offsets[i]):int(self.offsets[i + 1])])
+
+
+class SortedStringTable(StringTable):
+    """StringTable of sorted strings with dict-like get() (binary search); found ids are memoized."""
+
+    def __init__(self, offsets, blob):
+        super().__init__(offsets, blob)
+        self._found = {}
+
+    def get(self, name, default=None):
+        found = self._found.get(name)
+        if found is not None:
+            return found
+        key = name.encode('utf-8')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self) and self._bytes(lo) == key:
+            # Bounded by the vocabulary size
+            self._found[name] = lo
+            return lo
+        return default
+
+
+def _string_arrays(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def write_artifact(path, disease_symptom_map, weights=None, knowledge_version=0, source=''):
+    """
+    Compile the map into an artifact at path; returns its size in bytes.
+    The file is written next to path and renamed over it, so readers never see a partial file.
+    """
+    if np is None:
+        raise ImportError('Model artifacts require NumPy (pip install numpy).')
+    engine = MatrixEngine(disease_symptom_map, weights)
+    disease_offsets, disease_blob = _string_arrays(engine.diseases)
+    symptom_offsets, symptom_blob = _string_arrays(engine.symptom_ids)  # already in sorted order
+    arrays = {
+        'indptr': engine.indptr,
+        'indices': engine.indices,
+        'profile_sizes': engine.profile_sizes,
+        'disease_offsets': disease_offsets,
+        'disease_names': disease_blob,
+        'symptom_offsets': symptom_offsets,
+        'symptom_names': symptom_blob,
+    }
+    if engine.weighted:
+        arrays['data'] = engine.data
+        arrays['profile_weights'] = engine.profile_weights
+
+    # Offsets are relative to the end of the header, so the header can be sized after laying them out
+    layout = {}
+    position = 0
+    for name, array in arrays.items():
+        position = -(-position // _ALIGN) * _ALIGN
+        layout[name] = [position, array.dtype.str, int(array.size)]
+        position += array.nbytes
+    header = json.dumps({
+        'knowledge_version': knowledge_version,
+        'source': source,
+        'built_at': time.time(),
+        'diseases': len(engine.diseases),
+        'symptoms': len(engine.symptom_ids),
+        'weighted': engine.weighted,
+        'arrays': layout,
+    }).encode('utf-8')
+    data_start = -(-(len(MAGIC) + _PREAMBLE.size + len(header)) // _ALIGN) * _ALIGN
+
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(_PREAMBLE.pack(FORMAT_VERSION, len(header)))
+            f.write(header)
+            for name, array in arrays.items():
+                f.write(b'\0' * (data_start + layout[name][0] - f.tell()))
+                f.write(np.ascontiguousarray(array).tobytes())
+            size = f.tell()
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return size
+
+
+def _read_preamble(buffer):
+    if len(buffer) < len(MAGIC) + _PREAMBLE.size or buffer[:len(MAGIC)] != MAGIC:
+        raise ArtifactError('Not a prediction model artifact.')
+    format_version, header_length = _PREAMBLE.unpack_from(buffer, len(MAGIC))
+    if format_version != FORMAT_VERSION:
+        raise ArtifactError(f'Artifact format {format_version}, expected {FORMAT_VERSION}.')
+    return header_length
+
+
+def read_header(path):
+    """Read only the artifact header (no mapping); raises ArtifactError if it is not a current artifact."""
+    try:
+        with open(path, 'rb') as f:
+            header_length = _read_preamble(f.read(len(MAGIC) + _PREAMBLE.size))
+            return json.loads(f.read(header_length))
+    except FileNotFoundError:
+        raise ArtifactError(f'No artifact at {path}.') from None
+    except ValueError as exc:
+        raise ArtifactError(f'Corrupt artifact header: {exc}') from None
+
+
+class MappedEngine(MatrixEngine):
+    """MatrixEngine whose arrays and names are read-only views of a memory-mapped artifact."""
+
+    def __init__(self, path):
+        if np is None:
+            raise ImportError('Model artifacts require NumPy (pip install numpy).')
+        self.path = os.fspath(path)
+        try:
+            with open(self.path, 'rb') as f:
+                # The mapping outlives the file object; it is released with the last array viewing it
+                buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except FileNotFoundError:
+            raise ArtifactError(f'No artifact at {self.path}.') from None
+        except ValueError:  # empty file
+            raise ArtifactError(f'Empty artifact at {self.path}.') from None
+        header_length = _read_preamble(buffer)
+        header_start = len(MAGIC) + _PREAMBLE.size
+        try:
+            self.header = json.loads(buffer[header_start:header_start + header_length])
+        except ValueError as exc:
+            raise ArtifactError(f'Corrupt artifact header: {exc}') from None
+        data_start = -(-(header_start + header_length) // _ALIGN) * _ALIGN
+        self.size = len(buffer)
+
+        # A header that is valid JSON can still lack a field or hold one of the wrong type
+        try:
+            arrays = {}
+            for name, (offset, dtype, count) in self.header['arrays'].items():
+                dtype = np.dtype(dtype)
+                if offset < 0 or count < 0 or data_start + offset + count * dtype.itemsize > self.size:
+                    raise ArtifactError(f'Truncated artifact at {self.path}.')
+                arrays[name] = np.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + offset)
+
+            self.knowledge_version = int(self.header['knowledge_version'])
+            self.source = str(self.header['source'])
+            self.weighted = bool(self.header['weighted'])
+            self.indptr = arrays['indptr']
+            self.indices = arrays['indices']
+            self.profile_sizes = arrays['profile_sizes']
+            self.data = arrays['data'] if self.weighted else None
+            self.profile_weights = arrays['profile_weights'] if self.weighted else None
+            self.diseases = StringTable(arrays['disease_offsets'], arrays['disease_names'])
+            self.symptom_ids = SortedStringTable(arrays['symptom_offsets'], arrays['symptom_names'])
+        except (KeyError, TypeError, ValueError, AttributeError) as exc:
+            raise ArtifactError(f'Corrupt artifact header: {exc!r}') from None
+        self._disease_ids = None
@@ -0,0 +1,115 @@
+"""
+Symptom autocomplete served from a per-process prefix index.
+The Symptom table is loaded once into sorted arrays of casefolded keys and
+searched with bisect, so a lookup costs O(log n + results) and never touches
+the database. Signal handlers in prediction.signals drop the index when a
+Symptom is saved or deleted; other workers pick up changes after
+settings.PREDICTION_CACHE_TTL seconds, like the other prediction caches.
+"""
+
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+from django.utils.text import Truncator
+
+from .models import Symptom
+
+_WORD_BOUNDARY = re.compile(r'[\s_/-]+')
+
+
+def search_key(text):
+    """Casefolded form used for matching; underscores count as spaces ('chest_pain' ~ 'Chest pain')."""
+    return ' '.join(_WORD_BOUNDARY.split(text.casefold())).strip()
+
+
+class SymptomPrefixIndex:
+    """
+    Sorted symptom names searchable by prefix.
+    Names that start with the prefix come first (alphabetically), then names with a later
+    word starting with it ('pain' finds 'Chest Pain').
+    """
+
+    def __init__(self, symptoms):
+        """symptoms: iterable of (name, description)."""
+        rows = sorted(symptoms, key=lambda row: (search_key(row[0]), row[0]))
+        self.names = tuple(name for name, _ in rows)
+        self.descriptions = tuple(description for _, description in rows)
+        self.name_keys = [search_key(name) for name in self.names]
+        word_entries = []
+        for symptom_id, key in enumerate(self.name_keys):
+            for match in re.finditer(r' ', key):
+                word_entries.append((key[match.end():], symptom_id))
+        word_entries.sort()
+        self.word_keys = [key for key, _ in word_entries]
+        self.word_ids = [symptom_id for _, symptom_id in word_entries]
+
+    def __len__(self):
+        return len(self.names)
+
+    def search(self, prefix, limit):
+        """Return up to limit (name, description) pairs; an empty prefix lists the first names."""
+        prefix = search_key(prefix)
+        found = []
+        seen = set()
+        for keys, ids in ((self.name_keys, None), (self.word_keys, self.word_ids)):
+            i = bisect_left(keys, prefix)
+            while i < len(keys) and len(found) < limit and keys[i].startswith(prefix):
+                symptom_id = i if ids is None else ids[i]
+                if symptom_id not in seen:
+                    seen.add(symptom_id)
+                    found.append(symptom_id)
+                i += 1
+            if not prefix:
+                break
+        return [(self.names[i], self.descriptions[i]) for i in found]
+
+
+class SymptomAutocomplete:
+    """Per-process SymptomPrefixIndex over the Symptom table, rebuilt on the next lookup after invalidate()."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._index = None
+        self._loaded_at = 0.0
+        self.loads = 0
+        self.lookups = 0
+
+    def search(self, prefix, limit):
+        self.lookups += 1
+        return self._get().search(prefix, limit)
+
+    def count(self):
+        return len(self._get())
+
+    def invalidate(self):
+        self._index = None
+
+    def stats(self):
+        index = self._index
+        return {
+            'symptoms': len(index) if index is not None else 0,
+            'lookups': self.lookups,
+            'loads': self.loads,
+        }
+
+    def _get(self):
+        index = self._index
+        ttl = getattr(settings, 'PREDICTION_CACHE_TTL', 300)
+        if index is None or (ttl and time.monotonic() - self._loaded_at > ttl):
+            with self._lock:
+                if self._index is index:
+                    # Descriptions are shortened once here, as the page shows them
+                    self._index = SymptomPrefixIndex(
+                        (name, Truncator(description).words(15))
+                        for name, description in Symptom.objects.values_list('name', 'description')
+                    )
+                    self._loaded_at = time.monotonic()
+                    self.loads += 1
+                index = self._index
+        return index
+
+
+symptom_autocomplete = SymptomAutocomplete()
@@ -0,0 +1,156 @@
+"""
+Optional micro-batching of prediction engine calls.
+With settings.PREDICTION_BATCH_WINDOW_MS > 0, a cache miss in
+DiseasePredictionModel.predict is queued instead of scored in the request
+thread. One background thread per process collects the requests that arrive
+within the window (or until PREDICTION_BATCH_MAX_SIZE are waiting), scores
+them with one batched engine call and hands every caller its result through a
+concurrent.futures.Future. This trades up to one window of latency for fewer,
+larger engine calls; it pays off with the vectorized engines ('matrix', the
+artifact) under threaded WSGI or ASGI workers, not with one request at a time.
+"""
+
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+# Queueing delays kept for the percentiles in stats()
+DELAY_SAMPLES = 4096
+
+_lock = threading.Lock()
+_batcher = None
+
+
+class MicroBatcher:
+    """Collects (model, symptoms_set, top_k) requests and scores them in batches on a daemon thread."""
+
+    def __init__(self, window_seconds, max_size):
+        self.window = window_seconds
+        self.max_size = max(1, max_size)
+        self._queue = queue.SimpleQueue()
+        self._stats_lock = threading.Lock()
+        self.requests = 0
+        self.batches = 0
+        self.errors = 0
+        self.batch_sizes = Counter()
+        self.score_seconds = 0.0
+        self._delays = deque(maxlen=DELAY_SAMPLES)
+        self._thread = threading.Thread(target=self._run, name='prediction-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, model, symptoms_set, top_k):
+        """Queue one request; the future resolves to what model._score(symptoms_set, top_k) would return."""
+        future = Future()
+        self._queue.put((model, symptoms_set, top_k, future, time.perf_counter()))
+        return future
+
+    def score(self, model, symptoms_set, top_k):
+        return self.submit(model, symptoms_set, top_k).result()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = batch[0][4] + self.window
+            while len(batch) < self.max_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        started = time.perf_counter()
+        # Usually one group: a knowledge swap can leave requests for the old model in the queue
+        groups = {}
+        for item in batch:
+            groups.setdefault((id(item[0]), item[2]), []).append(item)
+        for items in groups.values():
+            model, _, top_k, _, _ = items[0]
+            try:
+                results = model._score_many([item[1] for item in items], top_k)
+            except Exception as exc:
+                logger.exception('Batched prediction scoring failed.')
+                with self._stats_lock:
+                    self.errors += 1
+                for item in items:
+                    item[3].set_exception(exc)
+                continue
+            for item, result in zip(items, results):
+                item[3].set_result(result)
+        finished = time.perf_counter()
+        with self._stats_lock:
+            self.requests += len(batch)
+            self.batches += 1
+            self.batch_sizes[len(batch)] += 1
+            self.score_seconds += finished - started
+            self._delays.extend(started - item[4] for item in batch)
+
+    def stats(self):
+        with self._stats_lock:
+            delays = sorted(self._delays)
+            sizes = dict(sorted(self.batch_sizes.items()))
+            stats = {
+                'window_ms': self.window * 1e3,
+                'max_size': self.max_size,
+                'requests': self.requests,
+                'batches': self.batches,
+                'errors': self.errors,
+                'mean_batch_size': round(self.requests / self.batches, 2) if self.batches else None,
+                'batch_sizes': sizes,
+                'mean_score_us': round(self.score_seconds / self.batches * 1e6, 1) if self.batches else None,
+                'pending': self._queue.qsize(),
+            }
+        if delays:
+            def percentile(p):
+                return round(delays[min(len(delays) - 1, int(len(delays) * p / 100))] * 1e6, 1)
+            stats['queue_delay_us'] = {
+                'samples': len(delays),
+                'mean': round(sum(delays) / len(delays) * 1e6, 1),
+                'p50': percentile(50),
+                'p95': percentile(95),
+                'p99': percentile(99),
+                'max': round(delays[-1] * 1e6, 1),
+            }
+        return stats
+
+
+def get_batcher():
+    """The process-wide MicroBatcher, or None while settings.PREDICTION_BATCH_WINDOW_MS is 0."""
+    window_ms = getattr(settings, 'PREDICTION_BATCH_WINDOW_MS', 0)
+    if not window_ms or window_ms <= 0:
+        return None
+    batcher = _batcher
+    if batcher is None:
+        batcher = _start(window_ms)
+    return batcher
+
+
+def _start(window_ms):
+    global _batcher
+    with _lock:
+        if _batcher is None:
+            _batcher = MicroBatcher(window_ms / 1e3, getattr(settings, 'PREDICTION_BATCH_MAX_SIZE', 64))
+        return _batcher
+
+
+def reset_batcher():
+    """Retire the current batcher (its thread drains and idles); the next request starts one with current settings."""
+    global _batcher
+    with _lock:
+        _batcher = None
+
+
+def batcher_stats():
+    """Batch sizes and queueing delay of this process's batcher (empty while batching is off)."""
+    batcher = _batcher
+    return batcher.stats() if batcher is not None else {}
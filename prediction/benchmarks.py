@@ -0,0 +1,133 @@
+"""
+Synthetic workloads for benchmarking the prediction engines.
+Catalogs and queries are generated from a seed so runs are reproducible
+and can be compared between releases. The measuring helpers return plain
+dicts so bench_prediction can print them or dump them as JSON.
+"""
+
+import random
+import time
+import tracemalloc
+
+
+def synthetic_catalog(n_diseases, n_symptoms=2000, symptoms_per_disease=20, seed=0):
+    """
+    Build a {disease: [symptoms]} map shaped like DISEASE_SYMPTOM_MAP.
+    Symptom popularity is skewed so some symptoms are shared by many diseases.
+    """
+    rng = random.Random(seed)
+    vocabulary = [f'symptom_{i}' for i in range(n_symptoms)]
+    weights = [1.0 / (i + 1) ** 0.5 for i in range(n_symptoms)]
+    catalog = {}
+    for i in range(n_diseases):
+        size = max(1, min(n_symptoms, int(rng.gauss(symptoms_per_disease, symptoms_per_disease / 4))))
+        profile = set()
+        while len(profile) < size:
+            profile.update(rng.choices(vocabulary, weights=weights, k=size - len(profile)))
+        catalog[f'Disease {i}'] = sorted(profile)
+    return catalog
+
+
+def synthetic_queries(catalog, n_queries=1000, selected=(2, 6), seed=1):
+    """
+    Draw symptom selections for a catalog: mostly from one disease's profile,
+    with an occasional unrelated symptom mixed in, like real patient input.
+    """
+    rng = random.Random(seed)
+    profiles = list(catalog.values())
+    vocabulary = sorted({s for profile in profiles for s in profile})
+    queries = []
+    for _ in range(n_queries):
+        profile = rng.choice(profiles)
+        k = rng.randint(*selected)
+        query = rng.sample(profile, min(k, len(profile)))
+        if rng.random() < 0.3:
+            query.append(rng.choice(vocabulary))
+        queries.append(query)
+    return queries
+
+
+def time_per_call(func, items, repeat=3):
+    """Best-of-`repeat` mean seconds per item for func(item)."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for item in items:
+            func(item)
+        best = min(best, time.perf_counter() - start)
+    return best / max(1, len(items))
+
+
+def time_batch(func, items, repeat=3):
+    """Best-of-`repeat` mean seconds per item for one func(items) call."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(items)
+        best = min(best, time.perf_counter() - start)
+    return best / max(1, len(items))
+
+
+def latency_stats(samples_ns):
+    """Summarize per-call latencies (nanoseconds): mean and p50/p95/p99/max in µs, calls per second."""
+    if not samples_ns:
+        return {'calls': 0}
+    ordered = sorted(samples_ns)
+    total = sum(ordered)
+
+    def percentile(q):
+        # Nearest-rank percentile
+        return ordered[min(len(ordered) - 1, max(0, -(-len(ordered) * q // 100) - 1))] / 1e3
+
+    return {
+        'calls': len(ordered),
+        'mean_us': round(total / len(ordered) / 1e3, 3),
+        'p50_us': round(percentile(50), 3),
+        'p95_us': round(percentile(95), 3),
+        'p99_us': round(percentile(99), 3),
+        'max_us': round(ordered[-1] / 1e3, 3),
+        'throughput_per_s': round(len(ordered) / (total / 1e9), 1) if total else None,
+    }
+
+
+def time_calls(func, items, warmup=10, before=None):
+    """
+    Call func(item) for every item and return the per-call latencies in nanoseconds.
+    The first `warmup` items are run untimed first; before(item), if given, runs untimed before each call.
+    """
+    for item in items[:warmup]:
+        if before:
+            before(item)
+        func(item)
+    clock = time.perf_counter_ns
+    samples = []
+    for item in items:
+        if before:
+            before(item)
+        start = clock()
+        func(item)
+        samples.append(clock() - start)
+    return samples
+
+
+def measure_allocations(func, items):
+    """
+    Run func(item) over items under tracemalloc: peak bytes allocated on top of what was
+    live before, and bytes still held afterwards (caches, leaks).
+    """
+    start_tracing = not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        for item in items:
+            func(item)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        if start_tracing:
+            tracemalloc.stop()
+    return {
+        'peak_bytes': peak - before,
+        'retained_bytes': current - before,
+    }
@@ -0,0 +1,320 @@
+"""
+In-process caches for the prediction hot path.
+Each worker keeps its own copy; signal handlers in prediction.signals
+invalidate them when the underlying rows change.
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from .models import Disease
+
+logger = logging.getLogger(__name__)
+
+
+class PredictionLRU:
+    """
+    Bounded LRU of engine results keyed by (frozenset of normalized symptoms, top_k).
+    Values hold only plain data (no ORM objects). A maxsize of 0 disables caching.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'evictions': self.evictions,
+        }
+
+
+class DiseaseCache:
+    """
+    Disease rows keyed by canonical (casefolded) name, loaded in one query.
+    The whole table is reloaded on the next lookup after invalidate() or
+    once settings.PREDICTION_CACHE_TTL seconds have passed, which
+    bounds staleness in workers that did not see the save/delete signal.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rows = None
+        self._loaded_at = 0.0
+        # Counters are approximate under concurrent threads; they are for sizing only
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def get(self, name):
+        """Return the Disease named `name` (case-insensitive) or None, without a query in the steady state."""
+        if not name or not isinstance(name, str):
+            return None
+        disease = self._table().get(name.strip().casefold())
+        if disease is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return disease
+
+    async def aget(self, name):
+        """get() for async views; a (re)load of the table runs in a thread, deduplicated by the lock."""
+        if self._stale():
+            await sync_to_async(self._table)()
+        return self.get(name)
+
+    def invalidate(self):
+        self._rows = None
+
+    def stats(self):
+        rows = self._rows
+        lookups = self.hits + self.misses
+        return {
+            'rows': len(rows) if rows is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'loads': self.loads,
+        }
+
+    def _stale(self):
+        ttl = getattr(settings, 'PREDICTION_CACHE_TTL', 300)
+        return self._rows is None or bool(ttl and time.monotonic() - self._loaded_at > ttl)
+
+    def _table(self):
+        rows = self._rows
+        if self._stale():
+            with self._lock:
+                if self._rows is rows:
+                    self._rows = {d.name.casefold(): d for d in Disease.objects.all()}
+                    self._loaded_at = time.monotonic()
+                    self.loads += 1
+                rows = self._rows
+        return rows
+
+
+disease_cache = DiseaseCache()
+
+
+class RecommendationCache:
+    """
+    Serialized recommendation bundles (precautions, diet, exercises, medicines) keyed by disease id.
+    The first lookup loads every disease's bundle with one prefetching queryset;
+    afterwards a bundle is only reloaded when one of its rows changes
+    (invalidate(disease_id)) or after settings.PREDICTION_CACHE_TTL seconds.
+    A TTL reload runs in one background thread while requests keep reading the
+    previous bundles, so no request waits for the full table.
+    Returned bundles are shared between requests and must not be mutated.
+    """
+
+    relations = ('precautions', 'diet_recommendations', 'exercises', 'medicines')
+
+    def __init__(self):
+        # _lock guards swapping self._bundles; _reload_lock admits one full-table loader
+        self._lock = threading.Lock()
+        self._reload_lock = threading.Lock()
+        self._bundles = None
+        self._loaded_at = 0.0
+        # Disease ids invalidated while a full reload runs (True: all of them); None when idle
+        self._invalidated = None
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    def get(self, disease):
+        """Return the recommendation bundle for a Disease instance."""
+        bundles = self._bundles
+        if bundles is None:
+            bundles = self._load_all()
+        elif self._stale() and self._reload_lock.acquire(blocking=False):
+            threading.Thread(target=self._reload_in_background, name='recommendation-reload', daemon=True).start()
+        bundle = bundles.get(disease.pk)
+        if bundle is None:
+            self.misses += 1
+            bundle = self._load(Disease.objects.filter(pk=disease.pk)).get(disease.pk)
+            if bundle is None:
+                bundle = serialize_recommendations(disease)
+        else:
+            self.hits += 1
+        return bundle
+
+    async def aget(self, disease):
+        """get() for async views; only a cache miss or the first load leaves the event loop (for a thread)."""
+        bundles = self._bundles
+        if bundles is not None and disease.pk in bundles:
+            return self.get(disease)
+        return await sync_to_async(self.get)(disease)
+
+    def _stale(self):
+        ttl = getattr(settings, 'PREDICTION_CACHE_TTL', 300)
+        return self._bundles is None or bool(ttl and time.monotonic() - self._loaded_at > ttl)
+
+    def invalidate(self, disease_id=None):
+        """Drop one disease's bundle, or every bundle when disease_id is None."""
+        with self._lock:
+            if self._invalidated is not None:
+                # A full reload in flight may have read the old rows: it must not keep them
+                if disease_id is None:
+                    self._invalidated = True
+                elif self._invalidated is not True:
+                    self._invalidated.add(disease_id)
+            if disease_id is None:
+                self._bundles = None
+                return
+            bundles = self._bundles
+            if bundles is not None and disease_id in bundles:
+                # Copy-on-write so concurrent readers never see a dict changing size
+                bundles = dict(bundles)
+                del bundles[disease_id]
+                self._bundles = bundles
+
+    def stats(self):
+        bundles = self._bundles
+        lookups = self.hits + self.misses
+        return {
+            'bundles': len(bundles) if bundles is not None else 0,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': round(self.hits / lookups, 4) if lookups else None,
+            'loads': self.loads,
+        }
+
+    def _load_all(self):
+        """First load (or after invalidate()): one thread loads the table, the others wait for it."""
+        with self._reload_lock:
+            bundles = self._bundles
+            if bundles is None:
+                bundles = self._reload()
+        return bundles if bundles is not None else {}
+
+    def _reload_in_background(self):
+        try:
+            if self._stale():
+                self._reload()
+        except Exception:
+            logger.exception('Reloading recommendation bundles failed; keeping the current ones.')
+        finally:
+            self._reload_lock.release()
+            # This thread opened its own database connection
+            connections.close_all()
+
+    def _reload(self):
+        """Replace every bundle; called with _reload_lock held."""
+        with self._lock:
+            self._invalidated = set()
+        loaded = self._serialize(Disease.objects.all())
+        with self._lock:
+            invalidated, self._invalidated = self._invalidated, None
+            if invalidated is True:
+                # Everything changed during the load; the next lookup loads again
+                self._bundles = None
+                return None
+            for disease_id in invalidated:
+                loaded.pop(disease_id, None)
+            self._bundles = loaded
+            self._loaded_at = time.monotonic()
+            self.loads += 1
+        return loaded
+
+    def _load(self, queryset):
+        """Add the bundles of the diseases in queryset."""
+        loaded = self._serialize(queryset)
+        with self._lock:
+            bundles = {**(self._bundles or {}), **loaded}
+            self._bundles = bundles
+        return bundles
+
+    def _serialize(self, queryset):
+        return {
+            disease.pk: serialize_recommendations(disease)
+            for disease in queryset.prefetch_related(*self.relations)
+        }
+
+
+def serialize_recommendations(disease):
+    """
+    Build the recommendations dict for a Disease; uses prefetched relations when present.
+    Returns: {
+        'precautions': [...],
+        'diet': {'recommended': [...], 'avoid': [...]},
+        'exercises': [...],
+        'medicines': [...]
+    }
+    """
+    diet = list(disease.diet_recommendations.all())
+    return {
+        'precautions': [p.precaution for p in disease.precautions.all()],
+        'diet': {
+            'recommended': [
+                {'food_item': d.food_item, 'description': d.description}
+                for d in diet if d.is_recommended
+            ],
+            'avoid': [
+                {'food_item': d.food_item, 'description': d.description}
+                for d in diet if not d.is_recommended
+            ],
+        },
+        'exercises': [
+            {
+                'exercise_name': ex.exercise_name,
+                'description': ex.description,
+                'duration': ex.duration,
+                'intensity': ex.intensity,
+            }
+            for ex in disease.exercises.all()
+        ],
+        # Top 5 medicines (ordered by priority)
+        'medicines': [
+            {
+                'medicine_name': m.medicine_name,
+                'generic_name': m.generic_name,
+                'dosage': m.dosage,
+                'description': m.description,
+                'side_effects': m.side_effects,
+            }
+            for m in list(disease.medicines.all())[:5]
+        ],
+    }
+
+
+recommendation_cache = RecommendationCache()
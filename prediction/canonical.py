@@ -0,0 +1,182 @@
+"""
+Typo-tolerant canonicalization of user-typed symptom names.
+A SymptomCanonicalizer maps free-typed terms ('head ache', 'Headahce',
+'throwing up') to the engine's normalized symptom names ('headache',
+'vomiting') in three steps:
+1. exact match ignoring case, spaces, underscores and punctuation;
+2. the alias table (data/symptom_aliases.json plus settings.PREDICTION_SYMPTOM_ALIASES);
+3. a single typo: the term has the same words as exactly one vocabulary entry or
+   alias except for one word, at least min_typo_length characters long, that is
+   one insertion, deletion, substitution or transposition away.
+Anything else stays unresolved rather than snapping to the nearest symptom:
+'back pain' is not 'neck pain', 'chest' is not 'chest pain', and a term with a
+negation ('no fever') or an antonym of the candidate's words ('weight gain' vs
+'weight loss') is never corrected. Typo candidates come from a deletion
+index (every entry with one character deleted from one word), so a lookup is a
+few dict probes. Resolved terms are memoized. Like the engines, this module does
+not touch the database; DiseasePredictionModel builds one canonicalizer per
+model and shares it between threads.
+"""
+
+import json
+import re
+from pathlib import Path
+from types import MappingProxyType
+
+from .engine import normalize_symptom
+
+ALIASES_PATH = Path(__file__).resolve().parent / 'data' / 'symptom_aliases.json'
+
+# Default minimum length of the misspelled word in a typo match (0 disables typo matching)
+MIN_TYPO_LENGTH = 5
+
+# Resolved terms kept per canonicalizer; the memo is cleared when it fills up
+MEMO_SIZE = 8192
+
+# Words that negate a symptom; a term containing one is never typo-corrected
+NEGATIONS = frozenset(('no', 'not', 'without', 'denies', 'deny', 'denied', 'never', 'nor', 'negative'))
+
+# Word pairs with opposite meanings; a typo match may not swap one for the other
+ANTONYMS = (
+    ('gain', 'loss'), ('increased', 'decreased'), ('increase', 'decrease'), ('high', 'low'),
+    ('more', 'less'), ('excessive', 'reduced'), ('upper', 'lower'), ('left', 'right'),
+    ('hot', 'cold'), ('fast', 'slow'), ('dry', 'wet'),
+)
+_OPPOSITES = {a: b for a, b in ANTONYMS} | {b: a for a, b in ANTONYMS}
+
+_NON_WORD = re.compile(r'[\W_]+')
+_builtin_aliases = None
+
+
+def builtin_aliases():
+    """The shipped alias table {alias: normalized symptom}, loaded once."""
+    global _builtin_aliases
+    aliases = _builtin_aliases
+    if aliases is None:
+        with open(ALIASES_PATH, encoding='utf-8') as f:
+            aliases = _builtin_aliases = MappingProxyType(json.load(f))
+    return aliases
+
+
+def match_key(term):
+    """Casefolded term without spaces, underscores or punctuation ('Head-ache' -> 'headache')."""
+    return _NON_WORD.sub('', term.casefold())
+
+
+def match_words(term):
+    """Casefolded words of term ('Chest_pain' -> ('chest', 'pain'))."""
+    return tuple(word for word in _NON_WORD.split(term.casefold()) if word)
+
+
+def deletions(word):
+    """word and every string made by deleting one of its characters."""
+    return {word} | {word[:i] + word[i + 1:] for i in range(len(word))}
+
+
+def is_single_edit(a, b):
+    """True when a and b differ by exactly one insertion, deletion, substitution or adjacent transposition."""
+    if a == b or abs(len(a) - len(b)) > 1:
+        return False
+    i = 0
+    while i < min(len(a), len(b)) and a[i] == b[i]:
+        i += 1
+    if len(a) == len(b):
+        return a[i + 1:] == b[i + 1:] or (a[i + 2:] == b[i + 2:] and a[i:i + 2] == b[i:i + 2][::-1])
+    return a[i + 1:] == b[i:] if len(a) > len(b) else a[i:] == b[i + 1:]
+
+
+class SymptomCanonicalizer:
+    """Resolves typed symptom names to names in vocabulary (an iterable of normalized symptoms)."""
+
+    def __init__(self, vocabulary, aliases=None, min_typo_length=MIN_TYPO_LENGTH):
+        self.vocabulary = frozenset(vocabulary)
+        self.min_typo_length = min_typo_length
+        # match key -> canonical name; the vocabulary wins over aliases with the same key
+        exact = {}
+        words = {}
+        for alias, target in (aliases or {}).items():
+            target = normalize_symptom(target)
+            if target in self.vocabulary:
+                exact[match_key(alias)] = target
+                words[match_words(alias)] = target
+        for name in sorted(self.vocabulary):
+            exact[match_key(name)] = name
+            words[match_words(name)] = name
+        exact.pop('', None)
+        words.pop((), None)
+        self.exact = exact
+
+        # Deletion index: (position, words with that word replaced by one of its deletions) -> entries
+        self.entries = list(words.items())
+        index = {}
+        if min_typo_length:
+            for entry_id, (entry_words, _) in enumerate(self.entries):
+                for position, word in enumerate(entry_words):
+                    # The typed word is at least min_typo_length long, so it is within one of this one
+                    if len(word) + 1 < min_typo_length:
+                        continue
+                    for variant in deletions(word):
+                        key = (position, entry_words[:position] + (variant,) + entry_words[position + 1:])
+                        index.setdefault(key, []).append(entry_id)
+        self.typo_index = index
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.vocabulary)
+
+    def lookup(self, term):
+        """(canonical name, edits) for a typed term: 0 edits for exact and alias matches, 1 for a typo; (None, None) otherwise."""
+        key = match_key(term)
+        result = self._memo.get(key)
+        if result is None:
+            result = self._resolve(key, term)
+            if len(self._memo) >= MEMO_SIZE:
+                self._memo.clear()
+            self._memo[key] = result
+        return result
+
+    def canonicalize(self, term):
+        """Canonical name for term, or None."""
+        return self.lookup(term)[0]
+
+    def canonicalize_all(self, terms):
+        """
+        Frozenset of canonical names for the typed terms. Terms that resolve to nothing
+        are kept in their plain normalized form, so they still count as symptoms the
+        patient has but no disease explains.
+        """
+        resolved = set()
+        for term in terms:
+            name = self.canonicalize(term)
+            resolved.add(name if name is not None else normalize_symptom(term))
+        resolved.discard('')
+        return frozenset(resolved)
+
+    def _resolve(self, key, term):
+        if not key:
+            return None, None
+        name = self.exact.get(key)
+        if name is not None:
+            return name, 0
+        if not self.min_typo_length:
+            return None, None
+
+        words = match_words(term)
+        if NEGATIONS.intersection(words):
+            return None, None
+        targets = set()
+        for position, word in enumerate(words):
+            if len(word) < self.min_typo_length:
+                continue
+            for variant in deletions(word):
+                for entry_id in self.typo_index.get((position, words[:position] + (variant,) + words[position + 1:]), ()):
+                    entry_words, target = self.entries[entry_id]
+                    if not is_single_edit(word, entry_words[position]):
+                        continue
+                    if any(_OPPOSITES.get(w) in entry_words for w in words):
+                        continue
+                    targets.add(target)
+        # Two different symptoms one typo away: too ambiguous to pick one
+        if len(targets) != 1:
+            return None, None
+        return targets.pop(), 1
@@ -0,0 +1,754 @@
+"""
+Compiled scoring structures for the disease prediction model.
+The disease–symptom map is compiled once into lookup tables so a prediction
+only touches the diseases that share at least one symptom with the input.
+
+Every engine takes the map plus optional symptom weights
+({disease: {symptom: weight}}); without weights all symptoms count 1.
+"""
+
+import heapq
+import json
+import os
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; only MatrixEngine and NaiveBayesEngine need it
+    np = None
+
+
+def normalize_symptom(name):
+    """Normalize a symptom name the way DISEASE_SYMPTOM_MAP stores it (e.g. 'Chest pain' -> 'chest_pain')."""
+    return name.lower().strip().replace(' ', '_')
+
+
+def score_match(match_count, n_disease, n_user, matched_weight=None):
+    """
+    Weighted score for one disease:
+    - 55% specificity (matched / disease symptoms) + 45% coverage (matched / user symptoms), scaled to 0–100.
+    - Slight boost for 3+ and 4+ matches (more evidence).
+    - Single-symptom matches are penalized so they appear as low-confidence.
+    With symptom weights, n_disease is the profile's total weight and
+    specificity uses matched_weight instead of match_count.
+    """
+    matched = match_count if matched_weight is None else matched_weight
+    specificity = matched / n_disease if n_disease else 0
+    coverage = match_count / n_user if n_user else 0
+    score = (0.55 * specificity + 0.45 * coverage) * 100
+    if match_count >= 4:
+        score = min(99, score + 8)
+    elif match_count >= 3:
+        score = min(99, score + 4)
+
+    if match_count == 1:
+        # Scale down strongly but keep a small minimum confidence (5%)
+        score = max(5.0, score * 0.35)
+    return score
+
+
+class SymptomIndex:
+    """
+    Inverted index compiled from a {disease: [symptoms]} map.
+    Diseases are numbered in map order; each symptom points to the ids of the
+    diseases that list it, and each disease's profile size is precomputed.
+    """
+
+    def __init__(self, disease_symptom_map, weights=None):
+        self.diseases = tuple(disease_symptom_map)
+        self.weighted = bool(weights)
+        postings = {}
+        posting_weights = {}
+        sizes = []
+        totals = []
+        for disease_id, (disease_name, disease_symptoms) in enumerate(disease_symptom_map.items()):
+            profile = set(disease_symptoms)
+            disease_weights = weights.get(disease_name, {}) if weights else {}
+            sizes.append(len(profile))
+            totals.append(sum(disease_weights.get(symptom, 1.0) for symptom in profile))
+            for symptom in profile:
+                postings.setdefault(symptom, []).append(disease_id)
+                posting_weights.setdefault(symptom, []).append(disease_weights.get(symptom, 1.0))
+        self.postings = {symptom: tuple(ids) for symptom, ids in postings.items()}
+        self.profile_sizes = tuple(sizes)
+        # Only kept for weighted maps; the unweighted path never touches them
+        self.posting_weights = (
+            {symptom: tuple(w) for symptom, w in posting_weights.items()} if self.weighted else None
+        )
+        self.profile_weights = tuple(totals) if self.weighted else None
+
+    def match_counts(self, symptoms_set):
+        """Return {disease_id: match_count} for diseases sharing a symptom with the input."""
+        counts = {}
+        postings = self.postings
+        for symptom in symptoms_set:
+            for disease_id in postings.get(symptom, ()):
+                counts[disease_id] = counts.get(disease_id, 0) + 1
+        return counts
+
+    def matched_weights(self, symptoms_set):
+        """Return {disease_id: total weight of matched symptoms} (weighted maps only)."""
+        totals = {}
+        for symptom in symptoms_set:
+            ids = self.postings.get(symptom)
+            if ids:
+                for disease_id, weight in zip(ids, self.posting_weights[symptom]):
+                    totals[disease_id] = totals.get(disease_id, 0.0) + weight
+        return totals
+
+    def scored(self, symptoms_set):
+        """Yield (disease_id, score, match_count) for every disease sharing a symptom with the input."""
+        n_user = len(symptoms_set)
+        counts = self.match_counts(symptoms_set)
+        if self.weighted:
+            matched = self.matched_weights(symptoms_set)
+            totals = self.profile_weights
+            for disease_id, match_count in counts.items():
+                yield disease_id, score_match(
+                    match_count, totals[disease_id], n_user, matched[disease_id]
+                ), match_count
+        else:
+            sizes = self.profile_sizes
+            for disease_id, match_count in counts.items():
+                yield disease_id, score_match(match_count, sizes[disease_id], n_user), match_count
+
+    def best(self, symptoms_set):
+        """
+        Return (disease_name, score, match_count) for the best-scoring disease, or None.
+        Ties go to the disease that comes first in the map, like the original loop.
+        """
+        best_id = None
+        best_score = -1.0
+        best_matches = 0
+        for disease_id, score, match_count in self.scored(symptoms_set):
+            if score > best_score or (score == best_score and disease_id < best_id):
+                best_id = disease_id
+                best_score = score
+                best_matches = match_count
+        if best_id is None:
+            return None
+        return self.diseases[best_id], best_score, best_matches
+
+    def top_k(self, symptoms_set, k):
+        """
+        Return up to k (disease_name, score, match_count) tuples, best first.
+        Uses heap selection over the matched diseases instead of a full sort.
+        """
+        ranked = heapq.nlargest(
+            k, ((score, -disease_id, match_count) for disease_id, score, match_count in self.scored(symptoms_set))
+        )
+        return [
+            (self.diseases[-neg_id], score, match_count)
+            for score, neg_id, match_count in ranked
+        ]
+
+    def best_many(self, symptom_sets):
+        """Score a batch of normalized symptom sets; one result (or None) per set."""
+        return [self.best(symptoms_set) for symptoms_set in symptom_sets]
+
+
+class ReferenceEngine:
+    """
+    The original per-disease loop (one set intersection per disease per request).
+    Kept as the correctness and speed baseline for the compiled engines.
+    """
+
+    def __init__(self, disease_symptom_map, weights=None):
+        self.diseases = tuple(disease_symptom_map)
+        self.profiles = tuple(set(symptoms) for symptoms in disease_symptom_map.values())
+        self.weights = (
+            tuple(weights.get(name, {}) for name in self.diseases) if weights else None
+        )
+
+    def scored(self, symptoms_set):
+        n_user = len(symptoms_set)
+        for disease_id, disease_set in enumerate(self.profiles):
+            intersection = symptoms_set.intersection(disease_set)
+            match_count = len(intersection)
+            if match_count == 0:
+                continue
+            if self.weights is None:
+                score = score_match(match_count, len(disease_set), n_user)
+            else:
+                disease_weights = self.weights[disease_id]
+                score = score_match(
+                    match_count,
+                    sum(disease_weights.get(s, 1.0) for s in disease_set),
+                    n_user,
+                    sum(disease_weights.get(s, 1.0) for s in intersection),
+                )
+            yield disease_id, score, match_count
+
+    def best(self, symptoms_set):
+        best = None
+        best_score = -1.0
+        for disease_id, score, match_count in self.scored(symptoms_set):
+            if score > best_score:
+                best_score = score
+                best = (self.diseases[disease_id], score, match_count)
+        return best
+
+    def top_k(self, symptoms_set, k):
+        ranked = heapq.nlargest(
+            k, ((score, -disease_id, match_count) for disease_id, score, match_count in self.scored(symptoms_set))
+        )
+        return [
+            (self.diseases[-neg_id], score, match_count)
+            for score, neg_id, match_count in ranked
+        ]
+
+    def best_many(self, symptom_sets):
+        return [self.best(symptoms_set) for symptoms_set in symptom_sets]
+
+
+class BitsetEngine:
+    """
+    Pure-Python engine over integer bitsets (no NumPy).
+    Each symptom is compiled into one int with a bit per disease that lists it.
+    The input's symptom bitsets are added into bit-sliced counters with & and ^,
+    so every disease's match count is computed at once, many diseases per machine
+    word. Diseases are then grouped by (match count, profile size); each group
+    has a single score and its best member is its lowest set bit, so only a few
+    groups are ever scored. Scores are identical to score_match().
+    Weighted maps score each matched disease with (profile & input).bit_count().
+    """
+
+    def __init__(self, disease_symptom_map, weights=None):
+        self.diseases = tuple(disease_symptom_map)
+        self.all_diseases = (1 << len(self.diseases)) - 1
+        postings = {}
+        size_masks = {}
+        for disease_id, disease_symptoms in enumerate(disease_symptom_map.values()):
+            bit = 1 << disease_id
+            profile = set(disease_symptoms)
+            for symptom in profile:
+                postings[symptom] = postings.get(symptom, 0) | bit
+            size_masks[len(profile)] = size_masks.get(len(profile), 0) | bit
+        self.postings = postings
+        # (profile size, diseases of that size), smallest first: for a given match count
+        # the score only falls as the profile grows
+        self.size_masks = tuple(sorted(size_masks.items()))
+        self.weighted = bool(weights)
+        if self.weighted:
+            self._compile_weighted(disease_symptom_map, weights)
+
+    def _compile_weighted(self, disease_symptom_map, weights):
+        vocabulary = sorted(self.postings)
+        self.symptom_bits = {symptom: 1 << i for i, symptom in enumerate(vocabulary)}
+        profiles = []
+        totals = []
+        bit_weights = {}
+        for disease_id, (name, disease_symptoms) in enumerate(disease_symptom_map.items()):
+            profile = 0
+            for symptom in disease_symptoms:
+                profile |= self.symptom_bits[symptom]
+            profiles.append(profile)
+            disease_weights = weights.get(name) or {}
+            totals.append(sum(disease_weights.get(s, 1.0) for s in set(disease_symptoms)))
+            if disease_weights:
+                # {symptom bit index: weight} for the diseases with non-default weights
+                bit_weights[disease_id] = {
+                    self.symptom_bits[s].bit_length() - 1: w
+                    for s, w in disease_weights.items() if s in self.symptom_bits and s in disease_symptoms
+                }
+        self.profiles = tuple(profiles)
+        self.profile_weights = tuple(totals)
+        self.bit_weights = bit_weights
+
+    def count_planes(self, symptoms_set):
+        """Per-disease match counts as bit planes: bit d of planes[i] is bit i of disease d's count."""
+        planes = []
+        for symptom in symptoms_set:
+            carry = self.postings.get(symptom, 0)
+            i = 0
+            while carry:
+                if i == len(planes):
+                    planes.append(carry)
+                    break
+                plane = planes[i]
+                planes[i] = plane ^ carry
+                carry &= plane
+                i += 1
+        return planes
+
+    def count_masks(self, symptoms_set):
+        """Yield (match_count, bitset of the diseases with exactly that many matches), highest count first."""
+        planes = self.count_planes(symptoms_set)
+        for match_count in range((1 << len(planes)) - 1, 0, -1):
+            mask = self.all_diseases
+            for i, plane in enumerate(planes):
+                mask &= plane if match_count >> i & 1 else ~plane
+                if not mask:
+                    break
+            if mask:
+                yield match_count, mask
+
+    def groups(self, symptoms_set):
+        """Yield (score, match_count, bitset of diseases) for every non-empty (match count, profile size) group."""
+        n_user = len(symptoms_set)
+        for match_count, count_mask in self.count_masks(symptoms_set):
+            for size, size_mask in self.size_masks:
+                group = count_mask & size_mask
+                if group:
+                    yield score_match(match_count, size, n_user), match_count, group
+
+    def scored(self, symptoms_set):
+        """Yield (disease_id, score, match_count) for every disease sharing a symptom with the input."""
+        if self.weighted:
+            yield from self._scored_weighted(symptoms_set)
+            return
+        for score, match_count, group in self.groups(symptoms_set):
+            for disease_id in _bit_indexes(group):
+                yield disease_id, score, match_count
+
+    def _scored_weighted(self, symptoms_set):
+        n_user = len(symptoms_set)
+        mask = 0
+        for symptom in symptoms_set:
+            mask |= self.symptom_bits.get(symptom, 0)
+        if not mask:
+            return
+        totals = self.profile_weights
+        for disease_id, profile in enumerate(self.profiles):
+            common = profile & mask
+            if common:
+                match_count = common.bit_count()
+                yield disease_id, score_match(
+                    match_count, totals[disease_id], n_user, self._matched_weight(disease_id, common)
+                ), match_count
+
+    def _matched_weight(self, disease_id, common):
+        disease_weights = self.bit_weights.get(disease_id)
+        if disease_weights is None:
+            return common.bit_count()
+        return sum(disease_weights.get(i, 1.0) for i in _bit_indexes(common))
+
+    def best(self, symptoms_set):
+        """Best (disease_name, score, match_count) or None; ties go to the disease first in the map."""
+        if self.weighted:
+            return _best_of(self.diseases, self.scored(symptoms_set))
+        n_user = len(symptoms_set)
+        best = None  # (score, -disease_id, match_count)
+        for match_count, count_mask in self.count_masks(symptoms_set):
+            # Sizes ascend, so scores only fall: stop at the first group scoring below this count's best
+            count_best = None
+            for size, size_mask in self.size_masks:
+                group = count_mask & size_mask
+                if not group:
+                    continue
+                score = score_match(match_count, size, n_user)
+                if count_best is not None and score < count_best:
+                    break
+                count_best = score
+                candidate = (score, -_lowest_bit_index(group), match_count)
+                if best is None or candidate > best:
+                    best = candidate
+        if best is None:
+            return None
+        score, neg_id, match_count = best
+        return self.diseases[-neg_id], score, match_count
+
+    def top_k(self, symptoms_set, k):
+        """Up to k (disease_name, score, match_count) tuples, best first; ties go to the disease first in the map."""
+        if self.weighted:
+            ranked = heapq.nlargest(
+                k, ((score, -disease_id, m) for disease_id, score, m in self.scored(symptoms_set))
+            )
+        else:
+            ranked = []
+            for score, match_count, group in sorted(self.groups(symptoms_set), key=lambda g: -g[0]):
+                if len(ranked) >= k and score < ranked[-1][0]:
+                    break
+                ranked.extend((score, -disease_id, match_count) for disease_id in _bit_indexes(group, k))
+            ranked = sorted(ranked, reverse=True)[:k]
+        return [
+            (self.diseases[-neg_id], score, match_count)
+            for score, neg_id, match_count in ranked
+        ]
+
+    def best_many(self, symptom_sets):
+        return [self.best(symptoms_set) for symptoms_set in symptom_sets]
+
+
+def _lowest_bit_index(bits):
+    return (bits & -bits).bit_length() - 1
+
+
+def _bit_indexes(bits, limit=None):
+    """Indexes of the set bits, lowest first (at most limit of them)."""
+    found = 0
+    while bits and (limit is None or found < limit):
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+        found += 1
+
+
+def _best_of(diseases, scored):
+    best_id = None
+    best_score = -1.0
+    best_matches = 0
+    for disease_id, score, match_count in scored:
+        if score > best_score:
+            best_id = disease_id
+            best_score = score
+            best_matches = match_count
+    if best_id is None:
+        return None
+    return diseases[best_id], best_score, best_matches
+
+
+class MatrixEngine:
+    """
+    NumPy engine over a sparse disease×symptom incidence matrix.
+    The matrix is stored symptom-major (CSR: indptr/indices), so a batch of
+    queries is multiplied against it in one sparse product and every matched
+    disease is scored with array operations. Scores are identical to score_match().
+    """
+
+    def __init__(self, disease_symptom_map, weights=None):
+        if np is None:
+            raise ImportError('MatrixEngine requires NumPy (pip install numpy).')
+        self.diseases = tuple(disease_symptom_map)
+        self.weighted = bool(weights)
+        # Symptom ids follow sorted name order, so the vocabulary can be stored and searched as a sorted table
+        vocabulary = sorted({s for disease_symptoms in disease_symptom_map.values() for s in disease_symptoms})
+        symptom_ids = {symptom: i for i, symptom in enumerate(vocabulary)}
+        rows = []
+        cols = []
+        data = []
+        for disease_id, (disease_name, disease_symptoms) in enumerate(disease_symptom_map.items()):
+            disease_weights = weights.get(disease_name, {}) if weights else {}
+            for symptom in set(disease_symptoms):
+                cols.append(symptom_ids[symptom])
+                rows.append(disease_id)
+                data.append(disease_weights.get(symptom, 1.0))
+        self.symptom_ids = symptom_ids
+        self._disease_ids = None
+        cols = np.asarray(cols, dtype=np.int64)
+        rows = np.asarray(rows, dtype=np.int64)
+        order = np.argsort(cols, kind='stable')
+        self.indices = rows.astype(np.int32)[order]
+        self.indptr = np.zeros(len(symptom_ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=len(symptom_ids)), out=self.indptr[1:])
+        self.profile_sizes = np.bincount(rows, minlength=len(self.diseases)).astype(np.float64)
+        # Weights (the matrix values) are only kept for weighted maps
+        if self.weighted:
+            data = np.asarray(data, dtype=np.float64)
+            self.data = data[order]
+            self.profile_weights = np.bincount(rows, weights=data, minlength=len(self.diseases))
+        else:
+            self.data = None
+            self.profile_weights = None
+
+    def pair_counts(self, symptom_sets):
+        """
+        Sparse product Q · Aᵀ of the query batch with the incidence matrix.
+        Returns (query_ids, disease_ids, match_counts, matched_weights) for every
+        non-zero cell, sorted by query then disease; matched_weights is None
+        for unweighted maps.
+        """
+        n_diseases = len(self.diseases)
+        query_ids = []
+        symptom_rows = []
+        for query_id, symptoms_set in enumerate(symptom_sets):
+            for symptom in symptoms_set:
+                symptom_id = self.symptom_ids.get(symptom)
+                if symptom_id is not None:
+                    query_ids.append(query_id)
+                    symptom_rows.append(symptom_id)
+        if not symptom_rows:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, empty, (np.zeros(0) if self.weighted else None)
+        symptom_rows = np.asarray(symptom_rows, dtype=np.int64)
+        starts = self.indptr[symptom_rows]
+        lengths = self.indptr[symptom_rows + 1] - starts
+        # Expand each selected symptom row into the positions of its disease ids
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+        flat = np.repeat(np.asarray(query_ids, dtype=np.int64) * n_diseases, lengths)
+        flat += self.indices[positions]
+        if self.weighted:
+            cells, inverse, matches = np.unique(flat, return_inverse=True, return_counts=True)
+            matched = np.bincount(inverse, weights=self.data[positions], minlength=len(cells))
+        else:
+            cells, matches = np.unique(flat, return_counts=True)
+            matched = None
+        return cells // n_diseases, cells % n_diseases, matches, matched
+
+    def matched_symptoms(self, disease_name, symptoms_set):
+        """Symptoms of symptoms_set in the disease's profile, read from the symptom rows (sorted by disease id)."""
+        if self._disease_ids is None:
+            self._disease_ids = {name: i for i, name in enumerate(self.diseases)}
+        disease_id = self._disease_ids[disease_name]
+        matched = []
+        for symptom in symptoms_set:
+            symptom_id = self.symptom_ids.get(symptom)
+            if symptom_id is None:
+                continue
+            row = self.indices[self.indptr[symptom_id]:self.indptr[symptom_id + 1]]
+            i = np.searchsorted(row, disease_id)
+            if i < len(row) and row[i] == disease_id:
+                matched.append(symptom)
+        return sorted(matched)
+
+    def match_counts(self, symptom_sets):
+        """Return the dense (queries × diseases) match-count matrix."""
+        counts = np.zeros((len(symptom_sets), len(self.diseases)), dtype=np.int64)
+        query_ids, disease_ids, matches, _ = self.pair_counts(symptom_sets)
+        counts[query_ids, disease_ids] = matches
+        return counts
+
+    def scores(self, matches, n_disease, n_user, matched=None):
+        """Vectorized score_match() over arrays of match counts and profile/selection sizes."""
+        specificity = (matches if matched is None else matched) / n_disease
+        coverage = matches / n_user
+        score = (0.55 * specificity + 0.45 * coverage) * 100
+        score = np.where(
+            matches >= 4, np.minimum(99, score + 8),
+            np.where(matches >= 3, np.minimum(99, score + 4), score),
+        )
+        return np.where(matches == 1, np.maximum(5.0, score * 0.35), score)
+
+    def _score_pairs(self, symptom_sets):
+        query_ids, disease_ids, matches, matched = self.pair_counts(symptom_sets)
+        n_user = np.asarray([len(s) for s in symptom_sets], dtype=np.float64)
+        totals = self.profile_weights if self.weighted else self.profile_sizes
+        score = self.scores(matches, totals[disease_ids], n_user[query_ids], matched)
+        return query_ids, disease_ids, matches, score
+
+    def best(self, symptoms_set):
+        return self.best_many([symptoms_set])[0]
+
+    def best_many(self, symptom_sets):
+        """Score a batch of normalized symptom sets; one result (or None) per set."""
+        symptom_sets = list(symptom_sets)
+        results = [None] * len(symptom_sets)
+        query_ids, disease_ids, matches, score = self._score_pairs(symptom_sets)
+        if not len(matches):
+            return results
+        # Highest score per query; ties go to the lowest disease id (map order)
+        order = np.lexsort((disease_ids, -score, query_ids))
+        firsts = order[np.unique(query_ids[order], return_index=True)[1]]
+        for i in firsts.tolist():
+            results[int(query_ids[i])] = (
+                self.diseases[int(disease_ids[i])], float(score[i]), int(matches[i])
+            )
+        return results
+
+    def top_k(self, symptoms_set, k):
+        return self.top_k_many([symptoms_set], k)[0]
+
+    def top_k_many(self, symptom_sets, k):
+        """
+        Return up to k (disease_name, score, match_count) tuples per set, best first.
+        Uses np.partition to find the k-th best score instead of sorting every match.
+        """
+        symptom_sets = list(symptom_sets)
+        results = [[] for _ in symptom_sets]
+        query_ids, disease_ids, matches, score = self._score_pairs(symptom_sets)
+        if not len(matches) or k < 1:
+            return results
+        bounds = np.searchsorted(query_ids, np.arange(len(symptom_sets) + 1))
+        for query_id in range(len(symptom_sets)):
+            lo, hi = bounds[query_id], bounds[query_id + 1]
+            if lo == hi:
+                continue
+            q_score = score[lo:hi]
+            q_diseases = disease_ids[lo:hi]
+            if hi - lo > k:
+                # Keep everything tied with the k-th best so ties still break by map order
+                threshold = np.partition(q_score, hi - lo - k)[hi - lo - k]
+                candidates = np.flatnonzero(q_score >= threshold)
+            else:
+                candidates = np.arange(hi - lo)
+            ranked = candidates[np.lexsort((q_diseases[candidates], -q_score[candidates]))][:k]
+            results[query_id] = [
+                (self.diseases[int(q_diseases[i])], float(q_score[i]), int(matches[lo + i]))
+                for i in ranked.tolist()
+            ]
+        return results
+
+
+class NaiveBayesEngine:
+    """
+    Trained multinomial naive Bayes classifier in NumPy.
+    Trained from every disease's profile (one pseudo-case whose symptoms count by their
+    weight) plus labeled cases [(symptoms, disease name)]. The score is the posterior
+    probability ×100 over all diseases; like the heuristic engines, only diseases sharing
+    a symptom with the input are returned.
+
+    With smoothing alpha, log P(s|d) = log((c + alpha) / (N_d + alpha·V)) splits into a
+    per-disease baseline log(alpha / (N_d + alpha·V)), paid for every input symptom, and a
+    sparse bonus log1p(c / alpha) for the symptoms seen with d, stored symptom-major (CSR).
+    A query is then one gather over its symptom rows and one bincount.
+    """
+
+    trainable = True
+
+    def __init__(self, disease_symptom_map, weights=None, cases=(), alpha=1.0, profile_weight=1.0):
+        if np is None:
+            raise ImportError('NaiveBayesEngine requires NumPy (pip install numpy).')
+        self.diseases = tuple(disease_symptom_map)
+        disease_ids = {name.casefold(): i for i, name in enumerate(self.diseases)}
+        counts = {}
+        documents = [0.0] * len(self.diseases)
+        for disease_id, (disease_name, disease_symptoms) in enumerate(disease_symptom_map.items()):
+            disease_weights = weights.get(disease_name, {}) if weights else {}
+            if profile_weight:
+                documents[disease_id] += profile_weight
+            for symptom in set(disease_symptoms):
+                key = (symptom, disease_id)
+                counts[key] = counts.get(key, 0.0) + profile_weight * disease_weights.get(symptom, 1.0)
+        self.trained_cases = 0
+        self.skipped_cases = 0
+        for symptoms, label in cases:
+            disease_id = disease_ids.get(label.strip().casefold())
+            if disease_id is None:
+                self.skipped_cases += 1
+                continue
+            self.trained_cases += 1
+            documents[disease_id] += 1
+            for symptom in set(symptoms):
+                key = (symptom, disease_id)
+                counts[key] = counts.get(key, 0.0) + 1
+
+        vocabulary = sorted({symptom for symptom, _ in counts})
+        symptom_ids = {symptom: i for i, symptom in enumerate(vocabulary)}
+        keys = [key for key, count in counts.items() if count > 0]
+        cols = np.asarray([symptom_ids[symptom] for symptom, _ in keys], dtype=np.int64)
+        rows = np.asarray([disease_id for _, disease_id in keys], dtype=np.int64)
+        values = np.asarray([counts[key] for key in keys], dtype=np.float64)
+        order = np.lexsort((rows, cols))
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cols, minlength=len(vocabulary)), out=indptr[1:])
+        totals = np.bincount(rows, weights=values, minlength=len(self.diseases))
+        documents = np.asarray(documents, dtype=np.float64)
+        self.alpha = alpha
+        self.metadata = {}
+        self._set_arrays(
+            vocabulary,
+            indptr,
+            rows.astype(np.int32)[order],
+            np.log1p(values[order] / alpha).astype(np.float32),
+            # Add-one smoothed class prior, so a disease without cases is still reachable
+            np.log((documents + 1) / (documents.sum() + len(self.diseases))),
+            np.log(alpha / (totals + alpha * max(1, len(vocabulary)))),
+        )
+
+    def _set_arrays(self, vocabulary, indptr, indices, bonus, log_prior, baseline):
+        self.symptom_ids = {symptom: i for i, symptom in enumerate(vocabulary)}
+        self.indptr = indptr
+        self.indices = indices
+        self.bonus = bonus
+        self.log_prior = log_prior
+        self.baseline = baseline
+
+    @property
+    def knowledge_version(self):
+        return self.metadata.get('knowledge_version')
+
+    def save(self, path, **metadata):
+        """Write the trained arrays to a compressed .npz file (atomically); metadata is stored as JSON."""
+        metadata = {'alpha': self.alpha, 'trained_cases': self.trained_cases, **metadata}
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                np.savez_compressed(
+                    f,
+                    diseases=np.asarray(self.diseases, dtype=str),
+                    vocabulary=np.asarray(sorted(self.symptom_ids, key=self.symptom_ids.get), dtype=str),
+                    indptr=self.indptr,
+                    indices=self.indices,
+                    bonus=self.bonus,
+                    log_prior=self.log_prior,
+                    baseline=self.baseline,
+                    metadata=np.asarray(json.dumps(metadata)),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self.metadata = metadata
+
+    @classmethod
+    def load(cls, path):
+        """Load an engine written by save(); raises OSError/ValueError/KeyError for missing or invalid files."""
+        if np is None:
+            raise ImportError('NaiveBayesEngine requires NumPy (pip install numpy).')
+        engine = cls.__new__(cls)
+        with np.load(path, allow_pickle=False) as data:
+            engine.diseases = tuple(data['diseases'].tolist())
+            engine.metadata = json.loads(str(data['metadata']))
+            engine._set_arrays(
+                data['vocabulary'].tolist(), data['indptr'], data['indices'],
+                data['bonus'], data['log_prior'], data['baseline'],
+            )
+        engine.alpha = engine.metadata.get('alpha', 1.0)
+        engine.trained_cases = engine.metadata.get('trained_cases', 0)
+        engine.skipped_cases = 0
+        return engine
+
+    def log_scores(self, symptoms_set):
+        """Return (log joint probability per disease, match count per disease), or None if no symptom is known."""
+        rows = [self.symptom_ids[s] for s in symptoms_set if s in self.symptom_ids]
+        if not rows:
+            return None
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.indptr[rows]
+        lengths = self.indptr[rows + 1] - starts
+        offsets = np.cumsum(lengths) - lengths
+        positions = np.arange(lengths.sum()) - np.repeat(offsets - starts, lengths)
+        hits = self.indices[positions]
+        n_diseases = len(self.diseases)
+        scores = self.log_prior + len(rows) * self.baseline
+        scores += np.bincount(hits, weights=self.bonus[positions], minlength=n_diseases)
+        return scores, np.bincount(hits, minlength=n_diseases)
+
+    def _ranked(self, symptoms_set, k):
+        scored = self.log_scores(symptoms_set)
+        if scored is None:
+            return []
+        scores, matches = scored
+        top = scores.max()
+        # Posterior over every disease, normalized with log-sum-exp
+        log_total = top + np.log(np.exp(scores - top).sum())
+        candidates = np.flatnonzero(matches)
+        if len(candidates) > k:
+            threshold = np.partition(scores[candidates], len(candidates) - k)[len(candidates) - k]
+            candidates = candidates[scores[candidates] >= threshold]
+        # Ties go to the lowest disease id (map order)
+        ranked = candidates[np.lexsort((candidates, -scores[candidates]))][:k]
+        posterior = np.exp(scores[ranked] - log_total) * 100
+        return [
+            (self.diseases[i], float(p), int(matches[i]))
+            for i, p in zip(ranked.tolist(), posterior.tolist())
+        ]
+
+    def best(self, symptoms_set):
+        ranked = self._ranked(symptoms_set, 1)
+        return ranked[0] if ranked else None
+
+    def top_k(self, symptoms_set, k):
+        return self._ranked(symptoms_set, k) if k >= 1 else []
+
+    def best_many(self, symptom_sets):
+        return [self.best(symptoms_set) for symptoms_set in symptom_sets]
+
+
+# Scoring backends selectable via settings.PREDICTION_ENGINE
+ENGINES = {
+    'index': SymptomIndex,
+    'bitset': BitsetEngine,
+    'matrix': MatrixEngine,
+    'loop': ReferenceEngine,
+    'bayes': NaiveBayesEngine,
+}
+
+# Engines that need NumPy
+NUMPY_ENGINES = ('matrix', 'bayes')
+
+
+def available_engines():
+    """Names of the engines that can be built in this environment (see NUMPY_ENGINES)."""
+    return [name for name in ENGINES if name not in NUMPY_ENGINES or np is not None]
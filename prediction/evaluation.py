@@ -0,0 +1,189 @@
+"""
+Offline accuracy and latency evaluation of the scoring engines.
+Cases are (normalized symptom set, true disease) pairs read from a labeled CSV.
+Every engine ranks each case's top 3 diseases; the results give top-1/top-3
+accuracy, per-disease recall/precision with the most common confusions, and
+per-case latency. Django-free so k-fold splits can be evaluated in worker processes.
+"""
+
+import csv
+import json
+import random
+import time
+from collections import Counter
+
+from .benchmarks import latency_stats
+from .engine import ENGINES, normalize_symptom
+
+TOP_K = 3
+
+
+def read_cases(fp, symptom_column='symptoms', label_column='disease', separator=';', canonicalizer=None):
+    """
+    Yield (frozenset of normalized symptoms, disease name) from a CSV file object.
+    The symptom cell is either a JSON list or names joined by separator. With a
+    canonicalizer (DiseasePredictionModel.canonicalizer) the names are resolved the
+    way predict() resolves typed symptoms, so the cases see the production input pipeline.
+    """
+    reader = csv.DictReader(fp)
+    missing = {symptom_column, label_column} - set(reader.fieldnames or ())
+    if missing:
+        raise ValueError(f'Missing column(s): {", ".join(sorted(missing))}')
+    for line_number, row in enumerate(reader, start=2):
+        cell = (row[symptom_column] or '').strip()
+        label = (row[label_column] or '').strip()
+        if cell.startswith('['):
+            try:
+                names = json.loads(cell)
+            except ValueError:
+                raise ValueError(f'Line {line_number}: symptoms cell is not a valid JSON list') from None
+        else:
+            names = cell.split(separator)
+        names = [str(name) for name in names if str(name).strip()]
+        if canonicalizer is not None:
+            symptoms = canonicalizer.canonicalize_all(names)
+        else:
+            symptoms = frozenset(normalize_symptom(name) for name in names)
+        if symptoms and label:
+            yield symptoms, label
+
+
+def split_folds(cases, k, seed=0):
+    """Shuffle the cases reproducibly and deal them into k folds."""
+    shuffled = list(cases)
+    random.Random(seed).shuffle(shuffled)
+    return [shuffled[i::k] for i in range(k)]
+
+
+def evaluate_engine(engine, cases):
+    """Rank every case with engine.top_k and return accuracy, confusion and latency metrics."""
+    known = {name.casefold() for name in engine.diseases}
+    clock = time.perf_counter_ns
+    samples = []
+    top1 = top3 = no_prediction = unknown_labels = 0
+    support = Counter()
+    correct = Counter()
+    predicted = Counter()
+    confusion = Counter()
+    for symptoms, label in cases:
+        start = clock()
+        ranked = engine.top_k(symptoms, TOP_K)
+        samples.append(clock() - start)
+        names = [name.casefold() for name, _, _ in ranked]
+        truth = label.casefold()
+        support[label] += 1
+        if truth not in known:
+            unknown_labels += 1
+        if not names:
+            no_prediction += 1
+            confusion[(label, '')] += 1
+            continue
+        predicted[ranked[0][0]] += 1
+        if names[0] == truth:
+            top1 += 1
+            correct[label] += 1
+        else:
+            confusion[(label, ranked[0][0])] += 1
+        if truth in names:
+            top3 += 1
+
+    results = {
+        'cases': len(samples),
+        'top1': top1,
+        'top3': top3,
+        'top1_accuracy': round(top1 / len(samples), 4) if samples else None,
+        'top3_accuracy': round(top3 / len(samples), 4) if samples else None,
+        'no_prediction': no_prediction,
+        'unknown_labels': unknown_labels,
+        'latency': latency_stats(samples),
+        'per_disease': _per_disease(support, correct, predicted, confusion),
+    }
+    if hasattr(engine, 'top_k_many') and cases:
+        symptom_sets = [symptoms for symptoms, _ in cases]
+        start = time.perf_counter()
+        engine.top_k_many(symptom_sets, TOP_K)
+        results['batch_us_per_case'] = round((time.perf_counter() - start) / len(cases) * 1e6, 3)
+    return results
+
+
+def _per_disease(support, correct, predicted, confusion):
+    confused = {}
+    for (label, guess), count in confusion.most_common():
+        confused.setdefault(label, []).append([guess, count])
+    predicted_by_name = Counter()
+    for name, count in predicted.items():
+        predicted_by_name[name.casefold()] += count
+    per_disease = {}
+    for label, n in support.most_common():
+        per_disease[label] = {
+            'support': n,
+            'top1_correct': correct[label],
+            'predicted_as_top1': predicted_by_name[label.casefold()],
+            'confused_with': confused.get(label, []),
+        }
+        _add_rates(per_disease[label])
+    return per_disease
+
+
+def _add_rates(entry):
+    entry['recall'] = round(entry['top1_correct'] / entry['support'], 4) if entry['support'] else None
+    entry['precision'] = (
+        round(entry['top1_correct'] / entry['predicted_as_top1'], 4) if entry['predicted_as_top1'] else None
+    )
+
+
+def pool_folds(fold_results):
+    """
+    Combine one engine's per-fold results: pooled accuracy and per-disease counts over all
+    cases, plus the mean and standard deviation of the fold accuracies.
+    """
+    cases = sum(r['cases'] for r in fold_results)
+    pooled = {
+        'folds': len(fold_results),
+        'cases': cases,
+        'top1': sum(r['top1'] for r in fold_results),
+        'top3': sum(r['top3'] for r in fold_results),
+        'no_prediction': sum(r['no_prediction'] for r in fold_results),
+        'unknown_labels': sum(r['unknown_labels'] for r in fold_results),
+    }
+    pooled['top1_accuracy'] = round(pooled['top1'] / cases, 4) if cases else None
+    pooled['top3_accuracy'] = round(pooled['top3'] / cases, 4) if cases else None
+    for key in ('top1_accuracy', 'top3_accuracy'):
+        values = [r[key] for r in fold_results if r[key] is not None]
+        mean = sum(values) / len(values) if values else 0.0
+        pooled[f'{key}_by_fold'] = values
+        pooled[f'{key}_std'] = round((sum((v - mean) ** 2 for v in values) / len(values)) ** 0.5, 4) if values else None
+    pooled['latency_by_fold'] = [r['latency'] for r in fold_results]
+    if all('batch_us_per_case' in r for r in fold_results):
+        pooled['batch_us_per_case'] = round(
+            sum(r['batch_us_per_case'] * r['cases'] for r in fold_results) / cases, 3) if cases else None
+
+    per_disease = {}
+    for result in fold_results:
+        for label, entry in result['per_disease'].items():
+            total = per_disease.setdefault(
+                label, {'support': 0, 'top1_correct': 0, 'predicted_as_top1': 0, 'confused_with': Counter()}
+            )
+            for key in ('support', 'top1_correct', 'predicted_as_top1'):
+                total[key] += entry[key]
+            total['confused_with'].update({guess: count for guess, count in entry['confused_with']})
+    for entry in per_disease.values():
+        entry['confused_with'] = [[guess, count] for guess, count in entry['confused_with'].most_common()]
+        _add_rates(entry)
+    pooled['per_disease'] = dict(sorted(per_disease.items(), key=lambda item: -item[1]['support']))
+    return pooled
+
+
+def evaluate_fold(disease_symptom_map, weights, engine_names, cases, train_cases=()):
+    """
+    Build the engines and evaluate them on one fold; the unit of work for the process pool.
+    Trainable engines are trained on train_cases (the other folds) on top of the disease profiles.
+    """
+    results = {}
+    for name in engine_names:
+        if getattr(ENGINES[name], 'trainable', False):
+            engine = ENGINES[name](disease_symptom_map, weights, cases=train_cases)
+        else:
+            engine = ENGINES[name](disease_symptom_map, weights)
+        results[name] = evaluate_engine(engine, cases)
+    return results
@@ -0,0 +1,240 @@
+"""
+Symptom extraction from free text (chief complaints, custom symptom descriptions).
+Every symptom name and alias is compiled into an Aho-Corasick automaton over
+words, so a complaint is scanned in one linear pass however many symptoms
+there are: 'Sharp chest pain since Monday, throwing up, no fever' gives
+['sharp_chest_pain', 'vomiting']. Overlapping matches keep the leftmost
+longest one, and a symptom is skipped when one of the few words before it in
+the same clause negates it ('no', 'denies', ...) or when it continues a list
+of negated symptoms ('denies nausea, vomiting, or diarrhea').
+Symptoms added later (an approved custom symptom) go into a small second
+automaton that is rebuilt on its own; it is merged into the main one once it
+grows past DELTA_LIMIT phrases.
+"""
+
+import re
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from .canonical import NEGATIONS
+from .engine import normalize_symptom
+
+_WORD = re.compile(r'[^\W_]+')
+# Words plus the punctuation that ends a clause; phrases never contain it, so no match spans it
+_TOKEN = re.compile(r'[^\W_]+|[.,;:!?()\n]')
+_APOSTROPHE = re.compile(r"['’]")
+
+# Tokens a negation does not reach past; commas do not end it, as negated symptoms are often listed
+CLAUSE_BREAKS = frozenset('.;:!?()\n') | {'but'}
+# Tokens that join a symptom to the previous one in a list, which then shares its negation
+LIST_JOINERS = frozenset((',', 'or', 'and', 'nor'))
+
+# Words before a symptom that are checked for a negation
+NEGATION_WINDOW = 3
+
+# Phrases added since the last full build that are kept in the delta automaton
+DELTA_LIMIT = 256
+
+
+def phrase_words(text):
+    """Casefolded words of text, ignoring punctuation and apostrophes ("Can't sleep" -> ('cant', 'sleep'))."""
+    return tuple(_WORD.findall(_APOSTROPHE.sub('', text.casefold())))
+
+
+class PhraseAutomaton:
+    """Aho-Corasick automaton whose alphabet is words; phrases maps word tuples to targets."""
+
+    def __init__(self, phrases):
+        self.goto = [{}]
+        # Per state: ((target, phrase length in words), ...) of every phrase ending there
+        outputs = [[]]
+        for words, target in phrases.items():
+            if not words:
+                continue
+            state = 0
+            for word in words:
+                next_state = self.goto[state].get(word)
+                if next_state is None:
+                    next_state = self.goto[state][word] = len(self.goto)
+                    self.goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append((target, len(words)))
+
+        # Failure links in breadth-first order, so a state's fallback is finished before the state
+        self.fail = [0] * len(self.goto)
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for word, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and word not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(word, 0)
+                outputs[next_state].extend(outputs[self.fail[next_state]])
+        self.outputs = [tuple(output) for output in outputs]
+
+    def __len__(self):
+        return len(self.goto)
+
+    def scan(self, words):
+        """(start, end, target) of every phrase occurring in words (end exclusive)."""
+        goto, fail, outputs = self.goto, self.fail, self.outputs
+        root = goto[0]
+        hits = []
+        state = 0
+        for i, word in enumerate(words):
+            if state:
+                while state and word not in goto[state]:
+                    state = fail[state]
+                state = goto[state].get(word, 0)
+            else:
+                # Most words of a complaint start no phrase
+                state = root.get(word, 0)
+                if not state:
+                    continue
+            for target, length in outputs[state]:
+                hits.append((i + 1 - length, i + 1, target))
+        return hits
+
+
+class SymptomExtractor:
+    """Extracts canonical symptom names from text; phrases maps phrase text to a canonical name."""
+
+    def __init__(self, phrases=()):
+        self.phrases = {}
+        for text, target in dict(phrases).items():
+            self.phrases[phrase_words(text)] = target
+        self.main = PhraseAutomaton(self.phrases)
+        self.pending = {}
+        self.delta = None
+
+    def add(self, text, target):
+        """Add one phrase without recompiling the whole vocabulary."""
+        words = phrase_words(text)
+        if not words or self.phrases.get(words) == target:
+            return
+        self.phrases[words] = target
+        self.pending[words] = target
+        if len(self.pending) > DELTA_LIMIT:
+            self.main = PhraseAutomaton(self.phrases)
+            self.pending = {}
+            self.delta = None
+        else:
+            self.delta = PhraseAutomaton(self.pending)
+
+    def matches(self, text):
+        """(start, end, target, negated) of the leftmost-longest matches in text, by token position."""
+        tokens = _TOKEN.findall(_APOSTROPHE.sub('', text.casefold()))
+        hits = self.main.scan(tokens)
+        if self.delta is not None:
+            hits.extend(self.delta.scan(tokens))
+        hits.sort(key=lambda hit: (hit[0], hit[0] - hit[1]))
+        found = []
+        covered = 0
+        for start, end, target in hits:
+            if start < covered:
+                continue
+            negated = False
+            if found and found[-1][3] and LIST_JOINERS.issuperset(tokens[covered:start]):
+                negated = True
+            else:
+                for token in reversed(tokens[max(0, start - NEGATION_WINDOW):start]):
+                    if token in CLAUSE_BREAKS:
+                        break
+                    if token in NEGATIONS:
+                        negated = True
+                        break
+            covered = end
+            found.append((start, end, target, negated))
+        return found
+
+    def extract(self, text):
+        """Canonical names of the symptoms text mentions (not negated), in order of first mention."""
+        if not text:
+            return []
+        return list(dict.fromkeys(target for _, _, target, negated in self.matches(text) if not negated))
+
+
+class SymptomTextExtractor:
+    """
+    Per-process SymptomExtractor over the Symptom table, the built-in disease–symptom
+    map and the symptom aliases; a saved Symptom is added to it incrementally.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._extractor = None
+        self._labels = {}
+        self._loaded_at = 0.0
+        self.loads = 0
+        self.additions = 0
+
+    def extract(self, text):
+        """Canonical names of the symptoms mentioned in text."""
+        return self._get().extract(text)
+
+    def label(self, name):
+        """Display name for a canonical symptom name (the Symptom row's name when there is one)."""
+        return self._labels.get(name) or name.replace('_', ' ').capitalize()
+
+    def add(self, symptom_name):
+        """Teach the extractor a new Symptom (e.g. an approved suggestion)."""
+        with self._lock:
+            if self._extractor is not None:
+                target = normalize_symptom(symptom_name)
+                self._extractor.add(target.replace('_', ' '), target)
+                self._labels.setdefault(target, symptom_name)
+                self.additions += 1
+
+    def invalidate(self):
+        self._extractor = None
+
+    def stats(self):
+        extractor = self._extractor
+        if extractor is None:
+            return {'loads': self.loads, 'additions': self.additions}
+        return {
+            'phrases': len(extractor.phrases),
+            'states': len(extractor.main),
+            'pending_phrases': len(extractor.pending),
+            'loads': self.loads,
+            'additions': self.additions,
+        }
+
+    def _get(self):
+        extractor = self._extractor
+        ttl = getattr(settings, 'PREDICTION_CACHE_TTL', 300)
+        if extractor is None or (ttl and time.monotonic() - self._loaded_at > ttl):
+            with self._lock:
+                if self._extractor is extractor:
+                    self._extractor, self._labels = self._build()
+                    self._loaded_at = time.monotonic()
+                    self.loads += 1
+                extractor = self._extractor
+        return extractor
+
+    def _build(self):
+        from .knowledge import builtin_snapshot
+        from .ml_model import symptom_aliases
+        from .models import Symptom
+
+        phrases = {}
+        for name in builtin_snapshot().symptoms:
+            phrases[name.replace('_', ' ')] = name
+        labels = {}
+        for name in Symptom.objects.values_list('name', flat=True):
+            target = normalize_symptom(name)
+            phrases[target.replace('_', ' ')] = target
+            labels.setdefault(target, name)
+        # Aliases never shadow a symptom's own name
+        for alias, target in symptom_aliases().items():
+            phrases.setdefault(alias, normalize_symptom(target))
+        return SymptomExtractor(phrases), labels
+
+
+symptom_extractor = SymptomTextExtractor()
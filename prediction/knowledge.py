@@ -0,0 +1,101 @@
+"""
+Versioned disease–symptom knowledge for the prediction engines.
+The knowledge comes from DiseaseSymptom rows when there are any, otherwise
+from the built-in DiseasePredictionModel.DISEASE_SYMPTOM_MAP. It is loaded
+into an immutable KnowledgeSnapshot tagged with the KnowledgeVersion counter;
+every change to the knowledge bumps that counter so workers can tell their
+snapshot is stale and rebuild it (see prediction.registry).
+"""
+
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+
+from django.db.models import F
+
+from .engine import normalize_symptom
+from .models import Disease, DiseaseSymptom, KnowledgeVersion, Symptom
+
+KNOWLEDGE_VERSION_PK = 1
+
+
+@dataclass(frozen=True, slots=True)
+class KnowledgeSnapshot:
+    """
+    Read-only disease–symptom knowledge at one version.
+    disease_symptom_map: {disease name: tuple of normalized symptoms}, in disease id order
+    weights: {disease name: {symptom: weight}} for non-default weights, or None when unweighted
+    """
+    version: int
+    source: str
+    disease_symptom_map: MappingProxyType
+    weights: MappingProxyType = None
+    loaded_at: float = field(default_factory=time.time)
+
+    @property
+    def symptoms(self):
+        return {s for profile in self.disease_symptom_map.values() for s in profile}
+
+
+def current_version():
+    """Version of the knowledge in the database (0 if it was never changed)."""
+    version = (
+        KnowledgeVersion.objects.filter(pk=KNOWLEDGE_VERSION_PK)
+        .values_list('version', flat=True).first()
+    )
+    return version or 0
+
+
+def bump_version():
+    """Mark the knowledge as changed so every worker rebuilds its snapshot."""
+    updated = KnowledgeVersion.objects.filter(pk=KNOWLEDGE_VERSION_PK).update(version=F('version') + 1)
+    if not updated:
+        KnowledgeVersion.objects.get_or_create(pk=KNOWLEDGE_VERSION_PK, defaults={'version': 1})
+
+
+def builtin_snapshot(version=0):
+    """Snapshot of the built-in DISEASE_SYMPTOM_MAP."""
+    from .ml_model import DiseasePredictionModel
+
+    return KnowledgeSnapshot(
+        version=version,
+        source='builtin',
+        disease_symptom_map=MappingProxyType({
+            name: tuple(symptoms)
+            for name, symptoms in DiseasePredictionModel.DISEASE_SYMPTOM_MAP.items()
+        }),
+    )
+
+
+def load_snapshot():
+    """
+    Load the current knowledge: DiseaseSymptom rows if any exist, else the built-in map.
+    Uses three flat queries (no joins) so 10k diseases load well under a second.
+    """
+    version = current_version()
+    links = list(DiseaseSymptom.objects.values_list('disease_id', 'symptom_id', 'weight'))
+    if not links:
+        return builtin_snapshot(version)
+
+    disease_names = dict(Disease.objects.values_list('id', 'name'))
+    symptom_names = {
+        pk: normalize_symptom(name) for pk, name in Symptom.objects.values_list('id', 'name')
+    }
+    profiles = {}
+    weights = {}
+    for disease_id, symptom_id, weight in links:
+        symptom = symptom_names[symptom_id]
+        profiles.setdefault(disease_id, []).append(symptom)
+        if weight != 1.0:
+            weights.setdefault(disease_id, {})[symptom] = weight
+
+    return KnowledgeSnapshot(
+        version=version,
+        source='database',
+        disease_symptom_map=MappingProxyType({
+            disease_names[disease_id]: tuple(profiles[disease_id]) for disease_id in sorted(profiles)
+        }),
+        weights=MappingProxyType({
+            disease_names[disease_id]: MappingProxyType(w) for disease_id, w in weights.items()
+        }) if weights else None,
+    )
@@ -0,0 +1,303 @@
+"""
+Streaming import/export of the disease knowledge base.
+Every record is a flat dict with a "type" (see RECORD_TYPES); child records
+refer to their disease and symptom by name, so files can be moved between
+databases. Readers yield one record at a time and the importer upserts them
+in fixed-size chunks, so memory stays flat however large the file is.
+"""
+
+import csv
+import gzip
+import io
+import json
+from dataclasses import dataclass
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import (Disease, DiseaseDiet, DiseaseExercise, DiseaseMedicine, DiseasePrecaution,
+                     DiseaseSymptom, Symptom)
+
+
+@dataclass(frozen=True)
+class RecordType:
+    """How one record type maps to a model: natural key and exported fields, by record name."""
+    model: type
+    key: tuple
+    fields: tuple
+
+
+# In dependency order: diseases and symptoms before the rows that refer to them
+RECORD_TYPES = {
+    'disease': RecordType(Disease, ('name',),
+                          ('name', 'description', 'severity_level', 'specialist_required')),
+    'symptom': RecordType(Symptom, ('name',), ('name', 'description')),
+    'disease_symptom': RecordType(DiseaseSymptom, ('disease', 'symptom'), ('disease', 'symptom', 'weight')),
+    'precaution': RecordType(DiseasePrecaution, ('disease', 'precaution'),
+                             ('disease', 'precaution', 'priority')),
+    'diet': RecordType(DiseaseDiet, ('disease', 'food_item', 'is_recommended'),
+                       ('disease', 'food_item', 'is_recommended', 'description')),
+    'exercise': RecordType(DiseaseExercise, ('disease', 'exercise_name'),
+                           ('disease', 'exercise_name', 'description', 'duration', 'intensity')),
+    'medicine': RecordType(DiseaseMedicine, ('disease', 'medicine_name'),
+                           ('disease', 'medicine_name', 'generic_name', 'dosage', 'description',
+                            'side_effects', 'priority')),
+}
+
+# Record types that change what the prediction engine sees
+KNOWLEDGE_TYPES = {'disease', 'symptom', 'disease_symptom'}
+
+# Foreign keys are written as the related row's name
+REFERENCES = {'disease': Disease, 'symptom': Symptom}
+
+
+def open_text(path, mode='r'):
+    """Open a text file for reading or writing, gzip-compressed if the name ends in .gz."""
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8', newline='')
+    return open(path, mode, encoding='utf-8', newline='')
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    return 'json'
+
+
+def iter_records(fp, fmt, record_type=None):
+    """
+    Yield records from an open file without reading it whole.
+    fmt: 'jsonl' (one object per line), 'json' (an array of objects, or JSON Lines) or 'csv'
+    (one row per record). record_type fills in "type" where the file has none.
+    """
+    if fmt == 'csv':
+        records = iter_csv(fp)
+    elif fmt == 'jsonl':
+        records = iter_json_lines(fp)
+    else:
+        records = iter_json(fp)
+    for record in records:
+        # Anything but an object is passed on for the importer to reject
+        if record_type and isinstance(record, dict) and not record.get('type'):
+            record['type'] = record_type
+        yield record
+
+
+def iter_csv(fp):
+    for row in csv.DictReader(fp):
+        # Empty cells mean "not given", so model defaults apply as they do for JSON
+        yield {k: v for k, v in row.items() if k and v != ''}
+
+
+def iter_json_lines(fp):
+    for line_number, line in enumerate(fp, start=1):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except ValueError as exc:
+                raise ValueError(f'Line {line_number}: {exc}') from None
+
+
+def iter_json(fp, chunk_size=1 << 16):
+    """Decode a top-level JSON array one element at a time; files starting with "{" are read as JSON Lines."""
+    buffer = fp.read(chunk_size).lstrip()
+    if not buffer.startswith('['):
+        yield from iter_json_lines(_chain(buffer, fp))
+        return
+    decoder = json.JSONDecoder()
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip(' \t\r\n,')
+        if buffer.startswith(']'):
+            return
+        try:
+            record, end = decoder.raw_decode(buffer)
+        except ValueError:
+            if eof:
+                raise ValueError('Truncated or malformed JSON array.') from None
+            more = fp.read(chunk_size)
+            eof = not more
+            buffer += more
+            continue
+        yield record
+        buffer = buffer[end:]
+
+
+def _chain(head, fp):
+    """Lines of an already-read head followed by the rest of fp."""
+    yield from io.StringIO(head + fp.readline())
+    yield from fp
+
+
+def export_records(record_types=None, chunk_size=2000):
+    """Yield every record of the given types (all by default), streaming each table with iterator()."""
+    for name in record_types or RECORD_TYPES:
+        spec = RECORD_TYPES[name]
+        columns = [f'{f}__name' if f in REFERENCES else f for f in spec.fields]
+        queryset = spec.model.objects.order_by('pk').values_list(*columns)
+        for values in queryset.iterator(chunk_size=chunk_size):
+            record = {'type': name}
+            record.update(zip(spec.fields, values))
+            yield record
+
+
+class KnowledgeImporter:
+    """
+    Upsert records in chunks; each chunk is one transaction.
+    Rows are matched on the record type's natural key: matches are updated when a field
+    differs, the rest are created. Records whose disease or symptom does not exist are skipped.
+    """
+
+    def __init__(self, chunk_size=1000, on_flush=None):
+        self.chunk_size = chunk_size
+        self.on_flush = on_flush
+        self.pending = {name: {} for name in RECORD_TYPES}
+        self.ids = {name: {} for name in REFERENCES}
+        self.counts = {name: dict.fromkeys(('created', 'updated', 'unchanged', 'skipped'), 0)
+                       for name in RECORD_TYPES}
+        self.errors = []
+        self.rejected = 0
+
+    def add(self, record):
+        """Queue one record, flushing its type once a full chunk is pending."""
+        if not isinstance(record, dict):
+            self._reject(f'not a record: {json.dumps(record)[:50]}')
+            return
+        name = record.get('type')
+        spec = RECORD_TYPES.get(name) if isinstance(name, str) else None
+        if spec is None:
+            self._reject(f'unknown record type {name!r}')
+            return
+        try:
+            values = self._clean(spec, record)
+        except KeyError as exc:
+            self.counts[name]['skipped'] += 1
+            self._reject(f'{name} record without {exc}')
+            return
+        except ValidationError as exc:
+            self.counts[name]['skipped'] += 1
+            self._reject(f'invalid {name} record: {"; ".join(exc.messages)}')
+            return
+        # Later records with the same key replace earlier ones
+        self.pending[name][tuple(values[k] for k in spec.key)] = values
+        if len(self.pending[name]) >= self.chunk_size:
+            self.flush(name)
+
+    def finish(self):
+        for name in RECORD_TYPES:
+            self.flush(name)
+
+    @property
+    def changed(self):
+        return any(counts['created'] or counts['updated'] for counts in self.counts.values())
+
+    @property
+    def changed_knowledge(self):
+        return any(self.counts[name]['created'] or self.counts[name]['updated'] for name in KNOWLEDGE_TYPES)
+
+    def flush(self, name):
+        spec = RECORD_TYPES[name]
+        # Make sure every disease and symptom seen so far exists before rows refer to them
+        for reference in REFERENCES:
+            if reference != name and reference in spec.key and self.pending[reference]:
+                self.flush(reference)
+        rows = self.pending[name]
+        if not rows:
+            return
+        self.pending[name] = {}
+        with transaction.atomic():
+            created, updated, unchanged, skipped = self._upsert(name, spec, rows)
+        counts = self.counts[name]
+        counts['created'] += created
+        counts['updated'] += updated
+        counts['unchanged'] += unchanged
+        counts['skipped'] += skipped
+        if self.on_flush:
+            self.on_flush(name, len(rows))
+
+    def _clean(self, spec, record):
+        """Convert the record's values to Python values for the model (CSV gives strings)."""
+        values = {}
+        for field_name in spec.fields:
+            if field_name in REFERENCES:
+                values[field_name] = str(record[field_name])
+                continue
+            field = spec.model._meta.get_field(field_name)
+            if field_name in record and record[field_name] is not None:
+                values[field_name] = field.to_python(record[field_name])
+            elif field_name in spec.key or not field.has_default() and not field.blank:
+                raise KeyError(field_name)
+            else:
+                values[field_name] = field.get_default()
+        return values
+
+    def _upsert(self, name, spec, rows):
+        model = spec.model
+        attributes = {f: f'{f}_id' if f in REFERENCES else f for f in spec.fields}
+        references = [f for f in spec.key if f in REFERENCES]
+        for reference in references:
+            self._resolve(reference, {values[reference] for values in rows.values()})
+
+        resolved = {}
+        for values in rows.values():
+            row = {}
+            for field_name, value in values.items():
+                if field_name in REFERENCES:
+                    value = self.ids[field_name].get(value)
+                row[attributes[field_name]] = value
+            if all(row[attributes[f]] is not None for f in references):
+                resolved[tuple(row[attributes[k]] for k in spec.key)] = row
+        skipped = len(rows) - len(resolved)
+
+        existing = {}
+        if resolved:
+            key_columns = [attributes[k] for k in spec.key]
+            filters = {f'{column}__in': {key[i] for key in resolved} for i, column in enumerate(key_columns)}
+            for obj in model.objects.filter(**filters):
+                key = tuple(getattr(obj, column) for column in key_columns)
+                if key in resolved:
+                    existing[key] = obj
+
+        to_create, to_update = [], []
+        changed_columns = set()
+        for key, row in resolved.items():
+            obj = existing.get(key)
+            if obj is None:
+                to_create.append(model(**row))
+                continue
+            changed = [column for column, value in row.items() if getattr(obj, column) != value]
+            if changed:
+                for column in changed:
+                    setattr(obj, column, row[column])
+                changed_columns.update(changed)
+                to_update.append(obj)
+        if to_create:
+            model.objects.bulk_create(to_create, batch_size=self.chunk_size)
+        if to_update:
+            model.objects.bulk_update(to_update, sorted(changed_columns), batch_size=self.chunk_size)
+        if name in REFERENCES:
+            self.ids[name].update((obj.name, obj.pk) for obj in existing.values())
+            if to_create:
+                self._resolve(name, {obj.name for obj in to_create})
+        return len(to_create), len(to_update), len(resolved) - len(to_create) - len(to_update), skipped
+
+    def _resolve(self, reference, names):
+        """Look up the ids of names not seen yet, in one query."""
+        ids = self.ids[reference]
+        missing = names - ids.keys()
+        if not missing:
+            return
+        ids.update(REFERENCES[reference].objects.filter(name__in=missing).values_list('name', 'id'))
+        for value in sorted(missing - ids.keys()):
+            self._reject(f'no {reference} named {value!r}')
+
+    def _reject(self, reason):
+        # Keep the first few for the report; the counts cover the rest
+        self.rejected += 1
+        if len(self.errors) < 20:
+            self.errors.append(reason)
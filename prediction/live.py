@@ -0,0 +1,153 @@
+"""
+Live scoring while a patient is still selecting symptoms.
+The check-symptoms page sends each toggle as a delta ({'add': [...], 'remove':
+[...]}) and gets the current top candidates back. Per browser session the
+running state is the selected symptoms plus one array of match counts per
+disease (and matched weights for weighted knowledge), so a toggle only touches
+the diseases that list that symptom instead of rescoring the whole selection.
+The state lives in the Django cache (settings.PREDICTION_LIVE_CACHE) and
+expires after settings.PREDICTION_LIVE_TTL seconds without a toggle; state
+built against older knowledge is recounted from its symptoms.
+The incremental counts reproduce the symptom-matching heuristic that every
+engine except 'bayes' scores with. With the naive Bayes engine configured,
+whose posteriors do not decompose per symptom, the selection is rescored
+with that engine on each update instead, so live candidates always match
+/prediction/predict/.
+"""
+
+import heapq
+import itertools
+from array import array
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .engine import NaiveBayesEngine, score_match
+from .registry import get_model
+
+CACHE_KEY_PREFIX = 'prediction-live'
+
+
+class LiveState:
+    """
+    Selected symptoms and running per-disease match counts for one session.
+    Matched diseases are also grouped by (match count, profile size): without weights every
+    disease in a group has the same score, so ranking scores each group once.
+    """
+
+    __slots__ = ('knowledge_version', 'symptoms', 'counts', 'weights', 'groups')
+
+    def __init__(self, knowledge_version, n_diseases, weighted):
+        self.knowledge_version = knowledge_version
+        self.symptoms = set()
+        # 'H': 2 bytes per disease; a disease cannot match more symptoms than it lists
+        self.counts = array('H', bytes(2 * n_diseases))
+        self.weights = array('d', bytes(8 * n_diseases)) if weighted else None
+        # (match count, profile size) -> ids of the matched diseases in that group
+        self.groups = {}
+
+    def toggle(self, index, symptom, add):
+        """Add or remove one normalized symptom; only the diseases listing it are updated."""
+        if (symptom in self.symptoms) == add:
+            return
+        step = 1 if add else -1
+        counts, groups, sizes = self.counts, self.groups, index.profile_sizes
+        disease_ids = index.postings.get(symptom, ())
+        for disease_id in disease_ids:
+            count = counts[disease_id]
+            size = sizes[disease_id]
+            if count:
+                group = groups[count, size]
+                group.discard(disease_id)
+                if not group:
+                    del groups[count, size]
+            count = counts[disease_id] = count + step
+            if count:
+                groups.setdefault((count, size), set()).add(disease_id)
+        if self.weights is not None and disease_ids:
+            weights = self.weights
+            for disease_id, weight in zip(disease_ids, index.posting_weights[symptom]):
+                weights[disease_id] += step * weight
+        if add:
+            self.symptoms.add(symptom)
+        else:
+            self.symptoms.discard(symptom)
+
+    def top(self, index, k):
+        """Up to k (disease_name, score, match_count), best first, ranked like SymptomIndex.top_k."""
+        n_user = len(self.symptoms)
+        if self.weights is not None:
+            # Weighted scores differ within a group: score every matched disease
+            totals, weights = index.profile_weights, self.weights
+            scored = (
+                (score_match(count, totals[i], n_user, weights[i]), -i, count)
+                for (count, _), ids in self.groups.items() for i in ids
+            )
+            ranked = heapq.nlargest(k, scored)
+        else:
+            ranked = []
+            group_scores = sorted(
+                ((score_match(count, size, n_user), count, ids) for (count, size), ids in self.groups.items()),
+                key=lambda group: group[0], reverse=True,
+            )
+            # Groups with equal scores are merged so ties still go to the lowest disease id
+            for score, groups in itertools.groupby(group_scores, key=lambda group: group[0]):
+                tied = heapq.nsmallest(
+                    k - len(ranked), ((i, count) for _, count, ids in groups for i in ids)
+                )
+                ranked.extend((score, -i, count) for i, count in tied)
+                if len(ranked) >= k:
+                    break
+        return [(index.diseases[-neg_id], score, match_count) for score, neg_id, match_count in ranked]
+
+
+def _cache():
+    return caches[getattr(settings, 'PREDICTION_LIVE_CACHE', 'default')]
+
+
+def _cache_key(session_key):
+    return f'{CACHE_KEY_PREFIX}:{session_key}'
+
+
+def live_update(session_key, add=(), remove=(), reset=False, top_k=5):
+    """
+    Apply one round of toggles to the session's live state and return
+    {'symptoms': [...], 'candidates': [{disease_name, confidence, match_count}], 'restarted': bool}.
+    'restarted' tells the page that the state had expired (or never existed), so it can
+    resend its whole selection with reset.
+    """
+    model = get_model()
+    index = model.get_engine('index')
+    canonicalizer = model.canonicalizer
+    cache = _cache()
+    key = _cache_key(session_key)
+
+    state = None if reset else cache.get(key)
+    restarted = state is None and not reset
+    if state is None or state.knowledge_version != model.knowledge_version:
+        previous = state.symptoms if state is not None else ()
+        state = LiveState(model.knowledge_version, len(index.diseases), index.weighted)
+        for symptom in previous:
+            state.toggle(index, symptom, True)
+
+    for symptom in canonicalizer.canonicalize_all(remove):
+        state.toggle(index, symptom, False)
+    for symptom in canonicalizer.canonicalize_all(add):
+        state.toggle(index, symptom, True)
+    cache.set(key, state, getattr(settings, 'PREDICTION_LIVE_TTL', 900))
+
+    engine = model.get_engine()
+    if isinstance(engine, NaiveBayesEngine):
+        ranked = engine.top_k(frozenset(state.symptoms), top_k) if state.symptoms else []
+    else:
+        ranked = state.top(index, top_k)
+    return {
+        'symptoms': sorted(state.symptoms),
+        'candidates': [
+            # Same rounding as DiseasePredictionModel._build_result
+            {'disease_name': name, 'confidence': round(min(99, score), 2), 'match_count': match_count}
+            for name, score, match_count in ranked
+        ],
+        'restarted': restarted,
+    }
+
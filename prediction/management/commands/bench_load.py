@@ -0,0 +1,252 @@
+"""
+Management command to load-test POST /prediction/predict/ at high concurrency and
+compare the WSGI (sync view, one thread per in-flight request) and ASGI (async
+view on one event loop) request paths.
+- In-process (default): a throwaway test database is seeded with a synthetic
+  catalog; the WSGI handler is driven by --concurrency threads (test Client) and
+  the ASGI handler by --concurrency tasks on one event loop (AsyncClient).
+- Against servers (--url, repeatable): plain HTTP/1.1 keep-alive connections to
+  running deployments, e.g. gunicorn -k gthread Medicate.wsgi vs
+  uvicorn Medicate.asgi:application with PREDICTION_ASYNC_VIEW = True. Requests are
+  authenticated as --username through a session created in the configured database.
+Reports per-request latency percentiles, throughput, status codes and the peak
+number of threads in this process (in-process mode).
+Run: python manage.py bench_load [--concurrency 200] [--requests 5000] [--url http://127.0.0.1:8000 ...]
+"""
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from django.utils.crypto import get_random_string
+
+from prediction.benchmarks import latency_stats, synthetic_catalog, synthetic_queries
+from prediction.management.commands.bench_prediction import Command as BenchPredictionCommand
+
+
+class Command(BenchPredictionCommand):
+    help = 'Load-test the predict endpoint through the WSGI and ASGI request paths.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=200, help='Requests in flight at once.')
+        parser.add_argument('--requests', type=int, default=5000, help='Requests per run.')
+        parser.add_argument('--diseases', type=int, default=1000, help='Synthetic catalog size (in-process mode).')
+        parser.add_argument('--symptoms', type=int, default=2000, help='Symptom vocabulary size (in-process mode).')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--url', action='append', default=[],
+                            help='Base URL of a running deployment to load instead (repeat to compare several).')
+        parser.add_argument('--path', default=None,
+                            help='Endpoint path for --url (default: the predict_disease route).')
+        parser.add_argument('--username', help='Patient account the --url requests are sent as.')
+        parser.add_argument('--json', metavar='PATH', help='Also write the results as JSON to PATH ("-" for stdout only).')
+
+    def handle(self, *args, **options):
+        self.quiet = options['json'] == '-'
+        concurrency = max(1, options['concurrency'])
+        results = {'concurrency': concurrency, 'requests': options['requests'], 'runs': {}}
+
+        if options['url']:
+            if not options['username']:
+                raise CommandError('--url needs --username (a patient account on that deployment).')
+            queries = synthetic_queries(self._live_catalog(), options['requests'], seed=options['seed'] + 1)
+            cookies = self._session_cookies(options['username'])
+            path = options['path'] or reverse('prediction:predict_disease')
+            for url in options['url']:
+                stats = asyncio.run(self._load_url(url.rstrip('/') + path, queries, concurrency, cookies))
+                results['runs'][url] = stats
+                self._report_run(url, stats)
+        else:
+            catalog = synthetic_catalog(options['diseases'], options['symptoms'], seed=options['seed'])
+            queries = synthetic_queries(catalog, options['requests'], seed=options['seed'] + 1)
+            old_name = self._setup_database()
+            try:
+                self._seed_database(catalog)
+                self._write(f'{options["diseases"]} diseases, {len(queries)} requests, concurrency {concurrency}:')
+                for label, run in (('wsgi', self._load_wsgi), ('asgi', self._load_asgi)):
+                    stats = run(queries, concurrency)
+                    results['runs'][label] = stats
+                    self._report_run(label, stats)
+            finally:
+                self._teardown_database(old_name)
+
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        elif options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            self._write(f'Wrote {options["json"]}')
+
+    def _setup_database(self):
+        if connection.vendor == 'sqlite':
+            # A file instead of the shared in-memory database, so concurrent inserts wait for the lock
+            self._db_dir = tempfile.mkdtemp(prefix='bench_load_')
+            connection.settings_dict['TEST']['NAME'] = os.path.join(self._db_dir, 'bench.sqlite3')
+            # Hundreds of concurrent inserts queue up for SQLite's single writer lock
+            connection.settings_dict['OPTIONS'].setdefault('timeout', 60)
+        return super()._setup_database()
+
+    def _teardown_database(self, old_name):
+        super()._teardown_database(old_name)
+        if connection.vendor == 'sqlite':
+            connection.settings_dict['TEST']['NAME'] = None
+            connection.settings_dict['OPTIONS'].pop('timeout', None)
+            os.rmdir(self._db_dir)
+
+    def _load_wsgi(self, queries, concurrency):
+        # The sync view unless PREDICTION_ASYNC_VIEW routes it to the async one (then run under WSGI)
+        url = reverse('prediction:predict_disease')
+        local = threading.local()
+        peak_threads = threading.active_count()
+        # One login shared by every thread's client (SQLite would serialize a session write per thread)
+        cookies = self._login_cookies()
+
+        def post(query):
+            nonlocal peak_threads
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = Client()
+                client.cookies.load(cookies)
+            start = time.perf_counter_ns()
+            response = client.post(url, json.dumps({'symptoms': query}), content_type='application/json')
+            elapsed = time.perf_counter_ns() - start
+            peak_threads = max(peak_threads, threading.active_count())
+            return elapsed, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            outcomes = list(pool.map(post, queries))
+        return self._summarize(outcomes, time.perf_counter() - started, peak_threads)
+
+    def _load_asgi(self, queries, concurrency):
+        url = reverse('prediction:predict_disease_async')
+        peak_threads = threading.active_count()
+
+        cookies = self._login_cookies()
+
+        async def worker(pending, outcomes):
+            nonlocal peak_threads
+            client = AsyncClient()
+            client.cookies.load(cookies)
+            while pending:
+                query = pending.pop()
+                start = time.perf_counter_ns()
+                response = await client.post(url, json.dumps({'symptoms': query}), content_type='application/json')
+                outcomes.append((time.perf_counter_ns() - start, response.status_code))
+                peak_threads = max(peak_threads, threading.active_count())
+
+        async def run():
+            pending = list(reversed(queries))
+            outcomes = []
+            started = time.perf_counter()
+            await asyncio.gather(*(worker(pending, outcomes) for _ in range(concurrency)))
+            return outcomes, time.perf_counter() - started
+
+        outcomes, elapsed = asyncio.run(run())
+        return self._summarize(outcomes, elapsed, peak_threads)
+
+    def _login_cookies(self):
+        client = Client()
+        client.force_login(self.patient)
+        return {name: morsel.value for name, morsel in client.cookies.items()}
+
+    async def _load_url(self, url, queries, concurrency, cookies):
+        parts = urlsplit(url)
+        if parts.scheme != 'http':
+            raise CommandError(f'Only http:// URLs are supported: {url}')
+        host, port = parts.hostname, parts.port or 80
+        cookie_header = '; '.join(f'{name}={value}' for name, value in cookies.items())
+        pending = list(reversed(queries))
+        outcomes = []
+
+        async def worker():
+            reader = writer = None
+            while pending:
+                body = json.dumps({'symptoms': pending.pop()}).encode()
+                request = (
+                    f'POST {parts.path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+                    f'Content-Type: application/json\r\nContent-Length: {len(body)}\r\n'
+                    f'Cookie: {cookie_header}\r\nX-CSRFToken: {cookies[settings.CSRF_COOKIE_NAME]}\r\n'
+                    f'Referer: {url}\r\n\r\n'
+                ).encode() + body
+                start = time.perf_counter_ns()
+                try:
+                    if writer is None:
+                        reader, writer = await asyncio.open_connection(host, port)
+                    writer.write(request)
+                    status, keep_alive = await self._read_response(reader)
+                except (OSError, asyncio.IncompleteReadError, ValueError):
+                    status, keep_alive = 0, False
+                outcomes.append((time.perf_counter_ns() - start, status))
+                if not keep_alive and writer is not None:
+                    writer.close()
+                    reader = writer = None
+            if writer is not None:
+                writer.close()
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return self._summarize(outcomes, time.perf_counter() - started, None)
+
+    async def _read_response(self, reader):
+        """Read one HTTP/1.1 response; returns (status code, whether the connection stays open)."""
+        head = await reader.readuntil(b'\r\n\r\n')
+        lines = head.decode('latin-1').split('\r\n')
+        status = int(lines[0].split()[1])
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        if 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+            return status, headers.get('connection', '').lower() != 'close'
+        # No length: the body runs until the server closes the connection
+        await reader.read()
+        return status, False
+
+    def _session_cookies(self, username):
+        """Session and CSRF cookies for username, created in the configured database."""
+        user = get_user_model().objects.filter(username=username).first()
+        if user is None:
+            raise CommandError(f'No user named {username!r}.')
+        session = import_module(settings.SESSION_ENGINE).SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        return {
+            settings.SESSION_COOKIE_NAME: session.session_key,
+            settings.CSRF_COOKIE_NAME: get_random_string(32),
+        }
+
+    def _live_catalog(self):
+        from prediction.knowledge import load_snapshot
+
+        return {name: list(symptoms) for name, symptoms in load_snapshot().disease_symptom_map.items()}
+
+    def _summarize(self, outcomes, elapsed, peak_threads):
+        stats = latency_stats([ns for ns, _ in outcomes])
+        # Wall-clock throughput of all concurrent requests together
+        stats['throughput_per_s'] = round(len(outcomes) / elapsed, 1) if elapsed else None
+        codes = [status for _, status in outcomes]
+        stats['status_codes'] = {str(code): codes.count(code) for code in sorted(set(codes))}
+        stats['peak_threads'] = peak_threads
+        return stats
+
+    def _report_run(self, label, stats):
+        self._report(label, stats)
+        self._write(
+            f'  {"":<26} status {stats["status_codes"]}'
+            + (f'  peak threads {stats["peak_threads"]}' if stats['peak_threads'] is not None else '')
+        )
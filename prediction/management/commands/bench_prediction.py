@@ -0,0 +1,336 @@
+"""
+Management command to benchmark disease prediction on synthetic catalogs.
+Layers, each timed per call (p50/p95/p99, throughput) with allocations measured in a separate pass:
+- engines: every scoring engine in isolation, the heuristic ones checked against the reference loop first
+- recommendations: get_disease_recommendations() cold (database) and warm (cache)
+- http: predict_disease() and POST /prediction/predict/ end-to-end through the test client
+- batching: concurrent predict_disease() cache misses from --threads threads for each
+  micro-batching window (0 = off), with the batch sizes and queueing delay reached
+The recommendations, http and batching layers run in a throwaway test database seeded with the catalog.
+Run: python manage.py bench_prediction --diseases 10 1000 10000 [--json results.json]
+"""
+import json
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from prediction.benchmarks import (latency_stats, measure_allocations, synthetic_catalog, synthetic_queries,
+                                   time_batch, time_calls)
+from prediction.engine import ENGINES, available_engines, normalize_symptom, np
+
+LAYERS = ('engines', 'recommendations', 'http', 'batching')
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the prediction engines, recommendation fetch and predict endpoint on synthetic catalogs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--diseases', type=int, nargs='+', default=[10, 1000, 10000],
+                            help='Catalog sizes (number of diseases) to benchmark.')
+        parser.add_argument('--symptoms', type=int, default=2000, help='Symptom vocabulary size.')
+        parser.add_argument('--per-disease', type=int, default=20, help='Mean symptoms per disease.')
+        parser.add_argument('--selected', type=int, nargs=2, default=[2, 6], metavar=('MIN', 'MAX'),
+                            help='Range of symptoms selected per query.')
+        parser.add_argument('--queries', type=int, default=500, help='Queries per catalog.')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--engines', nargs='+', choices=list(ENGINES),
+                            help='Engines to time (default: every available one).')
+        parser.add_argument('--batch-windows', type=float, nargs='+', default=[0, 1, 2, 5], metavar='MS',
+                            help='Micro-batching windows to compare in the batching layer (0 = off).')
+        parser.add_argument('--threads', type=int, default=16, help='Concurrent callers in the batching layer.')
+        parser.add_argument('--layers', nargs='+', choices=LAYERS, default=list(LAYERS),
+                            help='What to benchmark (default: all).')
+        parser.add_argument('--json', metavar='PATH',
+                            help='Also write the results as JSON to PATH ("-" for stdout only).')
+
+    def handle(self, *args, **options):
+        engines = options['engines'] or available_engines()
+        missing = set(engines) - set(available_engines())
+        if missing:
+            raise CommandError(f'Not available here: {", ".join(sorted(missing))} (NumPy missing?).')
+        # With JSON on stdout, the readable report would corrupt it
+        self.quiet = options['json'] == '-'
+        layers = options['layers']
+        results = {
+            'meta': {
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'numpy': np.__version__ if np is not None else None,
+                'platform': platform.platform(),
+                'timestamp': time.time(),
+                'options': {k: options[k] for k in ('symptoms', 'per_disease', 'selected', 'queries', 'seed')},
+            },
+            'catalogs': [],
+        }
+
+        uses_db = bool({'recommendations', 'http', 'batching'} & set(layers))
+        if uses_db:
+            old_name = self._setup_database()
+        try:
+            for n_diseases in options['diseases']:
+                catalog = synthetic_catalog(
+                    n_diseases, options['symptoms'], options['per_disease'], seed=options['seed']
+                )
+                raw_queries = synthetic_queries(
+                    catalog, options['queries'], tuple(options['selected']), seed=options['seed'] + 1
+                )
+                queries = [set(normalize_symptom(s) for s in q) for q in raw_queries]
+                entry = {'diseases': n_diseases, 'queries': len(queries)}
+                self._write(f'{n_diseases} diseases, {len(queries)} queries:')
+                if 'engines' in layers:
+                    entry['engines'] = self.bench_engines(catalog, queries, engines)
+                if uses_db:
+                    self._seed_database(catalog)
+                    if 'recommendations' in layers:
+                        entry['recommendations'] = self.bench_recommendations(raw_queries)
+                    if 'http' in layers:
+                        entry['predict'] = self.bench_predict(raw_queries)
+                        entry['http'] = self.bench_http(raw_queries)
+                    if 'batching' in layers:
+                        entry['batching'] = self.bench_batching(
+                            raw_queries, options['batch_windows'], options['threads']
+                        )
+                results['catalogs'].append(entry)
+        finally:
+            if uses_db:
+                self._teardown_database(old_name)
+
+        if options['json'] == '-':
+            self.stdout.write(json.dumps(results, indent=2))
+        elif options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump(results, f, indent=2)
+            self._write(f'Wrote {options["json"]}')
+
+    def bench_engines(self, catalog, queries, engines):
+        built = {name: ENGINES[name](catalog) for name in set(engines) | {'loop'}}
+        expected = built['loop'].best_many(queries)
+        for name in engines:
+            # Trained engines are a different model, not another implementation of the heuristic
+            if getattr(ENGINES[name], 'trainable', False):
+                continue
+            if built[name].best_many(queries) != expected:
+                raise CommandError(f'Engine "{name}" disagrees with the reference loop.')
+
+        baseline = latency_stats(time_calls(built['loop'].best, queries))['mean_us']
+        results = {}
+        for name in engines:
+            engine = built[name]
+            stats = latency_stats(time_calls(engine.best, queries))
+            stats['speedup_vs_loop'] = round(baseline / stats['mean_us'], 2) if stats['mean_us'] else None
+            stats['allocations'] = measure_allocations(engine.best, queries)
+            results[name] = stats
+            self._report(name, stats)
+            if name == 'matrix':
+                per_query_us = time_batch(engine.best_many, queries) * 1e6
+                batch = {
+                    'mean_us': round(per_query_us, 3),
+                    'throughput_per_s': round(1e6 / per_query_us, 1) if per_query_us else None,
+                    'speedup_vs_loop': round(baseline / per_query_us, 2) if per_query_us else None,
+                }
+                results['matrix_batch'] = batch
+                self._write(
+                    f'  {"matrix (batch)":<26} mean {batch["mean_us"]:9.1f} us  '
+                    f'{batch["throughput_per_s"]:>10,.0f}/s  {batch["speedup_vs_loop"]:6.1f}x vs loop'
+                )
+        return results
+
+    def bench_recommendations(self, raw_queries):
+        from prediction.cache import recommendation_cache, serialize_recommendations
+        from prediction.ml_model import get_disease_recommendations, predict_disease
+        from prediction.models import Disease
+
+        names = []
+        for query in raw_queries:
+            prediction = predict_disease(query)
+            if prediction and isinstance(prediction['disease'], Disease):
+                names.append(prediction['disease'].name)
+        diseases = list(Disease.objects.filter(name__in=set(names)))
+        by_name = {d.name: d for d in diseases}
+        predicted = [by_name[name] for name in names]
+
+        def cold(disease):
+            # One disease's rows straight from the database, as on a cache miss
+            serialize_recommendations(Disease.objects.prefetch_related(*recommendation_cache.relations)
+                                      .get(pk=disease.pk))
+
+        # The first lookup loads every disease's bundle
+        recommendation_cache.invalidate()
+        started = time.perf_counter()
+        if predicted:
+            get_disease_recommendations(predicted[0])
+        bulk_load = time.perf_counter() - started
+
+        results = {'bulk_load_seconds': round(bulk_load, 6)}
+        for label, func in (('cold', cold), ('warm', get_disease_recommendations)):
+            stats = latency_stats(time_calls(func, predicted))
+            stats['allocations'] = measure_allocations(func, predicted)
+            results[label] = stats
+            self._report(f'recommendations {label}', stats)
+        self._write(f'  {"recommendations load":<26} {bulk_load * 1e3:9.1f} ms (whole cache)')
+        return results
+
+    def bench_predict(self, raw_queries):
+        from prediction.ml_model import predict_disease
+        from prediction.registry import get_model
+
+        model = get_model()
+        results = {}
+        model.cache.clear()
+        # Unique queries first so every call misses the memo, then the same ones again as hits
+        unique = list({frozenset(normalize_symptom(s) for s in q): q for q in raw_queries}.values())
+        stats = latency_stats(time_calls(predict_disease, unique, warmup=0))
+        results['miss'] = stats
+        self._report('predict_disease miss', stats)
+        stats = latency_stats(time_calls(predict_disease, raw_queries))
+        stats['allocations'] = measure_allocations(predict_disease, raw_queries)
+        results['hit'] = stats
+        self._report('predict_disease hit', stats)
+        return results
+
+    def bench_http(self, raw_queries):
+        client = Client()
+        client.force_login(self.patient)
+        url = reverse('prediction:predict_disease')
+        codes = []
+
+        def post(query):
+            response = client.post(url, json.dumps({'symptoms': query}), content_type='application/json')
+            codes.append(response.status_code)
+
+        stats = latency_stats(time_calls(post, raw_queries))
+        # Status codes of the timed calls only (not the warmup)
+        timed = codes[-len(raw_queries):]
+        stats['status_codes'] = {str(code): timed.count(code) for code in sorted(set(timed))}
+        stats['allocations'] = measure_allocations(post, raw_queries[:100])
+        self._report('POST /prediction/predict/', stats)
+        return stats
+
+    def bench_batching(self, raw_queries, windows, threads):
+        from prediction.batching import batcher_stats, reset_batcher
+        from prediction.ml_model import predict_disease
+        from prediction.registry import get_model
+
+        # Batching only pays off with a vectorized engine
+        engine = 'matrix' if 'matrix' in available_engines() else getattr(settings, 'PREDICTION_ENGINE', 'index')
+        unique = list({frozenset(normalize_symptom(s) for s in q): q for q in raw_queries}.values())
+        clock = time.perf_counter_ns
+
+        def call(query):
+            start = clock()
+            predict_disease(query)
+            return clock() - start
+
+        results = {'engine': engine, 'threads': threads}
+        for window in windows:
+            with override_settings(PREDICTION_ENGINE=engine, PREDICTION_BATCH_WINDOW_MS=window):
+                reset_batcher()
+                model = get_model()
+                model.get_engine()
+                model.cache.clear()
+                started = time.perf_counter()
+                with ThreadPoolExecutor(threads) as pool:
+                    samples = list(pool.map(call, unique))
+                elapsed = time.perf_counter() - started
+                stats = latency_stats(samples)
+                # Wall-clock throughput of all threads together
+                stats['throughput_per_s'] = round(len(samples) / elapsed, 1) if elapsed else None
+                stats['batching'] = batcher_stats()
+                reset_batcher()
+            results[f'window_{window:g}ms'] = stats
+            batching = stats['batching']
+            self._report(f'{threads} threads, {window:g} ms window', stats)
+            if batching:
+                self._write(
+                    f'  {"":<26} mean batch {batching["mean_batch_size"]}  '
+                    f'queue delay p50 {batching["queue_delay_us"]["p50"]:.1f} us  '
+                    f'p95 {batching["queue_delay_us"]["p95"]:.1f} us'
+                )
+        return results
+
+    def _setup_database(self):
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        from accounts.models import PatientProfile, User
+
+        self.patient = User.objects.create_user(
+            username='bench_patient', email='bench@example.com', password='x', user_type='patient'
+        )
+        PatientProfile.objects.create(
+            user=self.patient, date_of_birth='1990-01-01', gender='other', address='-', emergency_contact='-'
+        )
+        return old_name
+
+    def _teardown_database(self, old_name):
+        from prediction.registry import reset_model
+
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+        reset_model()
+
+    def _seed_database(self, catalog):
+        """Replace the test database's knowledge with the catalog, plus a few recommendations per disease."""
+        from prediction.cache import disease_cache, recommendation_cache
+        from prediction.knowledge import bump_version
+        from prediction.models import (Disease, DiseaseDiet, DiseaseExercise, DiseaseMedicine, DiseasePrecaution,
+                                       DiseaseSymptom, PredictionHistory, Symptom)
+        from prediction.registry import refresh_model
+
+        with connection.cursor() as cursor:
+            # Plain DELETEs: queryset deletes would fire a signal per row
+            for model in (PredictionHistory, DiseaseSymptom, DiseasePrecaution, DiseaseDiet, DiseaseExercise,
+                          DiseaseMedicine, Disease, Symptom):
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+
+        Disease.objects.bulk_create(
+            Disease(name=name, description=f'{name} description', severity_level='moderate',
+                    specialist_required='General Physician')
+            for name in catalog
+        )
+        vocabulary = sorted({s for profile in catalog.values() for s in profile})
+        Symptom.objects.bulk_create(Symptom(name=s) for s in vocabulary)
+        disease_ids = dict(Disease.objects.values_list('name', 'id'))
+        symptom_ids = dict(Symptom.objects.values_list('name', 'id'))
+        DiseaseSymptom.objects.bulk_create(
+            (DiseaseSymptom(disease_id=disease_ids[name], symptom_id=symptom_ids[s])
+             for name, profile in catalog.items() for s in set(profile)),
+            batch_size=2000,
+        )
+        ids = list(disease_ids.values())
+        DiseasePrecaution.objects.bulk_create(
+            (DiseasePrecaution(disease_id=pk, precaution=f'Precaution {i}', priority=i)
+             for pk in ids for i in range(1, 4)), batch_size=2000)
+        DiseaseDiet.objects.bulk_create(
+            (DiseaseDiet(disease_id=pk, food_item=f'Food {i}', is_recommended=i % 2 == 0)
+             for pk in ids for i in range(2)), batch_size=2000)
+        DiseaseExercise.objects.bulk_create(
+            (DiseaseExercise(disease_id=pk, exercise_name='Walking', description='-', duration='20 min',
+                             intensity='light') for pk in ids), batch_size=2000)
+        DiseaseMedicine.objects.bulk_create(
+            (DiseaseMedicine(disease_id=pk, medicine_name='Medicine', dosage='-', description='-')
+             for pk in ids), batch_size=2000)
+
+        bump_version()
+        refresh_model()
+        disease_cache.invalidate()
+        recommendation_cache.invalidate()
+
+    def _report(self, label, stats):
+        self._write(
+            f'  {label:<26} mean {stats["mean_us"]:9.1f} us  p50 {stats["p50_us"]:9.1f}  '
+            f'p95 {stats["p95_us"]:9.1f}  p99 {stats["p99_us"]:9.1f}  {stats["throughput_per_s"]:>10,.0f}/s'
+            + (f'  {stats["speedup_vs_loop"]:6.1f}x vs loop' if 'speedup_vs_loop' in stats else '')
+            + (f'  peak {stats["allocations"]["peak_bytes"] / 1024:8.1f} KiB' if 'allocations' in stats else '')
+        )
+
+    def _write(self, line):
+        if not self.quiet:
+            self.stdout.write(line)
@@ -0,0 +1,81 @@
+"""
+Management command to measure what a fresh worker pays to start: django.setup(),
+importing the prediction views (as URL loading does) and the first fallback lookup.
+Each run is a new Python process so nothing is already imported or cached.
+Run: python manage.py bench_startup [--runs 5]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in the child process; prints one JSON object
+CHILD = r'''
+import json, resource, sys, time
+
+def rss_bytes():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * resource.getpagesize()
+    except OSError:
+        # Peak rather than current RSS, in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+started = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+rss_setup = rss_bytes()
+import prediction.views
+import_done = time.perf_counter()
+rss_import = rss_bytes()
+from prediction.ml_model import get_fallback_disease_info
+get_fallback_disease_info('GERD')
+lookup_done = time.perf_counter()
+print(json.dumps({
+    'setup_seconds': setup_done - started,
+    'import_seconds': import_done - setup_done,
+    'first_fallback_seconds': lookup_done - import_done,
+    'rss_setup_bytes': rss_setup,
+    'rss_import_bytes': rss_import,
+    'rss_fallback_bytes': rss_bytes(),
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure worker import time and resident memory of the prediction app in fresh processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5, help='Fresh processes to start.')
+        parser.add_argument('--json', action='store_true', help='Print the medians as JSON.')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        runs = []
+        for _ in range(options['runs']):
+            result = subprocess.run(
+                [sys.executable, '-c', CHILD], env=env, capture_output=True, text=True,
+                cwd=settings.BASE_DIR,
+            )
+            if result.returncode:
+                raise CommandError(f'Startup probe failed:\n{result.stderr}')
+            runs.append(json.loads(result.stdout.strip().splitlines()[-1]))
+
+        medians = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+        if options['json']:
+            self.stdout.write(json.dumps(medians, indent=2))
+            return
+        self.stdout.write(f'Median of {len(runs)} fresh process(es):')
+        self.stdout.write(f'  django.setup()            {medians["setup_seconds"] * 1e3:8.1f} ms')
+        self.stdout.write(f'  import prediction.views   {medians["import_seconds"] * 1e3:8.1f} ms')
+        self.stdout.write(f'  first fallback lookup     {medians["first_fallback_seconds"] * 1e3:8.1f} ms')
+        mib = 1024 * 1024
+        self.stdout.write(f'  RSS after setup           {medians["rss_setup_bytes"] / mib:8.1f} MiB')
+        self.stdout.write(f'  RSS after views import    {medians["rss_import_bytes"] / mib:8.1f} MiB')
+        self.stdout.write(f'  RSS after first fallback  {medians["rss_fallback_bytes"] / mib:8.1f} MiB')
@@ -0,0 +1,58 @@
+"""
+Management command to compile the disease–symptom knowledge into the on-disk
+model artifact that workers memory-map (settings.PREDICTION_MODEL_ARTIFACT).
+An artifact already at the current knowledge version is left alone unless --force.
+Run: python manage.py build_prediction_model [--output prediction_model.bin] [--force]
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from prediction.artifact import ArtifactError, MappedEngine, read_header, write_artifact
+from prediction.knowledge import current_version, load_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Compile the prediction model into a memory-mappable artifact file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Artifact path (default: settings.PREDICTION_MODEL_ARTIFACT).')
+        parser.add_argument('--force', action='store_true', help='Rewrite the artifact even if it is up to date.')
+
+    def handle(self, *args, **options):
+        path = options['output'] or getattr(settings, 'PREDICTION_MODEL_ARTIFACT', None)
+        if not path:
+            raise CommandError('Pass --output or set PREDICTION_MODEL_ARTIFACT.')
+        path = str(path)
+
+        if not options['force']:
+            try:
+                header = read_header(path)
+            except ArtifactError:
+                header = None
+            if header and header['knowledge_version'] == current_version():
+                self.stdout.write(f'{path} is up to date (knowledge version {header["knowledge_version"]}).')
+                return
+
+        started = time.perf_counter()
+        snapshot = load_snapshot()
+        loaded = time.perf_counter()
+        try:
+            size = write_artifact(
+                path, snapshot.disease_symptom_map, snapshot.weights, snapshot.version, snapshot.source
+            )
+        except (ImportError, OSError) as exc:
+            raise CommandError(f'Cannot write {path}: {exc}')
+        written = time.perf_counter()
+        engine = MappedEngine(path)
+        opened = time.perf_counter()
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {path}: {len(engine.diseases)} diseases, {len(engine.symptom_ids)} symptoms, '
+            f'{len(engine.indices)} links, {size / 1024:.1f} KiB, knowledge version {engine.knowledge_version} '
+            f'({snapshot.source}).'
+        ))
+        self.stdout.write(
+            f'  load {loaded - started:.3f}s, compile+write {written - loaded:.3f}s, '
+            f'open {(opened - written) * 1e3:.2f} ms'
+        )
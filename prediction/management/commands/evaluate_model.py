@@ -0,0 +1,143 @@
+"""
+Management command to measure the accuracy and latency of every scoring engine
+on a labeled CSV of (symptoms, true disease) cases.
+Reports top-1/top-3 accuracy, per-case latency percentiles, batched scoring cost
+(engines with top_k_many) and the diseases with the lowest recall together with
+what they were mistaken for. With --folds K the cases are split into K shuffled
+folds evaluated in parallel worker processes, giving the spread of the accuracy
+across folds as well as the pooled totals; fresh engines are built for every fold
+and trainable ones ('bayes') are trained on the other K-1 folds. Without folds the
+serving model's engines are evaluated as they are, so 'bayes' uses the weights in
+settings.PREDICTION_BAYES_MODEL.
+Run: python manage.py evaluate_model cases.csv [--engines index bitset] [--folds 5] [--json results.json]
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prediction.engine import ENGINES, available_engines
+from prediction.evaluation import evaluate_engine, evaluate_fold, pool_folds, read_cases, split_folds
+from prediction.registry import get_model
+
+
+class Command(BaseCommand):
+    help = 'Evaluate the scoring engines on a labeled CSV of symptom cases.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('cases', help='CSV with a symptoms column and a true disease column.')
+        parser.add_argument('--symptom-column', default='symptoms')
+        parser.add_argument('--label-column', default='disease')
+        parser.add_argument('--separator', default=';',
+                            help='Separator of the symptom names when the cell is not a JSON list.')
+        parser.add_argument('--engines', nargs='+', choices=list(ENGINES),
+                            help='Engines to evaluate (default: all available).')
+        parser.add_argument('--folds', type=int, default=1, help='Number of k-fold splits (1 = all cases at once).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes for the folds.')
+        parser.add_argument('--seed', type=int, default=0, help='Shuffle seed for the folds.')
+        parser.add_argument('--show', type=int, default=10,
+                            help='Number of lowest-recall diseases to list per engine.')
+        parser.add_argument('--json', dest='json_path', help='Also write the full results as JSON ("-" for stdout).')
+
+    def handle(self, *args, **options):
+        engine_names = options['engines'] or available_engines()
+        unavailable = set(engine_names) - set(available_engines())
+        if unavailable:
+            raise CommandError(f'Not available here (NumPy missing?): {", ".join(sorted(unavailable))}')
+        model = get_model()
+        snapshot = model.snapshot
+        # Symptom names go through the same canonicalizer as predict()
+        canonicalizer = model.canonicalizer
+        try:
+            with open(options['cases'], newline='', encoding='utf-8') as f:
+                cases = list(read_cases(f, options['symptom_column'], options['label_column'], options['separator'],
+                                        canonicalizer))
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["cases"]}: {exc}')
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        if not cases:
+            raise CommandError('No labeled cases found.')
+        folds = options['folds']
+        if not 1 <= folds <= len(cases):
+            raise CommandError(f'--folds must be between 1 and the number of cases ({len(cases)}).')
+
+        started = time.perf_counter()
+        if folds == 1:
+            results = {name: evaluate_engine(model.get_engine(name), cases) for name in engine_names}
+        else:
+            # Plain dicts and tuples only cross the process boundary
+            disease_symptom_map = dict(snapshot.disease_symptom_map)
+            weights = {k: dict(v) for k, v in snapshot.weights.items()} if snapshot.weights else None
+            workers = max(1, min(options['workers'], folds))
+            splits = split_folds(cases, folds, options['seed'])
+            with ProcessPoolExecutor(workers) as pool:
+                fold_results = list(pool.map(
+                    evaluate_fold,
+                    *zip(*[(disease_symptom_map, weights, engine_names, fold,
+                            [case for j, other in enumerate(splits) if j != i for case in other])
+                           for i, fold in enumerate(splits)])
+                ))
+            results = {name: pool_folds([fold[name] for fold in fold_results]) for name in engine_names}
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f'{len(cases)} cases, {len(snapshot.disease_symptom_map)} diseases '
+            f'(knowledge version {snapshot.version}, {snapshot.source}), '
+            f'{folds} fold(s), {elapsed:.2f}s'
+        )
+        for name in engine_names:
+            self._report(name, results[name], options['show'])
+
+        if options['json_path']:
+            data = {
+                'cases_file': options['cases'],
+                'cases': len(cases),
+                'folds': folds,
+                'seed': options['seed'],
+                'knowledge_version': snapshot.version,
+                'knowledge_source': snapshot.source,
+                'elapsed_seconds': round(elapsed, 3),
+                'engines': results,
+            }
+            if options['json_path'] == '-':
+                json.dump(data, sys.stdout, indent=2)
+                sys.stdout.write('\n')
+            else:
+                with open(options['json_path'], 'w', encoding='utf-8') as f:
+                    json.dump(data, f, indent=2)
+                self.stdout.write(self.style.SUCCESS(f'Wrote {options["json_path"]}.'))
+
+    def _report(self, name, result, show):
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{name}:'))
+        line = f'  top-1 {result["top1_accuracy"]:.2%}  top-3 {result["top3_accuracy"]:.2%}'
+        if 'folds' in result:
+            line += (f'  (across folds: top-1 ±{result["top1_accuracy_std"]:.2%}, '
+                     f'top-3 ±{result["top3_accuracy_std"]:.2%})')
+        self.stdout.write(line)
+        self.stdout.write(f'  no prediction: {result["no_prediction"]}  '
+                          f'labels unknown to the knowledge base: {result["unknown_labels"]}')
+        latencies = result.get('latency_by_fold', [result.get('latency')])
+        for i, latency in enumerate(latencies, start=1):
+            label = f'fold {i} latency' if len(latencies) > 1 else 'latency'
+            self.stdout.write(
+                f'  {label} µs: p50 {latency["p50_us"]}  p95 {latency["p95_us"]}  '
+                f'p99 {latency["p99_us"]}  max {latency["max_us"]}'
+            )
+        if 'batch_us_per_case' in result:
+            self.stdout.write(f'  batched: {result["batch_us_per_case"]} µs/case')
+
+        worst = sorted(
+            (item for item in result['per_disease'].items() if item[1]['recall'] is not None),
+            key=lambda item: (item[1]['recall'], -item[1]['support']),
+        )[:show]
+        for label, entry in worst:
+            if entry['recall'] == 1:
+                break
+            confused = ', '.join(f'{guess or "(none)"} ×{count}' for guess, count in entry['confused_with'][:3])
+            self.stdout.write(f'    {label}: recall {entry["recall"]:.0%} of {entry["support"]}'
+                              + (f' -> {confused}' if confused else ''))
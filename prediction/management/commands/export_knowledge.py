@@ -0,0 +1,46 @@
+"""
+Management command to export diseases, symptoms, disease-symptom links and
+recommendations as JSON Lines, one record per line, in the format import_knowledge reads.
+Tables are streamed with QuerySet.iterator(), so memory stays constant.
+Run: python manage.py export_knowledge catalog.jsonl [--types disease precaution]
+     python manage.py export_knowledge - > catalog.jsonl
+"""
+import json
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from prediction.knowledge_io import RECORD_TYPES, export_records, open_text
+
+
+class Command(BaseCommand):
+    help = 'Stream diseases, symptoms and recommendations to a JSON Lines file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', nargs='?', default='-',
+                            help='Output file (.jsonl or .jsonl.gz); "-" writes to stdout.')
+        parser.add_argument('--types', nargs='+', choices=list(RECORD_TYPES),
+                            help='Record types to export (default: all).')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Rows fetched per database round trip.')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        # Keep stdout clean for the data when exporting to it
+        report = self.stderr if output == '-' else self.stdout
+        started = time.perf_counter()
+        written = 0
+        fp = sys.stdout if output == '-' else open_text(output, 'w')
+        try:
+            for record in export_records(options['types'], options['chunk_size']):
+                fp.write(json.dumps(record, ensure_ascii=False))
+                fp.write('\n')
+                written += 1
+        finally:
+            if fp is not sys.stdout:
+                fp.close()
+        elapsed = time.perf_counter() - started
+        report.write(self.style.SUCCESS(
+            f'Exported {written} record(s) in {elapsed:.3f}s ({written / elapsed if elapsed else 0:,.0f} rows/s).'
+        ))
@@ -0,0 +1,80 @@
+"""
+Management command to import diseases, symptoms, disease-symptom links and
+recommendations from JSON Lines, JSON array or CSV files (optionally .gz).
+Records are read one at a time and upserted on their natural key in chunks,
+one transaction per chunk, so files of any size load in constant memory.
+Run: python manage.py import_knowledge catalog.jsonl [--chunk-size 1000]
+     python manage.py import_knowledge precautions.csv --type precaution
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from prediction.autocomplete import symptom_autocomplete
+from prediction.cache import disease_cache, recommendation_cache
+from prediction.extraction import symptom_extractor
+from prediction.knowledge import bump_version
+from prediction.knowledge_io import RECORD_TYPES, KnowledgeImporter, detect_format, iter_records, open_text
+
+
+class Command(BaseCommand):
+    help = 'Stream diseases, symptoms and recommendations from JSON Lines/JSON/CSV files into the database.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('files', nargs='+', help='Files to import, in order.')
+        parser.add_argument('--format', choices=['jsonl', 'json', 'csv'],
+                            help='File format (default: from the file extension).')
+        parser.add_argument('--type', choices=list(RECORD_TYPES),
+                            help='Record type for files whose records have no "type" (e.g. a plain diseases.csv).')
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Records per upsert transaction.')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+        started = time.perf_counter()
+        self.flushed = 0
+
+        def on_flush(name, count):
+            self.flushed += count
+            if verbosity >= 2:
+                elapsed = time.perf_counter() - started
+                self.stdout.write(f'  {name}: {count} record(s), {self.flushed / elapsed:,.0f} rows/s so far')
+
+        importer = KnowledgeImporter(options['chunk_size'], on_flush=on_flush)
+        read = 0
+        for path in options['files']:
+            fmt = options['format'] or detect_format(path)
+            try:
+                with open_text(path) as fp:
+                    for record in iter_records(fp, fmt, options['type']):
+                        importer.add(record)
+                        read += 1
+            except OSError as exc:
+                raise CommandError(f'Cannot read {path}: {exc}')
+            except ValueError as exc:
+                raise CommandError(f'{path}: {exc}')
+        importer.finish()
+        if importer.changed_knowledge:
+            # bulk_create/bulk_update skip model signals, so tell the workers directly
+            bump_version()
+        if importer.changed:
+            # Those signals also clear the per-process caches (call_command may run in a server process)
+            disease_cache.invalidate()
+            recommendation_cache.invalidate()
+            symptom_autocomplete.invalidate()
+            symptom_extractor.invalidate()
+        elapsed = time.perf_counter() - started
+
+        for name, counts in importer.counts.items():
+            if any(counts.values()):
+                self.stdout.write(
+                    f'{name}: {counts["created"]} created, {counts["updated"]} updated, '
+                    f'{counts["unchanged"]} unchanged, {counts["skipped"]} skipped'
+                )
+        for error in importer.errors:
+            self.stderr.write(f'  {error}')
+        if importer.rejected > len(importer.errors):
+            self.stderr.write(f'  ... and {importer.rejected - len(importer.errors)} more')
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {read} record(s) in {elapsed:.3f}s ({read / elapsed if elapsed else 0:,.0f} rows/s).'
+        ))
@@ -0,0 +1,186 @@
+"""
+Management command to re-score every PredictionHistory row against the current
+disease–symptom knowledge and report how the predictions would change.
+Rows are streamed in primary-key order with .iterator() and scored in chunks by a
+ProcessPoolExecutor (one engine per worker); only a bounded number of chunks is in
+flight. Changed rows are appended to a CSV and a checkpoint (last finished row, CSV
+length and the running statistics) is saved after every chunk, so --resume continues
+where an interrupted run stopped.
+Run: python manage.py rescore_history [--output rescore_history.csv] [--workers 8] [--resume]
+"""
+import csv
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from prediction.engine import ENGINES, available_engines
+from prediction.ml_model import symptom_aliases, symptom_typo_min_length
+from prediction.models import PredictionHistory
+from prediction.registry import get_model
+from prediction.rescoring import (DELTA_BUCKETS, init_worker, merge_stats, new_stats, rescore_chunk,
+                                  stats_from_json, stats_to_json)
+
+CSV_HEADER = ('prediction_id', 'old_disease', 'new_disease', 'old_confidence', 'new_confidence')
+
+
+class Command(BaseCommand):
+    help = 'Re-score PredictionHistory with the current knowledge and write diff statistics.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default='rescore_history.csv',
+                            help='CSV of the rows whose top disease or confidence changed.')
+        parser.add_argument('--checkpoint', help='Checkpoint file (default: OUTPUT.checkpoint.json).')
+        parser.add_argument('--resume', action='store_true', help='Continue from the checkpoint.')
+        parser.add_argument('--engine', choices=list(ENGINES),
+                            help='Scoring engine (default: settings.PREDICTION_ENGINE).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Worker processes (1 scores in this process).')
+        parser.add_argument('--chunk-size', type=int, default=2000, help='Rows per work unit.')
+
+    def handle(self, *args, **options):
+        engine_name = options['engine'] or getattr(settings, 'PREDICTION_ENGINE', 'index')
+        if engine_name not in available_engines():
+            raise CommandError(f'Engine "{engine_name}" is not available here (NumPy missing?).')
+        output = options['output']
+        checkpoint_path = options['checkpoint'] or f'{output}.checkpoint.json'
+        # Same knowledge and engines as the views score with
+        model = get_model()
+        snapshot = model.snapshot
+
+        checkpoint = self._load_checkpoint(checkpoint_path) if options['resume'] else None
+        if checkpoint:
+            if checkpoint['knowledge_version'] != snapshot.version or checkpoint['engine'] != engine_name:
+                raise CommandError(
+                    'The checkpoint was written for another knowledge version or engine; run without --resume.'
+                )
+            last_pk = checkpoint['last_pk']
+            stats = stats_from_json(checkpoint['stats'])
+            self.stdout.write(f'Resuming after prediction {last_pk} ({stats["rows"]} rows already scored).')
+        else:
+            last_pk = 0
+            stats = new_stats()
+        elapsed_before = checkpoint['elapsed_seconds'] if checkpoint else 0.0
+
+        rows = (
+            PredictionHistory.objects.filter(pk__gt=last_pk).order_by('pk')
+            .values_list('pk', 'symptoms', 'predicted_disease__name', 'disease_name', 'confidence_score')
+            .iterator(chunk_size=options['chunk_size'])
+        )
+        workers = max(1, options['workers'])
+        init_args = (dict(snapshot.disease_symptom_map),
+                     {k: dict(v) for k, v in snapshot.weights.items()} if snapshot.weights else None,
+                     engine_name, symptom_aliases(), symptom_typo_min_length(),
+                     # The trained naive Bayes weights (PREDICTION_BAYES_MODEL) are loaded once here;
+                     # the heuristic engines are compiled from the map in each worker
+                     model.get_engine('bayes') if engine_name == 'bayes' else None)
+        started = time.perf_counter()
+        mode = 'a' if checkpoint else 'w'
+        with open(output, mode, newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            if checkpoint:
+                # Drop rows written after the last checkpoint (a crash between the two writes)
+                f.truncate(checkpoint['output_bytes'])
+            else:
+                writer.writerow(CSV_HEADER)
+
+            def finish(chunk_last_pk, result):
+                nonlocal last_pk
+                part, changes = result
+                merge_stats(stats, part)
+                writer.writerows(changes)
+                f.flush()
+                last_pk = chunk_last_pk
+                self._save_checkpoint(checkpoint_path, {
+                    'knowledge_version': snapshot.version,
+                    'engine': engine_name,
+                    'last_pk': last_pk,
+                    'output_bytes': f.tell(),
+                    'elapsed_seconds': elapsed_before + time.perf_counter() - started,
+                    'stats': stats_to_json(stats),
+                })
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'  {stats["rows"]} rows scored (up to prediction {last_pk})')
+
+            if workers == 1:
+                init_worker(*init_args)
+                for chunk in self._chunks(rows, options['chunk_size']):
+                    finish(chunk[-1][0], rescore_chunk(chunk))
+            else:
+                with ProcessPoolExecutor(workers, initializer=init_worker, initargs=init_args) as pool:
+                    pending = deque()
+                    for chunk in self._chunks(rows, options['chunk_size']):
+                        pending.append((chunk[-1][0], pool.submit(rescore_chunk, chunk)))
+                        # Bounded memory: at most two chunks per worker in flight; finishing them
+                        # in submission order keeps the checkpoint a contiguous prefix
+                        while len(pending) >= 2 * workers:
+                            chunk_last_pk, future = pending.popleft()
+                            finish(chunk_last_pk, future.result())
+                    while pending:
+                        chunk_last_pk, future = pending.popleft()
+                        finish(chunk_last_pk, future.result())
+
+        elapsed = elapsed_before + time.perf_counter() - started
+        self._report(stats, elapsed)
+        summary_path = f'{output}.summary.json'
+        with open(summary_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'knowledge_version': snapshot.version,
+                'knowledge_source': snapshot.source,
+                'engine': engine_name,
+                'elapsed_seconds': round(elapsed, 3),
+                'stats': stats_to_json(stats),
+                'delta_buckets': [str(b) for b in DELTA_BUCKETS],
+            }, f, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {output} and {summary_path}.'))
+
+    def _chunks(self, rows, size):
+        """Group streamed rows into work units of plain tuples (no ORM objects cross processes)."""
+        chunk = []
+        for pk, symptoms, predicted_name, disease_name, confidence in rows:
+            chunk.append((pk, symptoms, predicted_name or disease_name or '', float(confidence or 0)))
+            if len(chunk) >= size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _load_checkpoint(self, path):
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise CommandError(f'No checkpoint at {path}; run without --resume.')
+
+    def _save_checkpoint(self, path, data):
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+    def _report(self, stats, elapsed):
+        scored = stats['rows'] - stats['unparseable']
+        rate = stats['rows'] / elapsed if elapsed else 0
+        self.stdout.write(f'{stats["rows"]} rows in {elapsed:.2f}s ({rate:,.0f} rows/s)')
+        self.stdout.write(f'  unparseable symptoms: {stats["unparseable"]}')
+        self.stdout.write(f'  no prediction now:    {stats["no_prediction_now"]}')
+        self.stdout.write(
+            f'  changed top disease:  {stats["changed_top"]}'
+            + (f' ({stats["changed_top"] / scored:.1%})' if scored else '')
+        )
+        if scored:
+            self.stdout.write(
+                f'  confidence delta:     mean {stats["confidence_delta_sum"] / scored:+.2f}, '
+                f'mean |delta| {stats["confidence_delta_abs_sum"] / scored:.2f}, '
+                f'max |delta| {stats["confidence_delta_max_abs"]:.2f}'
+            )
+            lower = '-inf'
+            for bound, count in zip(DELTA_BUCKETS, stats['delta_histogram']):
+                self.stdout.write(f'    [{lower}, {bound}): {count}')
+                lower = bound
+        for (old, new), count in stats['transitions'].most_common(10):
+            self.stdout.write(f'  {old or "(none)"} -> {new or "(none)"}: {count}')
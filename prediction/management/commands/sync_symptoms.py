@@ -1,12 +1,24 @@
 """
 Management command to sync symptoms from the ML model's DISEASE_SYMPTOM_MAP
 into the Symptom table so the check-symptoms page shows all symptoms used for prediction.
-Run: python manage.py sync_symptoms
+It also syncs the DISEASE_FALLBACK_INFO diseases, precautions, diets and exercises
+into their tables (recommendations only for diseases that have none of that kind).
+Every table is read once, the difference is computed in memory and missing rows
+are bulk-created in batches inside a single transaction, so re-running it is cheap
+and idempotent.
+Run: python manage.py sync_symptoms [--dry-run] [--prune] [--links]
 """
+import time
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
 
-from prediction.models import Symptom
-from prediction.ml_model import DiseasePredictionModel
+from prediction.engine import normalize_symptom
+from prediction.knowledge import bump_version
+from prediction.models import (Disease, DiseaseDiet, DiseaseExercise, DiseasePrecaution,
+                               DiseaseSymptom, Symptom)
+from prediction.ml_model import DiseasePredictionModel, fallback_info
+from prediction.signals import deferred_version_bump
 
 
 def normalized_to_display(name):
@@ -17,14 +29,159 @@ def normalized_to_display(name):
 class Command(BaseCommand):
     help = 'Sync symptoms from ML model DISEASE_SYMPTOM_MAP into the Symptom table.'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report what would change without writing anything.')
+        parser.add_argument('--prune', action='store_true',
+                            help='Delete symptoms no disease uses (neither DISEASE_SYMPTOM_MAP nor DiseaseSymptom).')
+        parser.add_argument('--links', action='store_true',
+                            help='Also copy DISEASE_SYMPTOM_MAP into DiseaseSymptom so the database drives prediction.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
     def handle(self, *args, **options):
+        self.dry_run = options['dry_run']
+        self.batch_size = options['batch_size']
+        started = self.phase_started = time.perf_counter()
+        with transaction.atomic():
+            changed = self.sync_symptoms()
+            if options['prune']:
+                changed += self.prune_symptoms()
+            changed += self.sync_fallback_info()
+            if options['links']:
+                changed += self.sync_links()
+            if changed and not self.dry_run:
+                # bulk_create sends no model signals and the prune defers its bumps, so tell the workers once here
+                bump_version()
+        prefix = 'Dry run: ' if self.dry_run else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}{changed} row(s) {"to change" if self.dry_run else "changed"} '
+            f'in {time.perf_counter() - started:.3f}s.'
+        ))
+
+    def sync_symptoms(self):
         all_symptoms = set()
         for disease_symptoms in DiseasePredictionModel.DISEASE_SYMPTOM_MAP.values():
             all_symptoms.update(disease_symptoms)
-        created = 0
-        for norm_name in sorted(all_symptoms):
-            display_name = normalized_to_display(norm_name)
-            if not Symptom.objects.filter(name__iexact=display_name).exists():
-                Symptom.objects.create(name=display_name, description='')
-                created += 1
-        self.stdout.write(self.style.SUCCESS(f'Synced symptoms: {len(all_symptoms)} total, {created} new.'))
+        existing = {name.casefold() for name in Symptom.objects.values_list('name', flat=True)}
+        new = [
+            Symptom(name=normalized_to_display(norm_name), description='')
+            for norm_name in sorted(all_symptoms)
+            if normalized_to_display(norm_name).casefold() not in existing
+        ]
+        self._create(Symptom, new)
+        self._report('Synced symptoms', f'{len(all_symptoms)} total, {len(new)} new')
+        return len(new)
+
+    def prune_symptoms(self):
+        used = {s for symptoms in DiseasePredictionModel.DISEASE_SYMPTOM_MAP.values() for s in symptoms}
+        linked = set(DiseaseSymptom.objects.values_list('symptom_id', flat=True).distinct())
+        unused = [
+            pk for pk, name in Symptom.objects.values_list('id', 'name')
+            if pk not in linked and normalize_symptom(name) not in used
+        ]
+        if not self.dry_run:
+            # post_delete still runs per row so the symptom caches drop these names, but the
+            # knowledge version is bumped once by handle() instead of once per row
+            with deferred_version_bump():
+                for start in range(0, len(unused), self.batch_size):
+                    Symptom.objects.filter(pk__in=unused[start:start + self.batch_size]).delete()
+        self._report('Pruned symptoms', f'{len(unused)} unused')
+        return len(unused)
+
+    def sync_fallback_info(self):
+        catalog = fallback_info()
+        existing = {name.casefold() for name in Disease.objects.values_list('name', flat=True)}
+        new = [
+            Disease(
+                name=name,
+                description=info['description'],
+                severity_level=info['severity_level'],
+                specialist_required=info['specialist_required'],
+            )
+            for name, info in catalog.items()
+            if name.casefold() not in existing
+        ]
+        self._create(Disease, new)
+        changed = len(new)
+        self._report('Synced diseases', f'{len(catalog)} total, {len(new)} new')
+
+        disease_ids = {name.casefold(): pk for pk, name in Disease.objects.values_list('id', 'name')}
+        if self.dry_run:
+            # Diseases that would be created have no id yet; use placeholders so their rows count as new
+            for i, disease in enumerate(new):
+                disease_ids[disease.name.casefold()] = -1 - i
+
+        # Fallback recommendations only fill in what a disease has none of yet,
+        # so curated rows entered through the admin are never mixed with them
+        with_precautions = set(DiseasePrecaution.objects.values_list('disease_id', flat=True).distinct())
+        with_diet = set(DiseaseDiet.objects.values_list('disease_id', 'is_recommended').distinct())
+        with_exercises = set(DiseaseExercise.objects.values_list('disease_id', flat=True).distinct())
+        new_precautions, new_diets, new_exercises = [], [], []
+        for name, info in catalog.items():
+            disease_id = disease_ids[name.casefold()]
+            if disease_id not in with_precautions:
+                new_precautions.extend(
+                    DiseasePrecaution(disease_id=disease_id, precaution=text, priority=priority)
+                    for priority, text in enumerate(info.get('precautions') or [], start=1)
+                )
+            diet = info.get('diet') or {}
+            for is_recommended, items in ((True, diet.get('recommended')), (False, diet.get('avoid'))):
+                if (disease_id, is_recommended) not in with_diet:
+                    new_diets.extend(
+                        DiseaseDiet(
+                            disease_id=disease_id,
+                            food_item=item['food_item'],
+                            is_recommended=is_recommended,
+                            description=item.get('description', ''),
+                        )
+                        for item in items or []
+                    )
+            if disease_id not in with_exercises:
+                new_exercises.extend(
+                    DiseaseExercise(
+                        disease_id=disease_id,
+                        exercise_name=ex['exercise_name'],
+                        description=ex.get('description', ''),
+                        duration=ex.get('duration', ''),
+                        intensity=ex.get('intensity', 'light'),
+                    )
+                    for ex in info.get('exercises') or []
+                )
+        for model, rows, label in (
+            (DiseasePrecaution, new_precautions, 'precautions'),
+            (DiseaseDiet, new_diets, 'diet items'),
+            (DiseaseExercise, new_exercises, 'exercises'),
+        ):
+            self._create(model, rows)
+            self._report(f'Synced {label}', f'{len(rows)} new')
+            changed += len(rows)
+        return changed
+
+    def sync_links(self):
+        disease_ids = {name.casefold(): pk for pk, name in Disease.objects.values_list('id', 'name')}
+        symptom_ids = {normalize_symptom(name): pk for pk, name in Symptom.objects.values_list('id', 'name')}
+        existing = set(DiseaseSymptom.objects.values_list('disease_id', 'symptom_id'))
+        new = []
+        skipped = 0
+        for name, symptoms in DiseasePredictionModel.DISEASE_SYMPTOM_MAP.items():
+            disease_id = disease_ids.get(name.casefold())
+            for symptom in dict.fromkeys(symptoms):
+                symptom_id = symptom_ids.get(symptom)
+                if disease_id is None or symptom_id is None:
+                    # Only possible in a dry run, before the disease/symptom rows exist
+                    skipped += 1
+                elif (disease_id, symptom_id) not in existing:
+                    new.append(DiseaseSymptom(disease_id=disease_id, symptom_id=symptom_id))
+        self._create(DiseaseSymptom, new)
+        detail = f'{len(new)} new' + (f', {skipped} pending new diseases/symptoms' if skipped else '')
+        self._report('Synced disease-symptom links', detail)
+        return len(new) + skipped
+
+    def _create(self, model, rows):
+        if rows and not self.dry_run:
+            model.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def _report(self, label, detail):
+        now = time.perf_counter()
+        self.stdout.write(f'{label}: {detail}. ({now - self.phase_started:.3f}s)')
+        self.phase_started = now
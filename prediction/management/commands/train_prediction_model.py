@@ -0,0 +1,109 @@
+"""
+Management command to train the naive Bayes prediction engine ('bayes') offline and
+write its weights (settings.PREDICTION_BAYES_MODEL), which workers load on first use.
+Training data: the current disease profiles, labeled CSV files of (symptoms, true
+disease) cases in the evaluate_model format, and confirmed outcomes from the history:
+closed consultations whose diagnosis names a known disease, paired with the symptoms
+of the prediction they were opened from.
+Run: python manage.py train_prediction_model [cases.csv ...] [--output prediction_bayes.npz] [--no-history]
+"""
+import json
+import os
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from consultation.models import Consultation
+from prediction.engine import NaiveBayesEngine, np
+from prediction.evaluation import read_cases
+from prediction.knowledge import load_snapshot
+from prediction.ml_model import DiseasePredictionModel
+
+
+class Command(BaseCommand):
+    help = 'Train the naive Bayes prediction engine and save its weights.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('datasets', nargs='*', help='Labeled CSV files of symptom cases.')
+        parser.add_argument('--output', help='Weights file (default: settings.PREDICTION_BAYES_MODEL).')
+        parser.add_argument('--symptom-column', default='symptoms')
+        parser.add_argument('--label-column', default='disease')
+        parser.add_argument('--separator', default=';',
+                            help='Separator of the symptom names when the cell is not a JSON list.')
+        parser.add_argument('--no-history', action='store_true',
+                            help='Do not learn from confirmed consultation outcomes.')
+        parser.add_argument('--alpha', type=float, default=1.0, help='Additive (Laplace) smoothing.')
+        parser.add_argument('--profile-weight', type=float, default=1.0,
+                            help='How many cases each disease profile counts as (0 = cases only).')
+
+    def handle(self, *args, **options):
+        if np is None:
+            raise CommandError('The naive Bayes engine requires NumPy (pip install numpy).')
+        path = options['output'] or getattr(settings, 'PREDICTION_BAYES_MODEL', None)
+        if not path:
+            raise CommandError('Pass --output or set PREDICTION_BAYES_MODEL.')
+        if options['alpha'] <= 0:
+            raise CommandError('--alpha must be positive.')
+        path = str(path)
+
+        started = time.perf_counter()
+        snapshot = load_snapshot()
+        # Case symptoms go through the same canonicalizer as predict()
+        canonicalizer = DiseasePredictionModel(snapshot).canonicalizer
+        cases = []
+        for dataset in options['datasets']:
+            try:
+                with open(dataset, newline='', encoding='utf-8') as f:
+                    cases.extend(read_cases(f, options['symptom_column'], options['label_column'],
+                                            options['separator'], canonicalizer))
+            except OSError as exc:
+                raise CommandError(f'Cannot read {dataset}: {exc}')
+            except ValueError as exc:
+                raise CommandError(f'{dataset}: {exc}')
+        dataset_cases = len(cases)
+        if not options['no_history']:
+            cases.extend(self._confirmed_outcomes(canonicalizer))
+        loaded = time.perf_counter()
+
+        engine = NaiveBayesEngine(
+            snapshot.disease_symptom_map, snapshot.weights, cases,
+            alpha=options['alpha'], profile_weight=options['profile_weight'],
+        )
+        engine.save(
+            path,
+            knowledge_version=snapshot.version,
+            source=snapshot.source,
+            trained_at=time.time(),
+            dataset_cases=dataset_cases,
+            history_cases=len(cases) - dataset_cases,
+            skipped_cases=engine.skipped_cases,
+        )
+        finished = time.perf_counter()
+
+        self.stdout.write(
+            f'{len(engine.diseases)} diseases, {len(engine.symptom_ids)} symptoms, '
+            f'{len(engine.indices)} non-zero weights (knowledge version {snapshot.version}, {snapshot.source})'
+        )
+        self.stdout.write(
+            f'Cases: {dataset_cases} from files, {len(cases) - dataset_cases} confirmed from history; '
+            f'{engine.trained_cases} used, {engine.skipped_cases} skipped (disease not in the knowledge base)'
+        )
+        self.stdout.write(f'Load {loaded - started:.2f}s, train and save {finished - loaded:.2f}s')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {path} ({os.path.getsize(path):,} bytes).'))
+
+    def _confirmed_outcomes(self, canonicalizer):
+        """Yield (symptoms, diagnosis) for closed consultations opened from a prediction."""
+        rows = (
+            Consultation.objects.filter(status='closed', prediction__isnull=False)
+            .exclude(diagnosis='')
+            .values_list('prediction__symptoms', 'diagnosis')
+            .iterator()
+        )
+        for symptoms_json, diagnosis in rows:
+            try:
+                symptoms = canonicalizer.canonicalize_all(str(s) for s in json.loads(symptoms_json))
+            except (TypeError, ValueError):
+                continue
+            if symptoms:
+                yield symptoms, diagnosis.strip()
@@ -0,0 +1,18 @@
+# Generated manually for top-k differential diagnosis
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0003_add_disease_name_to_prediction_history'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='predictionhistory',
+            name='differential',
+            field=models.TextField(blank=True),
+        ),
+    ]
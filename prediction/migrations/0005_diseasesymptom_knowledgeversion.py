@@ -0,0 +1,34 @@
+# Generated manually for database-backed disease–symptom knowledge
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('prediction', '0004_predictionhistory_differential'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KnowledgeVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('version', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DiseaseSymptom',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weight', models.FloatField(default=1.0)),
+                ('disease', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='symptom_links', to='prediction.disease')),
+                ('symptom', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='disease_links', to='prediction.symptom')),
+            ],
+            options={
+                'unique_together': {('disease', 'symptom')},
+            },
+        ),
+    ]
@@ -3,469 +3,152 @@ Disease Prediction ML Model
 This is a simplified prediction system. In production, you would use a trained ML model.
 """
 
+import asyncio
 import json
-from types import SimpleNamespace
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from types import MappingProxyType
 
+from django.conf import settings
+
+from .batching import get_batcher
+from .cache import PredictionLRU, disease_cache, recommendation_cache
+from .canonical import MIN_TYPO_LENGTH, SymptomCanonicalizer, builtin_aliases
+from .engine import ENGINES, NaiveBayesEngine, available_engines
+from .knowledge import builtin_snapshot
 from .models import Disease, Symptom
+from .questions import DEFAULT_SLIP, QuestionSelector
+from .registry import get_model
+
+logger = logging.getLogger(__name__)
 
-# Fallback info when a predicted disease is not in the database (description, prevention, diet, exercise)
+# Fallback info when a predicted disease is not in the database (description, prevention, diet, exercise),
+# kept in data/disease_fallback_info.json and loaded on first use; read it through fallback_info().
 # diet: { recommended: [{food_item, description}], avoid: [{food_item, description}] }
 # exercises: [{ exercise_name, description, duration, intensity }]
-DISEASE_FALLBACK_INFO = {
-    'GERD': {
-        'description': 'GERD (Gastroesophageal Reflux Disease) is a condition where stomach acid frequently flows back into the tube connecting your mouth and stomach. This backwash can irritate the lining of your esophagus and cause heartburn, chest pain, and throat irritation.',
-        'precautions': [
-            'Avoid large meals; eat smaller, more frequent meals',
-            'Avoid lying down within 2–3 hours after eating',
-            'Limit fatty foods, chocolate, caffeine, and alcohol',
-            'Maintain a healthy weight',
-            'Raise the head of your bed 6–8 inches if symptoms occur at night',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Oatmeal', 'description': 'High fibre, absorbs acid; eat for breakfast.'},
-                {'food_item': 'Ginger', 'description': 'Natural anti-inflammatory; use in tea or cooking.'},
-                {'food_item': 'Non-citrus fruits (bananas, melons)', 'description': 'Low acid; gentle on the esophagus.'},
-                {'food_item': 'Lean poultry and fish', 'description': 'Baked or grilled; avoid frying.'},
-                {'food_item': 'Leafy greens, broccoli, cucumber', 'description': 'Low acid vegetables; steamed or raw.'},
-                {'food_item': 'Whole grains (brown rice, quinoa)', 'description': 'Fibre-rich; avoid white bread.'},
-            ],
-            'avoid': [
-                {'food_item': 'Citrus fruits and tomatoes', 'description': 'High acid; can trigger reflux.'},
-                {'food_item': 'Fried and fatty foods', 'description': 'Slow digestion; increase pressure on LES.'},
-                {'food_item': 'Chocolate and peppermint', 'description': 'Relax the lower esophageal sphincter.'},
-                {'food_item': 'Caffeine and alcohol', 'description': 'Stimulate acid production and relax LES.'},
-                {'food_item': 'Spicy foods and garlic/onions', 'description': 'Can worsen heartburn in many people.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Walking', 'description': 'Low impact; improves digestion. Avoid right after meals.', 'duration': '20–30 min daily', 'intensity': 'light'},
-            {'exercise_name': 'Cycling (moderate)', 'description': 'Avoid high intensity; stay upright.', 'duration': '15–20 min', 'intensity': 'moderate'},
-        ],
-        'severity_level': 'moderate',
-        'specialist_required': 'Gastroenterologist',
-    },
-    'Diabetes': {
-        'description': 'Diabetes is a chronic condition that affects how your body turns food into energy. With diabetes, your body either does not make enough insulin or cannot use the insulin it makes well, leading to high blood sugar.',
-        'precautions': [
-            'Eat a balanced diet and control carbohydrate intake',
-            'Exercise regularly (at least 150 minutes per week)',
-            'Monitor blood sugar as advised by your doctor',
-            'Maintain a healthy weight',
-            'Take prescribed medications consistently',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Non-starchy vegetables (spinach, broccoli)', 'description': 'Low carb; high fibre and nutrients.'},
-                {'food_item': 'Whole grains (oats, quinoa, brown rice)', 'description': 'Slow-release carbs; control blood sugar.'},
-                {'food_item': 'Lean protein (chicken, fish, tofu)', 'description': 'Helps satiety; minimal impact on glucose.'},
-                {'food_item': 'Legumes (lentils, chickpeas)', 'description': 'Fibre and protein; moderate portions.'},
-                {'food_item': 'Nuts and seeds (almonds, chia)', 'description': 'Healthy fats; small handfuls.'},
-                {'food_item': 'Berries (blueberries, strawberries)', 'description': 'Lower GI fruit; in moderation.'},
-            ],
-            'avoid': [
-                {'food_item': 'Sugary drinks and sweets', 'description': 'Spike blood sugar; avoid or limit strictly.'},
-                {'food_item': 'White bread and refined flour', 'description': 'Rapid glucose rise; choose whole grain.'},
-                {'food_item': 'Fried and high-fat processed foods', 'description': 'Worsen insulin resistance.'},
-                {'food_item': 'Large portions of rice, pasta', 'description': 'Control portions; pair with protein/veg.'},
-                {'food_item': 'Dried fruits and fruit juices', 'description': 'Concentrated sugar; prefer whole fruit.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Brisk walking', 'description': 'Improves insulin sensitivity; safe for most.', 'duration': '30 min, 5 days/week', 'intensity': 'moderate'},
-            {'exercise_name': 'Cycling', 'description': 'Low impact; good for blood sugar control.', 'duration': '20–30 min', 'intensity': 'moderate'},
-            {'exercise_name': 'Strength training', 'description': 'Builds muscle; helps glucose uptake.', 'duration': '2–3 sessions/week', 'intensity': 'moderate'},
-        ],
-        'severity_level': 'high',
-        'specialist_required': 'Endocrinologist',
-    },
-    'Hypertension': {
-        'description': 'Hypertension (high blood pressure) is when the force of blood against your artery walls is consistently too high. It often has no symptoms but can lead to heart disease, stroke, and kidney problems.',
-        'precautions': [
-            'Reduce sodium intake',
-            'Exercise regularly and maintain a healthy weight',
-            'Limit alcohol and avoid smoking',
-            'Manage stress and get enough sleep',
-            'Take prescribed blood pressure medication as directed',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Leafy greens (spinach, kale)', 'description': 'High potassium; supports healthy BP.'},
-                {'food_item': 'Berries and bananas', 'description': 'Potassium and antioxidants.'},
-                {'food_item': 'Oats and whole grains', 'description': 'Fibre; helps lower BP.'},
-                {'food_item': 'Fat-free or low-fat dairy', 'description': 'Calcium; choose low-sodium options.'},
-                {'food_item': 'Beets and beet juice', 'description': 'Nitrates; may help relax blood vessels.'},
-                {'food_item': 'Garlic (in food)', 'description': 'May have mild BP-lowering effect.'},
-            ],
-            'avoid': [
-                {'food_item': 'High-sodium foods (pickles, chips)', 'description': 'Raises blood pressure; limit to <2300 mg/day.'},
-                {'food_item': 'Processed and canned foods', 'description': 'Often high in salt; read labels.'},
-                {'food_item': 'Excess alcohol', 'description': 'Limit to 1 drink/day for women, 2 for men.'},
-                {'food_item': 'Fried and fatty foods', 'description': 'Worsen heart health and weight.'},
-                {'food_item': 'Caffeine in excess', 'description': 'Can temporarily raise BP; moderate use.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Walking or jogging', 'description': 'Aerobic activity lowers BP over time.', 'duration': '30 min, most days', 'intensity': 'moderate'},
-            {'exercise_name': 'Swimming', 'description': 'Full-body; low impact on joints.', 'duration': '20–30 min', 'intensity': 'moderate'},
-            {'exercise_name': 'Cycling', 'description': 'Good cardio; build up gradually.', 'duration': '25–30 min', 'intensity': 'moderate'},
-        ],
-        'severity_level': 'high',
-        'specialist_required': 'Cardiologist',
-    },
-    'Common Cold': {
-        'description': 'The common cold is a viral infection of your nose and throat. It is usually harmless and most people recover within 7–10 days. Symptoms include runny nose, cough, sore throat, sneezing, and sometimes fever.',
-        'precautions': [
-            'Wash hands frequently with soap and water',
-            'Avoid touching your face, especially nose and eyes',
-            'Get plenty of rest and stay hydrated',
-            'Use a humidifier and avoid smoke',
-            'Cover your mouth when coughing or sneezing',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Warm soups and broths', 'description': 'Hydration; soothes throat and congestion.'},
-                {'food_item': 'Honey (in tea or warm water)', 'description': 'Soothes cough; avoid in infants <1 year.'},
-                {'food_item': 'Citrus and vitamin C foods', 'description': 'Oranges, kiwi; support immunity.'},
-                {'food_item': 'Ginger and turmeric tea', 'description': 'Anti-inflammatory; warming.'},
-                {'food_item': 'Chicken soup', 'description': 'Fluids, electrolytes, easy to digest.'},
-                {'food_item': 'Plain toast, rice, bananas', 'description': 'Bland; easy on the stomach.'},
-            ],
-            'avoid': [
-                {'food_item': 'Dairy (if it thickens mucus)', 'description': 'Some find it worsens congestion.'},
-                {'food_item': 'Sugary drinks and sweets', 'description': 'Can suppress immunity; dehydrate.'},
-                {'food_item': 'Alcohol', 'description': 'Dehydrates; weakens immunity.'},
-                {'food_item': 'Heavy, fatty meals', 'description': 'Hard to digest when unwell.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Light walking', 'description': 'Only if you feel up to it; rest if fever or very weak.', 'duration': '10–15 min', 'intensity': 'light'},
-        ],
-        'severity_level': 'low',
-        'specialist_required': 'General Physician',
-    },
-    'Migraine': {
-        'description': 'Migraine is a neurological condition that causes moderate to severe headache, often on one side, along with nausea, sensitivity to light and sound, and sometimes visual disturbances (aura).',
-        'precautions': [
-            'Identify and avoid triggers (stress, certain foods, lack of sleep)',
-            'Maintain a regular sleep schedule',
-            'Stay hydrated and eat at regular times',
-            'Reduce screen time and bright lights when possible',
-            'Consider preventive medication if prescribed by your doctor',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Leafy greens and non-citrus fruits', 'description': 'Less likely to trigger migraines.'},
-                {'food_item': 'Whole grains and oats', 'description': 'Stable energy; avoid skipping meals.'},
-                {'food_item': 'Lean protein (chicken, fish)', 'description': 'Regular meals help prevent attacks.'},
-                {'food_item': 'Ginger (tea or food)', 'description': 'May reduce nausea and inflammation.'},
-                {'food_item': 'Magnesium-rich foods (spinach, almonds)', 'description': 'Some evidence for migraine prevention.'},
-                {'food_item': 'Water and herbal tea', 'description': 'Dehydration can trigger migraines.'},
-            ],
-            'avoid': [
-                {'food_item': 'Aged cheese and processed meats', 'description': 'Tyramine can trigger migraines.'},
-                {'food_item': 'Alcohol (especially red wine)', 'description': 'Common trigger.'},
-                {'food_item': 'Caffeine (excess or withdrawal)', 'description': 'Moderate use; avoid sudden changes.'},
-                {'food_item': 'Chocolate and MSG', 'description': 'Common migraine triggers.'},
-                {'food_item': 'Artificial sweeteners (aspartame)', 'description': 'Can trigger in some people.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Walking', 'description': 'Gentle; avoid intense exercise during attacks.', 'duration': '20–30 min', 'intensity': 'light'},
-            {'exercise_name': 'Yoga or stretching', 'description': 'Reduces stress; may lower attack frequency.', 'duration': '15–20 min', 'intensity': 'light'},
-        ],
-        'severity_level': 'moderate',
-        'specialist_required': 'Neurologist',
-    },
-    'Asthma': {
-        'description': 'Asthma is a condition in which your airways narrow, swell, and may produce extra mucus, making breathing difficult. It can cause coughing, wheezing, shortness of breath, and chest tightness.',
-        'precautions': [
-            'Avoid known allergens and irritants (dust, pollen, smoke)',
-            'Use your inhaler as prescribed',
-            'Keep an action plan and know when to seek emergency care',
-            'Get a flu shot annually',
-            'Monitor your breathing and avoid overexertion in cold or polluted air',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Fruits and vegetables (apples, carrots)', 'description': 'Antioxidants; may support lung function.'},
-                {'food_item': 'Vitamin D sources (eggs, fortified milk)', 'description': 'Low vitamin D linked to worse asthma.'},
-                {'food_item': 'Omega-3 foods (salmon, flaxseed)', 'description': 'Anti-inflammatory.'},
-                {'food_item': 'Whole grains', 'description': 'Fibre; avoid refined flour if allergic.'},
-                {'food_item': 'Magnesium-rich foods (spinach, nuts)', 'description': 'May help relax airways.'},
-            ],
-            'avoid': [
-                {'food_item': 'Sulfites (wine, dried fruit)', 'description': 'Can trigger asthma in some.'},
-                {'food_item': 'Known food allergens', 'description': 'Identify and avoid your triggers.'},
-                {'food_item': 'Heavy meals before exercise', 'description': 'Can worsen exercise-induced asthma.'},
-                {'food_item': 'Excess cold drinks', 'description': 'May trigger bronchospasm in some.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Walking or light jogging', 'description': 'Warm up well; use reliever before exercise if advised.', 'duration': '20–30 min', 'intensity': 'light'},
-            {'exercise_name': 'Swimming', 'description': 'Warm, humid air; often well tolerated.', 'duration': '20 min', 'intensity': 'moderate'},
-            {'exercise_name': 'Cycling (moderate)', 'description': 'Controlled intensity; avoid cold, dry air.', 'duration': '15–25 min', 'intensity': 'moderate'},
-        ],
-        'severity_level': 'moderate',
-        'specialist_required': 'Pulmonologist',
-    },
-    'Gastroenteritis': {
-        'description': 'Gastroenteritis (stomach flu) is inflammation of the stomach and intestines, usually caused by a virus or bacteria. Symptoms include diarrhea, nausea, vomiting, abdominal pain, and sometimes fever.',
-        'precautions': [
-            'Stay hydrated with water, oral rehydration solutions, or clear broths',
-            'Avoid dairy, fatty foods, and caffeine until you recover',
-            'Wash hands frequently to prevent spread',
-            'Rest and eat bland foods (e.g., toast, rice, bananas) when able',
-            'Seek medical care if symptoms are severe or last more than a few days',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'BRAT (bananas, rice, applesauce, toast)', 'description': 'Bland; easy to digest during recovery.'},
-                {'food_item': 'Oral rehydration solution (ORS)', 'description': 'Replaces fluids and electrolytes.'},
-                {'food_item': 'Clear broths and soups', 'description': 'Hydration and light nutrition.'},
-                {'food_item': 'Plain crackers or toast', 'description': 'Settle stomach; small portions.'},
-                {'food_item': 'Boiled potatoes (no butter)', 'description': 'Easy to digest; add when tolerating solids.'},
-                {'food_item': 'Ginger tea', 'description': 'May ease nausea; sip slowly.'},
-            ],
-            'avoid': [
-                {'food_item': 'Dairy products', 'description': 'Hard to digest; can worsen diarrhea.'},
-                {'food_item': 'Fatty, fried, or spicy foods', 'description': 'Irritate the gut.'},
-                {'food_item': 'Caffeine and alcohol', 'description': 'Dehydrate and irritate.'},
-                {'food_item': 'Sugary drinks and sweets', 'description': 'Can worsen diarrhea.'},
-                {'food_item': 'Raw vegetables and high-fibre foods', 'description': 'Until stomach settles.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Rest', 'description': 'Avoid exercise until vomiting and diarrhea stop; rehydrate first.', 'duration': 'Rest until recovered', 'intensity': 'light'},
-        ],
-        'severity_level': 'moderate',
-        'specialist_required': 'Gastroenterologist',
-    },
-    'Bronchitis': {
-        'description': 'Bronchitis is inflammation of the bronchial tubes that carry air to your lungs. It causes cough (often with mucus), chest discomfort, fatigue, and sometimes fever. It can be acute or chronic.',
-        'precautions': [
-            'Rest and drink plenty of fluids',
-            'Avoid smoke and other irritants',
-            'Use a humidifier to ease breathing',
-            'Take over-the-counter or prescribed cough/decongestant as advised',
-            'See a doctor if cough lasts more than 3 weeks or you have high fever',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Warm soups and broths', 'description': 'Hydration; soothes throat and loosens mucus.'},
-                {'food_item': 'Honey (in warm water or tea)', 'description': 'Soothes cough; avoid in infants <1 year.'},
-                {'food_item': 'Fruits and vegetables (vitamin C)', 'description': 'Oranges, kiwi; support immunity.'},
-                {'food_item': 'Ginger and turmeric', 'description': 'Anti-inflammatory; warming.'},
-                {'food_item': 'Plain rice, toast, bananas', 'description': 'Easy to digest when fatigued.'},
-                {'food_item': 'Water and herbal tea', 'description': 'Stay well hydrated.'},
-            ],
-            'avoid': [
-                {'food_item': 'Dairy (if it thickens mucus)', 'description': 'Some find it worsens cough.'},
-                {'food_item': 'Fried and fatty foods', 'description': 'Hard to digest; can worsen inflammation.'},
-                {'food_item': 'Alcohol and smoke', 'description': 'Irritate airways.'},
-                {'food_item': 'Cold drinks and ice cream', 'description': 'Can trigger coughing in some.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Rest first', 'description': 'Rest until fever and severe cough improve.', 'duration': 'Until improved', 'intensity': 'light'},
-            {'exercise_name': 'Light walking', 'description': 'When feeling better; avoid cold air.', 'duration': '10–15 min', 'intensity': 'light'},
-        ],
-        'severity_level': 'moderate',
-        'specialist_required': 'Pulmonologist',
-    },
-    'Pneumonia': {
-        'description': 'Pneumonia is an infection that inflames the air sacs in one or both lungs. The air sacs may fill with fluid or pus, causing cough, fever, chest pain, shortness of breath, and fatigue.',
-        'precautions': [
-            'Get vaccinated (flu and pneumococcal vaccines as recommended)',
-            'Wash hands regularly and avoid close contact with sick people',
-            'Rest, stay hydrated, and take prescribed antibiotics if given',
-            'Seek prompt medical care for high fever or difficulty breathing',
-            'Avoid smoking and maintain good overall health',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Soups and broths', 'description': 'Hydration; easy to eat when weak.'},
-                {'food_item': 'Protein (chicken, fish, eggs)', 'description': 'Supports recovery; soft forms.'},
-                {'food_item': 'Fruits and vegetables', 'description': 'Vitamins and antioxidants.'},
-                {'food_item': 'Whole grains (oatmeal, rice)', 'description': 'Energy; easy to digest.'},
-                {'food_item': 'Water and electrolyte drinks', 'description': 'Stay hydrated; fever increases need.'},
-                {'food_item': 'Honey (for cough)', 'description': 'Soothes throat; avoid in infants <1 year.'},
-            ],
-            'avoid': [
-                {'food_item': 'Alcohol', 'description': 'Dehydrates; weakens immunity.'},
-                {'food_item': 'Heavy, fatty meals', 'description': 'Hard to digest when ill.'},
-                {'food_item': 'Smoking and smoke exposure', 'description': 'Damages lungs.'},
-                {'food_item': 'Excess caffeine', 'description': 'Can dehydrate.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Rest', 'description': 'No exercise until fever is gone and doctor approves.', 'duration': 'Until recovered', 'intensity': 'light'},
-            {'exercise_name': 'Deep breathing (when advised)', 'description': 'Helps expand lungs; ask your doctor.', 'duration': '5–10 min, 2–3 times/day', 'intensity': 'light'},
-        ],
-        'severity_level': 'high',
-        'specialist_required': 'Pulmonologist',
-    },
-    'Arthritis': {
-        'description': 'Arthritis is inflammation of one or more joints, leading to pain, stiffness, swelling, and reduced range of motion. There are many types; osteoarthritis and rheumatoid arthritis are common.',
-        'precautions': [
-            'Stay active with low-impact exercise (swimming, walking)',
-            'Maintain a healthy weight to reduce joint stress',
-            'Apply heat or cold as advised for pain and stiffness',
-            'Protect joints during daily activities',
-            'Take prescribed medications and attend follow-ups with your doctor',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Fatty fish (salmon, mackerel)', 'description': 'Omega-3; anti-inflammatory.'},
-                {'food_item': 'Leafy greens (spinach, kale)', 'description': 'Vitamin K; may protect joints.'},
-                {'food_item': 'Nuts and seeds (walnuts, flaxseed)', 'description': 'Healthy fats; anti-inflammatory.'},
-                {'food_item': 'Olive oil', 'description': 'Oleocanthal; anti-inflammatory.'},
-                {'food_item': 'Berries and cherries', 'description': 'Antioxidants; may reduce inflammation.'},
-                {'food_item': 'Whole grains and beans', 'description': 'Fibre; maintain healthy weight.'},
-            ],
-            'avoid': [
-                {'food_item': 'Processed and fried foods', 'description': 'Can increase inflammation.'},
-                {'food_item': 'Excess sugar and refined carbs', 'description': 'Linked to inflammation.'},
-                {'food_item': 'Excess red meat', 'description': 'Moderate; choose lean cuts.'},
-                {'food_item': 'Alcohol in excess', 'description': 'Can worsen inflammation.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Walking', 'description': 'Low impact; keeps joints mobile.', 'duration': '20–30 min daily', 'intensity': 'light'},
-            {'exercise_name': 'Swimming or water aerobics', 'description': 'No joint stress; full range of motion.', 'duration': '25–30 min', 'intensity': 'moderate'},
-            {'exercise_name': 'Cycling (stationary or outdoor)', 'description': 'Low impact; strengthens legs.', 'duration': '15–25 min', 'intensity': 'moderate'},
-            {'exercise_name': 'Stretching and range-of-motion', 'description': 'Reduces stiffness; do daily.', 'duration': '10–15 min', 'intensity': 'light'},
-        ],
-        'severity_level': 'moderate',
-        'specialist_required': 'Rheumatologist',
-    },
-    'Anxiety': {
-        'description': 'Anxiety is a mental health condition characterized by excessive worry, restlessness, rapid heartbeat, sweating, difficulty concentrating, and sleep problems. It can interfere with daily life.',
-        'precautions': [
-            'Practice relaxation techniques (deep breathing, meditation)',
-            'Maintain a regular sleep schedule and limit caffeine',
-            'Stay physically active and connect with others',
-            'Limit exposure to stressors when possible',
-            'Seek therapy or medication as recommended by a mental health professional',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Complex carbs (oats, whole grain)', 'description': 'Steady energy; may promote calm.'},
-                {'food_item': 'Magnesium-rich foods (spinach, almonds)', 'description': 'Supports relaxation.'},
-                {'food_item': 'Omega-3 (fish, flaxseed)', 'description': 'May support brain health and mood.'},
-                {'food_item': 'Probiotics (yogurt, fermented foods)', 'description': 'Gut-brain axis; some evidence for anxiety.'},
-                {'food_item': 'Herbal teas (chamomile, lavender)', 'description': 'Calming; avoid if on sedatives.'},
-                {'food_item': 'Regular meals and hydration', 'description': 'Low blood sugar can worsen anxiety.'},
-            ],
-            'avoid': [
-                {'food_item': 'Excess caffeine', 'description': 'Can increase heart rate and anxiety.'},
-                {'food_item': 'Alcohol', 'description': 'Temporary relief but worsens anxiety long term.'},
-                {'food_item': 'High sugar and processed foods', 'description': 'Blood sugar swings can trigger anxiety.'},
-                {'food_item': 'Skipping meals', 'description': 'Eat regularly to avoid low blood sugar.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Walking or jogging', 'description': 'Releases endorphins; reduces tension.', 'duration': '20–30 min', 'intensity': 'moderate'},
-            {'exercise_name': 'Yoga', 'description': 'Combines movement and breathing; calming.', 'duration': '20–40 min', 'intensity': 'light'},
-            {'exercise_name': 'Swimming or cycling', 'description': 'Aerobic; good for stress relief.', 'duration': '25–30 min', 'intensity': 'moderate'},
-        ],
-        'severity_level': 'moderate',
-        'specialist_required': 'Psychiatrist',
-    },
-    'Depression': {
-        'description': 'Depression is a mood disorder that causes persistent sadness, loss of interest in activities, fatigue, changes in sleep and appetite, and can affect how you feel, think, and handle daily activities.',
-        'precautions': [
-            'Stay connected with family and friends',
-            'Maintain a routine and set small, achievable goals',
-            'Exercise regularly and prioritize sleep',
-            'Avoid alcohol and recreational drugs',
-            'Seek professional help (therapy and/or medication) as recommended',
-        ],
-        'diet': {
-            'recommended': [
-                {'food_item': 'Omega-3 (fatty fish, walnuts)', 'description': 'Linked to better mood; support brain health.'},
-                {'food_item': 'Leafy greens and folate (spinach, broccoli)', 'description': 'Folate supports mood.'},
-                {'food_item': 'Whole grains and complex carbs', 'description': 'Steady energy; avoid blood sugar crashes.'},
-                {'food_item': 'Lean protein (chicken, legumes)', 'description': 'Amino acids for neurotransmitters.'},
-                {'food_item': 'Vitamin D sources (eggs, fortified milk)', 'description': 'Low vitamin D linked to depression.'},
-                {'food_item': 'Regular meals', 'description': 'Skipping meals can worsen low mood and energy.'},
-            ],
-            'avoid': [
-                {'food_item': 'Alcohol and recreational drugs', 'description': 'Worsen depression; avoid self-medicating.'},
-                {'food_item': 'Excess sugar and refined carbs', 'description': 'Energy crashes; can worsen mood.'},
-                {'food_item': 'Skipping meals', 'description': 'Eat regularly even when appetite is low.'},
-                {'food_item': 'Heavy processed foods', 'description': 'Whole foods support better mood.'},
-            ],
-        },
-        'exercises': [
-            {'exercise_name': 'Walking', 'description': 'Start small; even 10–15 min helps mood.', 'duration': '20–30 min', 'intensity': 'light'},
-            {'exercise_name': 'Jogging or cycling', 'description': 'Aerobic exercise; strong evidence for mild–moderate depression.', 'duration': '25–30 min', 'intensity': 'moderate'},
-            {'exercise_name': 'Yoga or stretching', 'description': 'Combines movement and mindfulness.', 'duration': '20 min', 'intensity': 'light'},
-        ],
-        'severity_level': 'moderate',
-        'specialist_required': 'Psychiatrist',
-    },
+FALLBACK_INFO_PATH = Path(__file__).resolve().parent / 'data' / 'disease_fallback_info.json'
+_fallback_info = None
+
+
+def fallback_info():
+    """The fallback catalog {disease name: info}, loaded once and shared read-only."""
+    global _fallback_info
+    info = _fallback_info
+    if info is None:
+        with open(FALLBACK_INFO_PATH, encoding='utf-8') as f:
+            info = _fallback_info = MappingProxyType(json.load(f))
+    return info
+
+
+def __getattr__(name):
+    # Keeps `from prediction.ml_model import DISEASE_FALLBACK_INFO` working without loading it on import
+    if name == 'DISEASE_FALLBACK_INFO':
+        return fallback_info()
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+
+def symptom_aliases():
+    """Alias table for typed symptoms: data/symptom_aliases.json updated with settings.PREDICTION_SYMPTOM_ALIASES."""
+    aliases = dict(builtin_aliases())
+    aliases.update(getattr(settings, 'PREDICTION_SYMPTOM_ALIASES', None) or {})
+    return aliases
+
+
+def symptom_typo_min_length():
+    """Shortest misspelled word that is corrected (settings.PREDICTION_SYMPTOM_TYPO_MIN_LENGTH; 0 = off)."""
+    return getattr(settings, 'PREDICTION_SYMPTOM_TYPO_MIN_LENGTH', MIN_TYPO_LENGTH)
+
+
+@dataclass(frozen=True, slots=True)
+class FallbackDisease:
+    """Read-only stand-in for a Disease row, built from DISEASE_FALLBACK_INFO."""
+    name: str
+    description: str
+    severity_level: str
+    specialist_required: str
+
+
+# Shared, read-only empty recommendations payload (callers must not modify it)
+EMPTY_RECOMMENDATIONS = {
+    'precautions': (),
+    'diet': {'recommended': (), 'avoid': ()},
+    'exercises': (),
+    'medicines': (),
 }
 
+# casefolded name -> (FallbackDisease, recommendations); compiled on first lookup
+_fallback_index = None
 
-def get_fallback_disease_info(name):
-    """Return a disease-like object with fallback info if the disease is not in the DB."""
+
+def _compile_fallback_index():
+    """Compile DISEASE_FALLBACK_INFO into a casefolded name index of prebuilt, immutable payloads."""
+    index = {}
+    for map_name, info in fallback_info().items():
+        diet = info.get('diet') or {}
+        disease = FallbackDisease(
+            name=map_name,
+            description=info['description'],
+            severity_level=info['severity_level'],
+            specialist_required=info['specialist_required'],
+        )
+        recommendations = {
+            'precautions': tuple(info.get('precautions') or ()),
+            'diet': {
+                'recommended': tuple(
+                    {'food_item': str(x.get('food_item', '')), 'description': str(x.get('description', ''))}
+                    for x in diet.get('recommended') or ()
+                ),
+                'avoid': tuple(
+                    {'food_item': str(x.get('food_item', '')), 'description': str(x.get('description', ''))}
+                    for x in diet.get('avoid') or ()
+                ),
+            },
+            'exercises': tuple(
+                {
+                    'exercise_name': str(ex.get('exercise_name', '')),
+                    'description': str(ex.get('description', '')),
+                    'duration': str(ex.get('duration', '')),
+                    'intensity': str(ex.get('intensity', '')),
+                }
+                for ex in info.get('exercises') or ()
+            ),
+            'medicines': (),
+        }
+        index[map_name.casefold()] = (disease, recommendations)
+    return index
+
+
+def _fallback_entry(name):
+    global _fallback_index
     if not name or not isinstance(name, str):
         return None
-    key = name.strip()
-    for map_name, info in DISEASE_FALLBACK_INFO.items():
-        if map_name.lower() == key.lower():
-            return SimpleNamespace(
-                name=map_name,
-                description=info['description'],
-                severity_level=info['severity_level'],
-                specialist_required=info['specialist_required'],
-            )
-    return None
+    index = _fallback_index
+    if index is None:
+        index = _fallback_index = _compile_fallback_index()
+    return index.get(name.strip().casefold())
+
+
+def get_fallback_disease_info(name):
+    """Return a disease-like object with fallback info if the disease is not in the DB."""
+    entry = _fallback_entry(name)
+    return entry[0] if entry else None
 
 
 def get_fallback_recommendations(disease_name):
     """
     Return full recommendations (precautions, diet, exercises, medicines) for a disease
     from DISEASE_FALLBACK_INFO. Used when the disease is not in the database.
+    The payload is shared between requests and must not be mutated.
     """
-    if not disease_name or not isinstance(disease_name, str):
-        return {
-            'precautions': [],
-            'diet': {'recommended': [], 'avoid': []},
-            'exercises': [],
-            'medicines': [],
-        }
-    name = disease_name.strip().lower()
-    for key, info in DISEASE_FALLBACK_INFO.items():
-        if key.lower() == name:
-            diet = info.get('diet') or {}
-            rec = diet.get('recommended') or []
-            avoid = diet.get('avoid') or []
-            exercises = info.get('exercises') or []
-            return {
-                'precautions': info.get('precautions') or [],
-                'diet': {
-                    'recommended': [{'food_item': str(x.get('food_item', '')), 'description': str(x.get('description', ''))} for x in rec],
-                    'avoid': [{'food_item': str(x.get('food_item', '')), 'description': str(x.get('description', ''))} for x in avoid],
-                },
-                'exercises': [
-                    {
-                        'exercise_name': str(ex.get('exercise_name', '')),
-                        'description': str(ex.get('description', '')),
-                        'duration': str(ex.get('duration', '')),
-                        'intensity': str(ex.get('intensity', '')),
-                    }
-                    for ex in exercises
-                ],
-                'medicines': [],
-            }
-    return {
-        'precautions': [],
-        'diet': {'recommended': [], 'avoid': []},
-        'exercises': [],
-        'medicines': [],
-    }
+    entry = _fallback_entry(disease_name)
+    return entry[1] if entry else EMPTY_RECOMMENDATIONS
+
+
+# Sentinel for prediction cache misses (None is a valid cached "no match" result)
+_MISSING = object()
 
 
 class DiseasePredictionModel:
@@ -478,6 +161,7 @@ class DiseasePredictionModel:
     
     # Expanded disease–symptom mapping (normalized: lowercase, spaces as underscore)
     # More symptoms per disease = more accurate matching
+    # Built-in knowledge; DiseaseSymptom rows in the database take precedence (see prediction.knowledge)
     DISEASE_SYMPTOM_MAP = {
         'GERD': [
             'acidity', 'heartburn', 'chest_pain', 'cough', 'throat_irritation', 'difficulty_swallowing',
@@ -554,102 +238,313 @@ class DiseasePredictionModel:
             'withdrawal', 'loss_of_pleasure', 'indecisiveness',
         ],
     }
+
+    def __init__(self, snapshot=None, artifact=None):
+        # Compiled model mapped from disk (prediction.artifact.MappedEngine); it scores without the snapshot
+        self.artifact = artifact
+        # Knowledge this model scores against; defaults to the built-in DISEASE_SYMPTOM_MAP
+        self._snapshot = snapshot or (None if artifact else builtin_snapshot())
+        # Scoring engines compiled from the snapshot on first use (see get_engine)
+        self._engines = {'artifact': artifact} if artifact else {}
+        self._profiles = None
+        self._canonicalizer = None
+        self._question_selector = None
+        # Engine results for repeated symptom combinations; lives and dies with this model,
+        # so rebuilding the model (new disease–symptom knowledge) starts with an empty cache
+        self.cache = PredictionLRU(getattr(settings, 'PREDICTION_CACHE_SIZE', 1024))
     
-    def predict(self, symptoms_list):
+    @property
+    def snapshot(self):
+        """Knowledge snapshot; a model opened from an artifact only loads it if another engine needs it."""
+        if self._snapshot is None:
+            from .knowledge import load_snapshot
+            self._snapshot = load_snapshot()
+        return self._snapshot
+
+    @property
+    def knowledge_version(self):
+        return self.artifact.knowledge_version if self.artifact else self._snapshot.version
+
+    def predict(self, symptoms_list, top_k=None):
         """
         Predict disease using weighted scoring:
         - Rewards diseases that explain more of the user's selected symptoms.
         - Requires at least 2 matching symptoms to reduce false positives.
         - Confidence reflects both match count and specificity.
+        With top_k the result also carries a 'differential' list of the
+        k best-scoring diseases (just the prediction itself for top_k=1) with their confidence and matched symptoms.
+        Cache misses are scored through the micro-batcher when settings.PREDICTION_BATCH_WINDOW_MS is set.
+        """
+        scored = self.score(symptoms_list, top_k)
+        if scored is None:
+            return None
+        return self._prediction(scored, disease_cache.get(scored[0][0]))
+
+    def score(self, symptoms_list, top_k=None):
+        """
+        The engine part of predict(): (best, differential) as plain data, or None.
+        Memoized per symptom combination; touches no database, so async views run it on a worker thread.
         """
         if not symptoms_list:
             return None
         
-        symptoms_set = set(s.lower().strip().replace(' ', '_') for s in symptoms_list)
+        symptoms_set = self.canonicalizer.canonicalize_all(symptoms_list)
         if not symptoms_set:
             return None
         
-        best_disease = None
-        best_score = -1.0
-        best_matches = 0
-        
-        for disease_name, disease_symptoms in self.DISEASE_SYMPTOM_MAP.items():
-            disease_set = set(disease_symptoms)
-            intersection = symptoms_set.intersection(disease_set)
-            match_count = len(intersection)
-            
-            # Allow single-symptom matches but treat them as low-confidence.
-            # Previously we required at least 2 matches; now we accept 1 match
-            # but apply a penalty so single-symptom predictions are clearly lower confidence.
-            if match_count == 0:
-                continue
-            
-            # Weighted score: how much of the disease profile matches (specificity)
-            # + how much of user's selection we explain (coverage)
-            n_disease = len(disease_set)
-            n_user = len(symptoms_set)
-            specificity = match_count / n_disease if n_disease else 0   # match vs disease symptoms
-            coverage = match_count / n_user if n_user else 0             # match vs user selection
-            # Combined: 55% specificity, 45% coverage, scaled to 0–100
-            score = (0.55 * specificity + 0.45 * coverage) * 100
-            # Slight boost for more matches (more evidence)
-            if match_count >= 4:
-                score = min(99, score + 8)
-            elif match_count >= 3:
-                score = min(99, score + 4)
-
-            # Penalize single-symptom matches so they appear as low-confidence.
-            if match_count == 1:
-                # Scale down strongly but keep a small minimum confidence (5%)
-                score = max(5.0, score * 0.35)
-            
-            if score > best_score:
-                best_score = score
-                best_disease = disease_name
-                best_matches = match_count
-        
-        if best_disease is None:
+        top_k = top_k or None
+        key = (symptoms_set, top_k)
+        scored = self.cache.get(key, _MISSING)
+        if scored is _MISSING:
+            batcher = get_batcher()
+            if batcher is not None:
+                scored = batcher.score(self, symptoms_set, top_k)
+            else:
+                scored = self._score(symptoms_set, top_k)
+            self.cache.put(key, scored)
+        return scored
+
+    def _prediction(self, scored, disease):
+        """Prediction dict for a score() result and the predicted Disease row (or None)."""
+        best, differential = scored
+        result = self._build_result(best, disease)
+        if differential is not None:
+            result['differential'] = differential
+        return result
+
+    def _score(self, symptoms_set, top_k):
+        """Run the engine; returns (best, differential) or None. Plain data only, so it can be cached."""
+        if top_k:
+            ranked = self.get_engine().top_k(symptoms_set, top_k)
+            if not ranked:
+                return None
+            return ranked[0], self._differential(ranked, symptoms_set)
+        best = self.get_engine().best(symptoms_set)
+        if best is None:
             return None
-        
+        return best, None
+
+    def _score_many(self, symptom_sets, top_k):
+        """Batch version of _score for the micro-batcher: one engine call for every set."""
+        engine = self.get_engine()
+        if not top_k:
+            return [None if best is None else (best, None) for best in engine.best_many(symptom_sets)]
+        if hasattr(engine, 'top_k_many'):
+            ranked_lists = engine.top_k_many(symptom_sets, top_k)
+        else:
+            ranked_lists = [engine.top_k(symptoms_set, top_k) for symptoms_set in symptom_sets]
+        return [
+            (ranked[0], self._differential(ranked, symptoms_set)) if ranked else None
+            for symptoms_set, ranked in zip(symptom_sets, ranked_lists)
+        ]
+
+    def predict_many(self, symptom_lists):
+        """
+        Predict diseases for a batch of symptom lists in one engine call.
+        Returns one prediction dict (or None) per list, in order.
+        """
+        symptom_sets = [
+            set(self.canonicalizer.canonicalize_all(symptoms_list or []))
+            for symptoms_list in symptom_lists
+        ]
+        if self.artifact:
+            engine = self.artifact
+        elif getattr(settings, 'PREDICTION_ENGINE', 'index') == 'bayes':
+            # A different model, not just a faster implementation of the heuristic
+            engine = self.get_engine('bayes')
+        else:
+            engine = self.get_engine('matrix' if 'matrix' in available_engines() else None)
+        results = engine.best_many(symptom_sets)
+
+        return [
+            self._build_result(best, disease_cache.get(best[0])) if best else None
+            for best in results
+        ]
+
+    def _differential(self, ranked, symptoms_set):
+        """Serialize ranked engine results with the user's symptoms each disease explains."""
+        if self.artifact:
+            def matched_symptoms(disease_name):
+                return self.artifact.matched_symptoms(disease_name, symptoms_set)
+        else:
+            if self._profiles is None:
+                self._profiles = {
+                    name: frozenset(symptoms)
+                    for name, symptoms in self.snapshot.disease_symptom_map.items()
+                }
+
+            def matched_symptoms(disease_name):
+                # A trained engine may know diseases the current snapshot no longer has
+                return sorted(symptoms_set & self._profiles.get(disease_name, frozenset()))
+        return [
+            {
+                'disease_name': disease_name,
+                'confidence': round(min(99, score), 2),
+                'matched_symptoms': matched_symptoms(disease_name),
+            }
+            for disease_name, score, match_count in ranked
+        ]
+
+    def _build_result(self, best, disease):
+        """Turn an engine result (name, score, matches) into the prediction dict."""
+        best_disease, best_score, best_matches = best
         confidence_score = round(min(99, best_score), 2)
-        
-        try:
-            disease = Disease.objects.get(name=best_disease)
+        if disease is not None:
             return {
                 'disease': disease,
                 'confidence': confidence_score,
                 'severity': disease.severity_level,
                 'specialist': disease.specialist_required
             }
-        except Disease.DoesNotExist:
-            fallback = DISEASE_FALLBACK_INFO.get(best_disease, {})
-            return {
-                'disease_name': best_disease,
-                'confidence': confidence_score,
-                'severity': fallback.get('severity_level', 'moderate'),
-                'specialist': fallback.get('specialist_required', 'General Physician')
-            }
-    
+        fallback = get_fallback_disease_info(best_disease)
+        return {
+            'disease_name': best_disease,
+            'confidence': confidence_score,
+            'severity': fallback.severity_level if fallback else 'moderate',
+            'specialist': fallback.specialist_required if fallback else 'General Physician'
+        }
+
+    @property
+    def canonicalizer(self):
+        """
+        Typo-tolerant SymptomCanonicalizer over the model's symptom vocabulary, built on first use
+        (see symptom_aliases and symptom_typo_min_length).
+        """
+        canonicalizer = self._canonicalizer
+        if canonicalizer is None:
+            vocabulary = self.artifact.symptom_ids if self.artifact else self.snapshot.symptoms
+            canonicalizer = self._canonicalizer = SymptomCanonicalizer(
+                vocabulary, symptom_aliases(), min_typo_length=symptom_typo_min_length()
+            )
+        return canonicalizer
+
+    @property
+    def question_selector(self):
+        """
+        QuestionSelector over the 'matrix' engine's incidence matrix (or the artifact), built on
+        first use; settings.PREDICTION_SYMPTOM_SLIP is its noise level. Needs NumPy.
+        """
+        selector = self._question_selector
+        if selector is None:
+            selector = self._question_selector = QuestionSelector(
+                self.artifact or self.get_engine('matrix'),
+                slip=getattr(settings, 'PREDICTION_SYMPTOM_SLIP', DEFAULT_SLIP),
+            )
+        return selector
+
+    def get_engine(self, name=None):
+        """
+        Scoring engine compiled from the model's snapshot, built on first use and kept on the model.
+        Defaults to the artifact when the model was opened from one, else settings.PREDICTION_ENGINE
+        ('index', 'bitset', 'matrix', 'loop' or 'bayes').
+        """
+        name = name or ('artifact' if self.artifact else getattr(settings, 'PREDICTION_ENGINE', 'index'))
+        engine = self._engines.get(name)
+        if engine is None:
+            if name == 'bayes':
+                engine = self._engines[name] = self._load_bayes()
+            else:
+                engine = self._engines[name] = ENGINES[name](
+                    self.snapshot.disease_symptom_map, self.snapshot.weights
+                )
+        return engine
+
+    def _load_bayes(self):
+        """
+        Naive Bayes engine with the weights trained by `manage.py train_prediction_model`
+        (settings.PREDICTION_BAYES_MODEL); without a usable file it is trained from the
+        snapshot's disease profiles alone.
+        """
+        path = getattr(settings, 'PREDICTION_BAYES_MODEL', None)
+        if path:
+            try:
+                engine = NaiveBayesEngine.load(path)
+            except (OSError, ValueError, KeyError) as exc:
+                logger.warning('Cannot load naive Bayes weights from %s (%s); training from the disease profiles.',
+                               path, exc)
+            else:
+                if engine.knowledge_version != self.knowledge_version:
+                    logger.warning('Naive Bayes weights in %s were trained on knowledge version %s, serving %s; '
+                                   'retrain with train_prediction_model.', path, engine.knowledge_version,
+                                   self.knowledge_version)
+                return engine
+        return NaiveBayesEngine(self.snapshot.disease_symptom_map, self.snapshot.weights)
+
     def get_available_symptoms(self):
         """Get all available symptoms from database"""
         return Symptom.objects.all()
 
 
-def predict_disease(symptoms):
+def predict_disease(symptoms, top_k=None):
     """
     Main function to predict disease from symptoms
     Args:
         symptoms: list of symptom names
+        top_k: optional number of ranked diseases to return as 'differential'
     Returns:
         prediction dict or None
     """
-    model = DiseasePredictionModel()
-    return model.predict(symptoms)
+    return get_model().predict(symptoms, top_k=top_k)
+
+
+# Bounded pool that runs model lookup and scoring for async views (see apredict_disease)
+_scoring_executor = None
+_scoring_executor_lock = threading.Lock()
+
+
+def _get_scoring_executor():
+    global _scoring_executor
+    if _scoring_executor is None:
+        with _scoring_executor_lock:
+            if _scoring_executor is None:
+                _scoring_executor = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'PREDICTION_ASYNC_WORKERS', 4),
+                    thread_name_prefix='prediction-score',
+                )
+    return _scoring_executor
+
+
+def _score_on_worker(symptoms, top_k):
+    # get_model() may build the model or check the knowledge version, both with sync queries
+    model = get_model()
+    return model, model.score(symptoms, top_k=top_k)
+
+
+async def apredict_disease(symptoms, top_k=None):
+    """
+    Async version of predict_disease for ASGI views.
+    Model lookup and CPU-bound scoring run on a bounded thread pool (settings.PREDICTION_ASYNC_WORKERS),
+    so the event loop never blocks; the Disease row comes from the cache without I/O in the steady state.
+    """
+    loop = asyncio.get_running_loop()
+    model, scored = await loop.run_in_executor(_get_scoring_executor(), _score_on_worker, symptoms, top_k)
+    if scored is None:
+        return None
+    return model._prediction(scored, await disease_cache.aget(scored[0][0]))
+
+
+def predict_many(symptom_lists):
+    """
+    Batch version of predict_disease
+    Args:
+        symptom_lists: list of lists of symptom names
+    Returns:
+        list of prediction dicts (or None), one per input list
+    """
+    return get_model().predict_many(symptom_lists)
+
+
+async def aget_disease_recommendations(disease):
+    """Async version of get_disease_recommendations for a Disease instance."""
+    try:
+        return await recommendation_cache.aget(disease)
+    except Exception:
+        return EMPTY_RECOMMENDATIONS
 
 
 def get_disease_recommendations(disease):
     """
-    Get all recommendations for a disease
+    Get all recommendations for a disease (served from the per-process recommendation cache)
     Returns: {
         'precautions': [...],
         'diet': {'recommended': [...], 'avoid': [...]},
@@ -658,70 +553,14 @@ def get_disease_recommendations(disease):
     }
     """
     try:
-        disease_obj = Disease.objects.get(name=disease) if isinstance(disease, str) else disease
+        disease_obj = disease_cache.get(disease) if isinstance(disease, str) else disease
         
         if not disease_obj:
+            if isinstance(disease, str):
+                raise Disease.DoesNotExist(disease)
             return None
         
-        # Get precautions
-        precautions = list(disease_obj.precautions.all().values_list('precaution', flat=True))
-        
-        # Get diet recommendations - ensure all fields are strings
-        diet_recommended = [
-            {
-                'food_item': str(item.get('food_item', '')),
-                'description': str(item.get('description', ''))
-            }
-            for item in disease_obj.diet_recommendations.filter(is_recommended=True).values('food_item', 'description')
-        ]
-        diet_avoid = [
-            {
-                'food_item': str(item.get('food_item', '')),
-                'description': str(item.get('description', ''))
-            }
-            for item in disease_obj.diet_recommendations.filter(is_recommended=False).values('food_item', 'description')
-        ]
-        
-        # Get exercises - ensure all fields are strings
-        exercises = [
-            {
-                'exercise_name': str(ex.get('exercise_name', '')),
-                'description': str(ex.get('description', '')),
-                'duration': str(ex.get('duration', '')),
-                'intensity': str(ex.get('intensity', ''))
-            }
-            for ex in disease_obj.exercises.all().values('exercise_name', 'description', 'duration', 'intensity')
-        ]
-        
-        # Get top 5 medicines - ensure all fields are strings
-        medicines = [
-            {
-                'medicine_name': str(m.get('medicine_name', '')),
-                'generic_name': str(m.get('generic_name', '')),
-                'dosage': str(m.get('dosage', '')),
-                'description': str(m.get('description', '')),
-                'side_effects': str(m.get('side_effects', ''))
-            }
-            for m in disease_obj.medicines.all()[:5].values('medicine_name', 'generic_name', 'dosage', 'description', 'side_effects')
-        ]
-        
-        return {
-            'precautions': [str(p) for p in precautions] if precautions else [],
-            'diet': {
-                'recommended': diet_recommended if diet_recommended else [],
-                'avoid': diet_avoid if diet_avoid else []
-            },
-            'exercises': exercises if exercises else [],
-            'medicines': medicines if medicines else []
-        }
+        return recommendation_cache.get(disease_obj)
     except (Disease.DoesNotExist, AttributeError, Exception) as e:
         # Return empty recommendations structure instead of None
-        return {
-            'precautions': [],
-            'diet': {
-                'recommended': [],
-                'avoid': []
-            },
-            'exercises': [],
-            'medicines': []
-        }
\ No newline at end of file
+        return EMPTY_RECOMMENDATIONS
@@ -33,6 +33,28 @@ class Symptom(models.Model):
         ordering = ['name']
 
 
+class DiseaseSymptom(models.Model):
+    """Symptom in a disease's profile, used by the prediction engine"""
+    disease = models.ForeignKey(Disease, on_delete=models.CASCADE, related_name='symptom_links')
+    symptom = models.ForeignKey(Symptom, on_delete=models.CASCADE, related_name='disease_links')
+    weight = models.FloatField(default=1.0)  # 1.0 = ordinary symptom; higher = more characteristic
+    
+    def __str__(self):
+        return f"{self.disease.name} - {self.symptom.name}"
+    
+    class Meta:
+        unique_together = ('disease', 'symptom')
+
+
+class KnowledgeVersion(models.Model):
+    """Single-row counter bumped whenever the disease–symptom knowledge changes"""
+    version = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"Knowledge version {self.version}"
+
+
 class DiseasePrecaution(models.Model):
     """Precautions for each disease"""
     disease = models.ForeignKey(Disease, on_delete=models.CASCADE, related_name='precautions')
@@ -98,6 +120,7 @@ class PredictionHistory(models.Model):
     predicted_disease = models.ForeignKey(Disease, on_delete=models.SET_NULL, null=True, blank=True)
     disease_name = models.CharField(max_length=200, blank=True)  # used when predicted_disease is null (disease not in DB)
     confidence_score = models.DecimalField(max_digits=5, decimal_places=2)
+    differential = models.TextField(blank=True)  # JSON list of runner-up diseases when top_k was requested
     patient_age = models.IntegerField()
     additional_notes = models.TextField(blank=True)
     consulted_doctor = models.BooleanField(default=False)
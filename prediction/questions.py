@@ -0,0 +1,122 @@
+"""
+Next-best-question suggestions for the symptom checker.
+Given the symptoms a patient has confirmed and the ones they said they do not
+have, every disease gets a posterior under a simple noisy model: a patient
+reports each symptom of the disease's profile with probability 1 - slip and
+any other symptom with probability slip. The suggested question is the
+unasked symptom with the highest expected information gain, i.e. the one
+whose yes/no answer is expected to shrink the entropy of that posterior most.
+The expected entropies have a closed form in two per-symptom sums (posterior
+mass and mass·log mass of the diseases that list the symptom), so one call is
+a few vectorized passes over the disease×symptom incidence matrix the
+'matrix' engine (or a compiled artifact) already holds.
+"""
+
+import math
+
+from .engine import np
+
+# Default probability that a reported symptom disagrees with the disease profile
+DEFAULT_SLIP = 0.05
+
+
+class QuestionSelector:
+    """Ranks symptoms to ask about; engine is a MatrixEngine (or MappedEngine) over the knowledge."""
+
+    def __init__(self, engine, slip=DEFAULT_SLIP):
+        if np is None:
+            raise ImportError('QuestionSelector requires NumPy (pip install numpy).')
+        if not 0 < slip < 0.5:
+            raise ValueError('slip must be between 0 and 0.5.')
+        self.engine = engine
+        self.slip = slip
+        # id -> symptom name (a compiled artifact already stores the vocabulary as a sorted table)
+        symptom_ids = engine.symptom_ids
+        self.vocabulary = tuple(symptom_ids) if isinstance(symptom_ids, dict) else symptom_ids
+        self.n_diseases = len(engine.diseases)
+
+    def _ids(self, symptoms):
+        ids = (self.engine.symptom_ids.get(symptom) for symptom in symptoms)
+        return sorted({i for i in ids if i is not None})
+
+    def _profile_counts(self, symptom_ids):
+        """Per disease, how many of the given symptoms its profile lists (one bincount over their rows)."""
+        indptr, indices = self.engine.indptr, self.engine.indices
+        if not symptom_ids:
+            return np.zeros(self.n_diseases)
+        rows = np.concatenate([indices[indptr[i]:indptr[i + 1]] for i in symptom_ids])
+        return np.bincount(rows, minlength=self.n_diseases).astype(np.float64)
+
+    def posterior(self, present, absent=()):
+        """(p, log p) over the diseases (uniform prior) given confirmed and denied symptoms."""
+        present_ids, absent_ids = self._ids(present), self._ids(absent)
+        log_hit, log_slip = math.log(1 - self.slip), math.log(self.slip)
+        matched = self._profile_counts(present_ids)
+        denied = self._profile_counts(absent_ids)
+        log_weight = (
+            matched * log_hit + (len(present_ids) - matched) * log_slip
+            + denied * log_slip + (len(absent_ids) - denied) * log_hit
+        )
+        log_weight -= log_weight.max()
+        log_p = log_weight - math.log(np.exp(log_weight).sum())
+        return np.exp(log_p), log_p
+
+    def information_gain(self, present, absent=()):
+        """
+        (gain, entropy, p_yes): expected entropy reduction in bits of asking about each symptom
+        (indexed by symptom id; -inf for symptoms already asked about), the current entropy in
+        bits and each symptom's probability of a yes.
+        """
+        p, log_p = self.posterior(present, absent)
+        plogp = p * log_p
+        entropy = -plogp.sum()
+
+        # Per symptom: posterior mass and sum of p·log p of the diseases listing it (CSR row sums)
+        indptr, indices = self.engine.indptr, self.engine.indices
+        mass = np.concatenate(([0.0], np.cumsum(p[indices])))
+        mass = np.clip(mass[indptr[1:]] - mass[indptr[:-1]], 0.0, 1.0)
+        mass_log = np.concatenate(([0.0], np.cumsum(plogp[indices])))
+        mass_log = mass_log[indptr[1:]] - mass_log[indptr[:-1]]
+
+        hit, slip = 1 - self.slip, self.slip
+        log_hit, log_slip = math.log(hit), math.log(slip)
+        total_log = -entropy
+        p_yes = hit * mass + slip * (1 - mass)
+        p_no = 1 - p_yes
+        # P(answer) · H(posterior | answer), expanded so no per-disease posterior is materialized
+        expected_yes = (
+            -(hit * (mass_log + mass * log_hit) + slip * (total_log - mass_log + (1 - mass) * log_slip))
+            + p_yes * np.log(p_yes)
+        )
+        expected_no = (
+            -(slip * (mass_log + mass * log_slip) + hit * (total_log - mass_log + (1 - mass) * log_hit))
+            + p_no * np.log(p_no)
+        )
+        gain = (entropy - expected_yes - expected_no) / math.log(2)
+        gain[self._ids(present) + self._ids(absent)] = -np.inf
+        return gain, entropy / math.log(2), p_yes
+
+    def suggest(self, present, absent=(), limit=3):
+        """
+        Up to limit {'symptom', 'information_gain', 'p_yes'} dicts, best question first;
+        'entropy' is the uncertainty (bits) left over the diseases before asking.
+        """
+        gain, entropy, p_yes = self.information_gain(present, absent)
+        limit = min(limit, int(np.isfinite(gain).sum()))
+        if limit < 1:
+            return {'entropy': round(float(entropy), 4), 'questions': []}
+        # Everything tied with the limit-th best is kept, so ties go to the first symptom in name order
+        threshold = -np.partition(-gain, limit - 1)[limit - 1]
+        best = np.flatnonzero(gain >= threshold)
+        best = best[np.lexsort((best, -gain[best]))][:limit]
+        return {
+            'entropy': round(float(entropy), 4),
+            'questions': [
+                {
+                    'symptom': self.vocabulary[int(i)],
+                    'information_gain': round(float(gain[i]), 4),
+                    'p_yes': round(float(p_yes[i]), 4),
+                }
+                for i in best.tolist()
+            ],
+        }
@@ -0,0 +1,186 @@
+"""
+Process-wide registry for the disease prediction model.
+The model and its compiled engine are built once per process, on first use
+or at worker startup (settings.PREDICTION_WARM_ON_STARTUP), and shared by
+every request thread afterwards.
+
+Each model is built from an immutable KnowledgeSnapshot. When the knowledge
+version in the database moves on, a background thread builds a new model and
+swaps it in with a single assignment (copy-on-write): requests already holding
+the old model finish with it and no request waits for the rebuild.
+
+With settings.PREDICTION_MODEL_ARTIFACT set, the model is memory-mapped from a
+compiled file (see prediction.artifact) that all workers share; a worker that
+finds the file stale rewrites it before mapping it.
+"""
+
+import logging
+import os
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_model = None
+_stats = {}
+_checked_at = 0.0
+_rebuilding = False
+
+
+def get_model():
+    """Return the shared DiseasePredictionModel, building it on first call (thread-safe)."""
+    model = _model
+    if model is None:
+        with _lock:
+            if _model is None:
+                _install(*_build())
+            model = _model
+    else:
+        _check_version(model)
+    return model
+
+
+def warm_model():
+    """Build the shared model now (e.g. from the WSGI/ASGI entry point) instead of on the first request."""
+    return get_model()
+
+
+def refresh_model():
+    """Rebuild the shared model from the current knowledge right away (blocking)."""
+    with _lock:
+        _install(*_build())
+    return _model
+
+
+def reset_model():
+    """Drop the shared model; the next get_model() call rebuilds it."""
+    global _model, _stats
+    with _lock:
+        _model = None
+        _stats = {}
+
+
+def mark_stale():
+    """Make the next request re-check the knowledge version instead of waiting for the interval."""
+    global _checked_at
+    _checked_at = 0.0
+
+
+def model_stats():
+    """Build time, memory footprint and prediction cache stats of the shared model (empty until built)."""
+    stats = dict(_stats)
+    model = _model
+    if model is not None:
+        stats['prediction_cache'] = model.cache.stats()
+    return stats
+
+
+def _check_version(model):
+    """Start a background rebuild if the database knowledge is newer than the model's snapshot."""
+    global _checked_at, _rebuilding
+    interval = getattr(settings, 'PREDICTION_KNOWLEDGE_CHECK_INTERVAL', 5)
+    now = time.monotonic()
+    if not interval or _rebuilding or now - _checked_at < interval:
+        return
+    _checked_at = now
+
+    from .knowledge import current_version
+    if current_version() == model.knowledge_version:
+        return
+    if not _lock.acquire(blocking=False):
+        return
+    _rebuilding = True
+    threading.Thread(target=_rebuild_in_background, name='prediction-rebuild', daemon=True).start()
+
+
+def _rebuild_in_background():
+    global _rebuilding
+    try:
+        # No tracemalloc here: tracing slows every thread of a serving worker
+        _install(*_build(trace_memory=False))
+    except Exception:
+        logger.exception('Rebuilding the prediction model failed; keeping the current one.')
+    finally:
+        _rebuilding = False
+        _lock.release()
+        # This thread opened its own database connection
+        connections.close_all()
+
+
+def _install(model, stats):
+    global _model, _stats
+    _stats = stats
+    _model = model
+
+
+def _build(trace_memory=True):
+    """
+    Load the current snapshot and compile a model for it; memory_bytes is None when not traced.
+    With settings.PREDICTION_MODEL_ARTIFACT the model is mapped from that file instead,
+    which is (re)written first if it is missing, stale or in an older format.
+    """
+    from .knowledge import load_snapshot
+    from .ml_model import DiseasePredictionModel
+
+    artifact_path = getattr(settings, 'PREDICTION_MODEL_ARTIFACT', None)
+    engine_name = 'artifact' if artifact_path else getattr(settings, 'PREDICTION_ENGINE', 'index')
+    # Only start tracing allocations if nobody else is tracing already
+    start_tracing = trace_memory and not tracemalloc.is_tracing()
+    if start_tracing:
+        tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0] if trace_memory else 0
+    started = time.perf_counter()
+    try:
+        if artifact_path:
+            artifact = _open_artifact(artifact_path)
+            loaded = time.perf_counter()
+            model = DiseasePredictionModel(artifact=artifact)
+        else:
+            snapshot = load_snapshot()
+            loaded = time.perf_counter()
+            model = DiseasePredictionModel(snapshot)
+            model.get_engine(engine_name)
+        finished = time.perf_counter()
+        memory_bytes = tracemalloc.get_traced_memory()[0] - before if trace_memory else None
+    finally:
+        if start_tracing:
+            tracemalloc.stop()
+
+    stats = {
+        'engine': engine_name,
+        'pid': os.getpid(),
+        'knowledge_version': model.knowledge_version,
+        'knowledge_source': artifact.source if artifact_path else snapshot.source,
+        'diseases': len(artifact.diseases) if artifact_path else len(snapshot.disease_symptom_map),
+        'load_seconds': round(loaded - started, 6),
+        'build_seconds': round(finished - started, 6),
+        'memory_bytes': memory_bytes,
+        'built_at': time.time(),
+    }
+    if artifact_path:
+        # Mapped pages are shared through the page cache and not counted in memory_bytes
+        stats['artifact_path'] = artifact.path
+        stats['artifact_bytes'] = artifact.size
+    return model, stats
+
+
+def _open_artifact(path):
+    """Map the artifact at path, rewriting it from the database first if it does not match the current knowledge."""
+    from .artifact import ArtifactError, MappedEngine, write_artifact
+    from .knowledge import current_version, load_snapshot
+
+    try:
+        artifact = MappedEngine(path)
+        if artifact.knowledge_version == current_version():
+            return artifact
+        logger.info('Prediction model artifact %s is stale; rebuilding it.', path)
+    except ArtifactError as exc:
+        logger.info('Rebuilding the prediction model artifact: %s', exc)
+    snapshot = load_snapshot()
+    write_artifact(path, snapshot.disease_symptom_map, snapshot.weights, snapshot.version, snapshot.source)
+    return MappedEngine(path)
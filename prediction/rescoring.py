@@ -0,0 +1,106 @@
+"""
+Re-scoring stored predictions against the current disease–symptom knowledge.
+Django-free so rescore_history can run it in worker processes: each worker
+compiles the engine and the symptom canonicalizer once (init_worker) and then
+scores chunks of history rows, returning the rows whose outcome changed plus
+mergeable summary statistics.
+"""
+
+import json
+from collections import Counter
+
+from .canonical import MIN_TYPO_LENGTH, SymptomCanonicalizer
+from .engine import ENGINES
+
+# Upper bounds (exclusive) of the confidence-delta histogram buckets, in points
+DELTA_BUCKETS = (-20, -5, -0.5, 0.5, 5, 20, float('inf'))
+
+_engine = None
+_canonicalizer = None
+
+
+def init_worker(disease_symptom_map, weights, engine_name, aliases=None, min_typo_length=MIN_TYPO_LENGTH,
+                engine=None):
+    """
+    Compile the engine and canonicalizer for this process (ProcessPoolExecutor initializer).
+    A prebuilt engine (the serving model's trained 'bayes' engine) is used as is instead.
+    """
+    global _engine, _canonicalizer
+    _engine = engine if engine is not None else ENGINES[engine_name](disease_symptom_map, weights)
+    # Stored symptoms are matched to the vocabulary the same way predict() matches them
+    _canonicalizer = SymptomCanonicalizer(
+        {s for profile in disease_symptom_map.values() for s in profile}, aliases, min_typo_length
+    )
+
+
+def new_stats():
+    return {
+        'rows': 0,
+        'unparseable': 0,
+        'no_prediction_now': 0,
+        'changed_top': 0,
+        'confidence_delta_sum': 0.0,
+        'confidence_delta_abs_sum': 0.0,
+        'confidence_delta_max_abs': 0.0,
+        'delta_histogram': [0] * len(DELTA_BUCKETS),
+        'transitions': Counter(),
+    }
+
+
+def merge_stats(total, part):
+    for key in ('rows', 'unparseable', 'no_prediction_now', 'changed_top',
+                'confidence_delta_sum', 'confidence_delta_abs_sum'):
+        total[key] += part[key]
+    total['confidence_delta_max_abs'] = max(total['confidence_delta_max_abs'], part['confidence_delta_max_abs'])
+    total['delta_histogram'] = [a + b for a, b in zip(total['delta_histogram'], part['delta_histogram'])]
+    total['transitions'].update(part['transitions'])
+    return total
+
+
+def rescore_chunk(rows):
+    """
+    Score (pk, symptoms_json, old_disease, old_confidence) rows with the worker's engine.
+    Returns (stats, changes); changes lists (pk, old_disease, new_disease, old_confidence,
+    new_confidence) for rows whose top disease or confidence moved.
+    """
+    stats = new_stats()
+    changes = []
+    histogram = stats['delta_histogram']
+    for pk, symptoms_json, old_disease, old_confidence in rows:
+        stats['rows'] += 1
+        try:
+            symptoms = json.loads(symptoms_json)
+            symptoms_set = _canonicalizer.canonicalize_all(str(s) for s in symptoms)
+        except (TypeError, ValueError, AttributeError):
+            stats['unparseable'] += 1
+            continue
+        best = _engine.best(symptoms_set) if symptoms_set else None
+        if best is None:
+            stats['no_prediction_now'] += 1
+            new_disease, new_confidence = '', 0.0
+        else:
+            # Same rounding as DiseasePredictionModel._build_result
+            new_disease, new_confidence = best[0], round(min(99, best[1]), 2)
+        delta = round(new_confidence - old_confidence, 2)
+        stats['confidence_delta_sum'] += delta
+        stats['confidence_delta_abs_sum'] += abs(delta)
+        stats['confidence_delta_max_abs'] = max(stats['confidence_delta_max_abs'], abs(delta))
+        histogram[next(i for i, bound in enumerate(DELTA_BUCKETS) if delta < bound)] += 1
+        if new_disease != old_disease:
+            stats['changed_top'] += 1
+            stats['transitions'][(old_disease, new_disease)] += 1
+        if new_disease != old_disease or delta:
+            changes.append((pk, old_disease, new_disease, old_confidence, new_confidence))
+    return stats, changes
+
+
+def stats_to_json(stats):
+    data = dict(stats)
+    data['transitions'] = [[old, new, count] for (old, new), count in stats['transitions'].most_common()]
+    return data
+
+
+def stats_from_json(data):
+    stats = dict(data)
+    stats['transitions'] = Counter({(old, new): count for old, new, count in data['transitions']})
+    return stats
@@ -0,0 +1,87 @@
+"""
+Signal handlers that keep the per-process prediction caches in sync with the database.
+Connected in PredictionConfig.ready().
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .autocomplete import symptom_autocomplete
+from .cache import disease_cache, recommendation_cache
+from .extraction import symptom_extractor
+from .knowledge import bump_version
+from .models import (Disease, DiseaseDiet, DiseaseExercise, DiseaseMedicine,
+                     DiseasePrecaution, DiseaseSymptom, Symptom)
+from .registry import mark_stale
+
+_state = threading.local()
+
+
+@contextmanager
+def deferred_version_bump():
+    """
+    Skip the per-row knowledge version bump (a database write) for saves and deletes in this
+    thread, e.g. a bulk QuerySet.delete(); the caller bumps the version once afterwards.
+    The in-memory cache invalidations still run.
+    """
+    previous = getattr(_state, 'deferred', False)
+    _state.deferred = True
+    try:
+        yield
+    finally:
+        _state.deferred = previous
+
+
+@receiver(post_save, sender=Disease)
+@receiver(post_delete, sender=Disease)
+def invalidate_disease_cache(sender, instance, **kwargs):
+    disease_cache.invalidate()
+    recommendation_cache.invalidate(instance.pk)
+
+
+@receiver(post_save, sender=Symptom)
+@receiver(post_delete, sender=Symptom)
+def invalidate_symptom_autocomplete(sender, **kwargs):
+    symptom_autocomplete.invalidate()
+
+
+@receiver(post_save, sender=Symptom)
+def add_extractor_symptom(sender, instance, created, **kwargs):
+    # New symptoms (approved suggestions) are added incrementally; a rename needs a rebuild
+    if created:
+        symptom_extractor.add(instance.name)
+    else:
+        symptom_extractor.invalidate()
+
+
+@receiver(post_delete, sender=Symptom)
+def invalidate_symptom_extractor(sender, **kwargs):
+    symptom_extractor.invalidate()
+
+
+@receiver(post_save, sender=Disease)
+@receiver(post_delete, sender=Disease)
+@receiver(post_save, sender=Symptom)
+@receiver(post_delete, sender=Symptom)
+@receiver(post_save, sender=DiseaseSymptom)
+@receiver(post_delete, sender=DiseaseSymptom)
+def bump_knowledge_version(sender, **kwargs):
+    """Disease/symptom names and links feed the compiled snapshot; any change makes it stale."""
+    if getattr(_state, 'deferred', False):
+        return
+    bump_version()
+    mark_stale()
+
+
+@receiver(post_save, sender=DiseasePrecaution)
+@receiver(post_delete, sender=DiseasePrecaution)
+@receiver(post_save, sender=DiseaseDiet)
+@receiver(post_delete, sender=DiseaseDiet)
+@receiver(post_save, sender=DiseaseExercise)
+@receiver(post_delete, sender=DiseaseExercise)
+@receiver(post_save, sender=DiseaseMedicine)
+@receiver(post_delete, sender=DiseaseMedicine)
+def invalidate_recommendations(sender, instance, **kwargs):
+    recommendation_cache.invalidate(instance.disease_id)
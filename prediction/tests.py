@@ -1,3 +1,1213 @@
-from django.test import TestCase
+import json
+import math
+import os
+import random
+import struct
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import FrozenInstanceError
+from datetime import date
+from io import StringIO
+from tempfile import NamedTemporaryFile, TemporaryDirectory
+from types import MappingProxyType
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from accounts.models import PatientProfile, User
+
+from .artifact import FORMAT_VERSION, MAGIC, ArtifactError, MappedEngine, read_header, write_artifact
+from .autocomplete import symptom_autocomplete
+from .batching import MicroBatcher, batcher_stats, get_batcher, reset_batcher
+from .benchmarks import latency_stats, measure_allocations, synthetic_catalog, synthetic_queries, time_calls
+from .cache import PredictionLRU, RecommendationCache, disease_cache, recommendation_cache
+from .canonical import SymptomCanonicalizer, match_key
+from .evaluation import read_cases
+from .extraction import SymptomExtractor, symptom_extractor
+from .knowledge_io import detect_format, iter_json, iter_records, open_text
+from .knowledge import KnowledgeSnapshot, builtin_snapshot, current_version, load_snapshot
+from .ml_model import (EMPTY_RECOMMENDATIONS, DiseasePredictionModel, fallback_info, get_fallback_disease_info,
+                       get_fallback_recommendations, predict_disease, symptom_aliases)
+from .engine import ENGINES, BitsetEngine, MatrixEngine, NaiveBayesEngine, ReferenceEngine, available_engines
+from .models import Disease, DiseasePrecaution, DiseaseSymptom, PredictionHistory, Symptom
+from .questions import QuestionSelector
+from .registry import get_model, mark_stale, model_stats, refresh_model, reset_model, warm_model
+
+
+class SymptomCanonicalizerTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.canonicalizer = SymptomCanonicalizer(builtin_snapshot().symptoms, symptom_aliases())
+
+    def test_exact_and_alias_matches(self):
+        self.assertEqual(self.canonicalizer.lookup('Chest Pain'), ('chest_pain', 0))
+        self.assertEqual(self.canonicalizer.lookup('head ache'), ('headache', 0))
+        self.assertEqual(self.canonicalizer.lookup('throwing up'), ('vomiting', 0))
+
+    def test_disease_names_are_not_symptom_aliases(self):
+        diseases = {match_key(name) for name in builtin_snapshot().disease_symptom_map}
+        self.assertEqual([alias for alias in symptom_aliases() if match_key(alias) in diseases], [])
+        self.assertEqual(self.canonicalizer.lookup('migraine'), (None, None))
+
+    def test_single_typos_are_corrected(self):
+        for typed, expected in [
+            ('Headahce', 'headache'),
+            ('vomitting', 'vomiting'),
+            ('diarhea', 'diarrhea'),
+            ('shortnes of breath', 'shortness_of_breath'),
+            ('weigth loss', 'weight_loss'),
+        ]:
+            with self.subTest(typed=typed):
+                self.assertEqual(self.canonicalizer.lookup(typed), (expected, 1))
+
+    def test_nearby_but_different_terms_are_not_matched(self):
+        for typed, wrong in [
+            ('no fever', 'fever'),
+            ('weight gain', 'weight_loss'),
+            ('back pain', 'neck_pain'),
+            ('eye pain', 'ear_pain'),
+            ('chest', 'chest_pain'),
+            ('cough blood', 'cough'),
+        ]:
+            with self.subTest(typed=typed):
+                self.assertNotEqual(self.canonicalizer.canonicalize(typed), wrong)
+
+    def test_unresolved_terms_stay_unknown_symptoms(self):
+        self.assertEqual(
+            self.canonicalizer.canonicalize_all(['no fever', 'back pain', 'Fever']),
+            {'no_fever', 'back_pain', 'fever'},
+        )
+
+    def test_negated_and_antonym_terms_are_not_corrected(self):
+        canonicalizer = SymptomCanonicalizer({'fever', 'weight_loss', 'weight_gain'})
+        self.assertIsNone(canonicalizer.canonicalize('no feverr'))
+        self.assertEqual(canonicalizer.canonicalize('weight gainn'), 'weight_gain')
+        canonicalizer = SymptomCanonicalizer({'increased_appetite'})
+        self.assertIsNone(canonicalizer.canonicalize('decreased appetite'))
+
+    def test_short_words_and_ambiguous_typos_are_not_corrected(self):
+        self.assertIsNone(self.canonicalizer.canonicalize('fevr'))
+        # One typo away from both 'hearing' and 'heaving'
+        self.assertIsNone(SymptomCanonicalizer({'hearing', 'heaving'}).canonicalize('hearving'))
+        self.assertEqual(SymptomCanonicalizer({'tremor'}, min_typo_length=0).lookup('tremorr'), (None, None))
+
+
+class SymptomExtractorTests(SimpleTestCase):
+    def setUp(self):
+        self.extractor = SymptomExtractor({
+            'nausea': 'nausea', 'vomiting': 'vomiting', 'throwing up': 'vomiting', 'diarrhea': 'diarrhea',
+            'fever': 'fever', 'chills': 'chills', 'cough': 'cough', 'chest pain': 'chest_pain',
+            'sharp chest pain': 'sharp_chest_pain',
+        })
+
+    def test_leftmost_longest_match(self):
+        self.assertEqual(
+            self.extractor.extract('Sharp chest pain since Monday, throwing up'),
+            ['sharp_chest_pain', 'vomiting'],
+        )
+
+    def test_negation_covers_a_list(self):
+        for text in [
+            'patient denies nausea, vomiting, or diarrhea',
+            'Denies nausea, vomiting and diarrhea.',
+            'no nausea nor vomiting, diarrhea',
+        ]:
+            with self.subTest(text=text):
+                self.assertEqual(self.extractor.extract(text), [])
+
+    def test_negation_ends_at_sentence_break_or_but(self):
+        self.assertEqual(self.extractor.extract('No fever or chills. Has a cough'), ['cough'])
+        self.assertEqual(self.extractor.extract('no fever, but vomiting since morning'), ['vomiting'])
+        self.assertEqual(self.extractor.extract('denies nausea and vomiting, has diarrhea'), ['diarrhea'])
+
+
+class SyncSymptomsTests(TestCase):
+    def test_prune_deletes_in_batches_and_bumps_the_version_once(self):
+        call_command('sync_symptoms', stdout=StringIO())
+        Symptom.objects.bulk_create(Symptom(name=f'Unused {i}', description='') for i in range(50))
+        # bulk_create sends no signals
+        symptom_autocomplete.invalidate()
+        symptom_extractor.invalidate()
+        version = current_version()
+        self.assertEqual(len(symptom_autocomplete.search('unused', 100)), 50)
+        self.assertEqual(symptom_extractor.extract('unused 7'), ['unused_7'])
+        with CaptureQueriesContext(connection) as queries:
+            call_command('sync_symptoms', '--prune', '--batch-size', '20', stdout=StringIO())
+        self.assertFalse(Symptom.objects.filter(name__startswith='Unused').exists())
+        self.assertEqual(current_version(), version + 1)
+        self.assertEqual(sum('prediction_knowledgeversion' in q['sql'] for q in queries), 1)
+        # The per-row signals still drop the deleted names from the symptom caches
+        self.assertEqual(symptom_autocomplete.search('unused', 100), [])
+        self.assertEqual(symptom_extractor.extract('unused 7'), [])
+
+
+class SynchronousThread:
+    """Stands in for threading.Thread and runs the target on start()."""
+
+    def __init__(self, target, **kwargs):
+        self.target = target
+
+    def start(self):
+        self.target()
+
+
+class RecommendationCacheTests(TestCase):
+    def setUp(self):
+        self.cache = RecommendationCache()
+        self.flu = Disease.objects.create(name='Flu', description='', severity_level='low', specialist_required='GP')
+        self.cold = Disease.objects.create(name='Cold', description='', severity_level='low', specialist_required='GP')
+        DiseasePrecaution.objects.create(disease=self.flu, precaution='Rest')
+
+    def test_first_lookup_loads_every_bundle_once(self):
+        with self.assertNumQueries(5):
+            self.assertEqual(self.cache.get(self.flu)['precautions'], ['Rest'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.cache.get(self.cold)['precautions'], [])
+        self.assertEqual(self.cache.loads, 1)
+
+    def test_stale_bundles_are_served_while_one_thread_reloads(self):
+        self.cache.get(self.flu)
+        self.cache._loaded_at -= 10 ** 6
+        DiseasePrecaution.objects.create(disease=self.flu, precaution='Fluids', priority=2)
+        with mock.patch('prediction.cache.threading.Thread') as thread:
+            self.assertEqual(self.cache.get(self.flu)['precautions'], ['Rest'])
+            self.assertEqual(self.cache.get(self.flu)['precautions'], ['Rest'])
+        thread.assert_called_once()
+        with mock.patch('prediction.cache.connections'):
+            self.cache._reload_in_background()
+        self.assertEqual(self.cache.get(self.flu)['precautions'], ['Rest', 'Fluids'])
+        self.assertEqual(self.cache.loads, 2)
+
+    def test_invalidation_during_a_reload_is_not_lost(self):
+        self.cache.get(self.flu)
+        self.cache._loaded_at -= 10 ** 6
+        serialize = self.cache._serialize
+
+        def serialize_then_change(queryset):
+            loaded = serialize(queryset)
+            DiseasePrecaution.objects.create(disease=self.flu, precaution='Fluids', priority=2)
+            self.cache.invalidate(self.flu.pk)
+            return loaded
+
+        with mock.patch.object(self.cache, '_serialize', serialize_then_change), \
+                mock.patch('prediction.cache.threading.Thread', SynchronousThread), \
+                mock.patch('prediction.cache.connections'):
+            self.cache.get(self.cold)
+        self.assertEqual(self.cache.get(self.flu)['precautions'], ['Rest', 'Fluids'])
+
+
+class PatientClientTestCase(TestCase):
+    """Logged-in patient client and a fresh shared model for endpoint tests."""
+
+    def setUp(self):
+        reset_model()
+        self.user = User.objects.create_user(
+            username='patient', email='patient@example.com', password='pw', user_type='patient'
+        )
+        self.patient = PatientProfile.objects.create(
+            user=self.user, date_of_birth=date(1990, 1, 1), gender='other', address='-',
+            emergency_contact='+123456789'
+        )
+        self.client.force_login(self.user)
+
+    def post_json(self, name, payload):
+        return self.client.post(reverse(f'prediction:{name}'), json.dumps(payload), content_type='application/json')
+
+
+class PredictEndpointTests(PatientClientTestCase):
+    symptoms = ['fever', 'cough', 'fatigue', 'body_aches']
+
+    def test_top_k_returns_a_differential_of_that_length(self):
+        for top_k in (1, 3):
+            with self.subTest(top_k=top_k):
+                response = self.post_json('predict_disease', {'symptoms': self.symptoms, 'top_k': top_k})
+                self.assertEqual(response.status_code, 200)
+                data = response.json()
+                self.assertEqual(len(data['differential']), top_k)
+                self.assertEqual(data['differential'][0]['disease_name'], data['disease_name'])
+
+    def test_no_top_k_has_no_differential(self):
+        data = self.post_json('predict_disease', {'symptoms': self.symptoms}).json()
+        self.assertNotIn('differential', data)
+
+    def test_top_k_out_of_range_is_rejected(self):
+        self.assertEqual(self.post_json('predict_disease', {'symptoms': self.symptoms, 'top_k': 0}).status_code, 400)
+
+
+# No background model rebuilds while the test database is in use
+@override_settings(PREDICTION_KNOWLEDGE_CHECK_INTERVAL=0)
+class AsyncPredictEndpointTests(PatientClientTestCase):
+    payload = {'symptoms': ['fever', 'cough', 'fatigue'], 'text': 'I also have body aches', 'top_k': 3}
+
+    async def apost_json(self, name, payload):
+        return await self.async_client.post(reverse(f'prediction:{name}'), json.dumps(payload),
+                                            content_type='application/json')
+
+    async def test_requires_login_and_post(self):
+        response = await self.apost_json('predict_disease_async', self.payload)
+        self.assertEqual(response.status_code, 302)
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('prediction:predict_disease_async'))
+        self.assertEqual(response.status_code, 405)
+
+    async def test_doctors_are_refused(self):
+        doctor = await User.objects.acreate_user(username='doctor', password='pw', user_type='doctor')
+        await self.async_client.aforce_login(doctor)
+        response = await self.apost_json('predict_disease_async', self.payload)
+        self.assertEqual(response.status_code, 403)
+
+    async def test_response_matches_the_sync_view_and_is_saved(self):
+        await self.async_client.aforce_login(self.user)
+        for with_disease_row in (False, True):
+            with self.subTest(with_disease_row=with_disease_row):
+                expected = await sync_to_async(self.post_json)('predict_disease', self.payload)
+                expected = expected.json()
+                if with_disease_row:
+                    disease = await Disease.objects.acreate(name=expected['disease_name'], description='',
+                                                            severity_level='low', specialist_required='GP')
+                    await DiseasePrecaution.objects.acreate(disease=disease, precaution='Rest')
+                    expected = (await sync_to_async(self.post_json)('predict_disease', self.payload)).json()
+                    self.assertEqual(expected['recommendations']['precautions'], ['Rest'])
+                history = await PredictionHistory.objects.acount()
+
+                response = await self.apost_json('predict_disease_async', self.payload)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json(), expected)
+                self.assertEqual(len(expected['differential']), 3)
+                self.assertEqual(await PredictionHistory.objects.acount(), history + 1)
+                saved = await PredictionHistory.objects.order_by('-pk').afirst()
+                self.assertEqual(saved.disease_name, expected['disease_name'])
+                self.assertEqual(json.loads(saved.symptoms), ['fever', 'cough', 'fatigue', 'Body aches'])
+
+    async def test_bad_payloads_are_rejected_like_the_sync_view(self):
+        await self.async_client.aforce_login(self.user)
+        for payload in ({'symptoms': []}, {'symptoms': self.payload['symptoms'], 'top_k': 0}):
+            with self.subTest(payload=payload):
+                expected = await sync_to_async(self.post_json)('predict_disease', payload)
+                response = await self.apost_json('predict_disease_async', payload)
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+
+
+class LiveScoringTests(PatientClientTestCase):
+    def assert_matches_predict(self, symptoms):
+        live = self.post_json('live_scoring', {'reset': True, 'add': symptoms, 'top_k': 5}).json()
+        predicted = self.post_json('predict_disease', {'symptoms': symptoms, 'top_k': 5}).json()
+        self.assertEqual(
+            [(c['disease_name'], c['confidence']) for c in live['candidates']],
+            [(d['disease_name'], d['confidence']) for d in predicted['differential']],
+        )
+
+    def test_toggles_update_the_selection(self):
+        data = self.post_json('live_scoring', {'add': ['Fever', 'Cough']}).json()
+        self.assertTrue(data['restarted'])
+        self.assertEqual(data['symptoms'], ['cough', 'fever'])
+        data = self.post_json('live_scoring', {'add': ['fatigue'], 'remove': ['Cough']}).json()
+        self.assertFalse(data['restarted'])
+        self.assertEqual(data['symptoms'], ['fatigue', 'fever'])
+        self.assertLessEqual(len(data['candidates']), 5)
+
+    def test_candidates_match_predict(self):
+        for symptoms in (['fever', 'cough', 'fatigue'], ['headache', 'nausea', 'light_sensitivity', 'aura']):
+            with self.subTest(symptoms=symptoms):
+                self.assert_matches_predict(symptoms)
+
+    @override_settings(PREDICTION_ENGINE='bayes')
+    def test_candidates_match_predict_with_the_bayes_engine(self):
+        self.assert_matches_predict(['fever', 'cough', 'fatigue', 'sneezing'])
+
+    def test_top_k_is_validated(self):
+        self.assertEqual(self.post_json('live_scoring', {'add': ['fever'], 'top_k': 0}).status_code, 400)
+
+
+class ReadCasesTests(SimpleTestCase):
+    csv = 'symptoms,disease\nthrowing up;Headahce;Fever,Migraine\n"[""chest pain"", ""cough""]",Bronchitis\n'
+
+    def test_symptoms_are_canonicalized_like_predict(self):
+        canonicalizer = SymptomCanonicalizer(builtin_snapshot().symptoms, symptom_aliases())
+        cases = list(read_cases(StringIO(self.csv), canonicalizer=canonicalizer))
+        self.assertEqual(cases, [
+            ({'vomiting', 'headache', 'fever'}, 'Migraine'),
+            ({'chest_pain', 'cough'}, 'Bronchitis'),
+        ])
+
+    def test_without_a_canonicalizer_names_are_only_normalized(self):
+        cases = list(read_cases(StringIO(self.csv)))
+        self.assertEqual(cases[0][0], {'throwing_up', 'headahce', 'fever'})
+
+    def test_missing_column_is_an_error(self):
+        with self.assertRaisesMessage(ValueError, 'Missing column(s): disease'):
+            list(read_cases(StringIO('symptoms,label\nfever,Flu\n')))
+
+
+class EvaluateModelCommandTests(TestCase):
+    def setUp(self):
+        reset_model()
+        self.addCleanup(reset_model)
+
+    def evaluate(self, cases, engine):
+        with NamedTemporaryFile('w', suffix='.csv', delete=False) as f:
+            f.write('symptoms,disease\n' + cases)
+        self.addCleanup(os.remove, f.name)
+        results = f'{f.name}.json'
+        self.addCleanup(os.remove, results)
+        call_command('evaluate_model', f.name, '--engines', engine, '--json', results, stdout=StringIO())
+        with open(results, encoding='utf-8') as f:
+            return json.load(f)['engines'][engine]
+
+    def test_cases_are_canonicalized_like_predict(self):
+        result = self.evaluate('sneezng;congestoin;scratchy thraot,Common Cold\n', 'index')
+        self.assertEqual(result['top1_accuracy'], 1.0)
+
+    def test_bayes_is_evaluated_with_the_trained_weights(self):
+        symptoms = ['fever', 'cough', 'fatigue', 'headache']
+        cases = f'{";".join(symptoms)},Migraine\n'
+        self.assertEqual(self.evaluate(cases, 'bayes')['top1_accuracy'], 0.0)
+
+        weights = NamedTemporaryFile(suffix='.npz', delete=False).name
+        self.addCleanup(os.remove, weights)
+        snapshot = builtin_snapshot()
+        NaiveBayesEngine(
+            snapshot.disease_symptom_map, cases=[(set(symptoms), 'Migraine')] * 50
+        ).save(weights, knowledge_version=snapshot.version)
+        reset_model()
+        with override_settings(PREDICTION_BAYES_MODEL=weights):
+            self.assertEqual(self.evaluate(cases, 'bayes')['top1_accuracy'], 1.0)
+
+
+class RescoreHistoryCommandTests(PatientClientTestCase):
+    symptoms = ['fever', 'cough', 'fatigue', 'headache']
+
+    def rescore(self, *args):
+        output = NamedTemporaryFile(suffix='.csv', delete=False).name
+        self.addCleanup(os.remove, output)
+        self.addCleanup(os.remove, f'{output}.checkpoint.json')
+        call_command('rescore_history', '--output', output, '--workers', '1', *args, stdout=StringIO())
+        with open(output, encoding='utf-8') as f:
+            return f.read().splitlines()[1:]
+
+    def test_bayes_rescoring_uses_the_trained_weights(self):
+        weights = NamedTemporaryFile(suffix='.npz', delete=False).name
+        self.addCleanup(os.remove, weights)
+        snapshot = builtin_snapshot()
+        # Cases that make the trained engine disagree with one trained on the profiles alone
+        NaiveBayesEngine(
+            snapshot.disease_symptom_map, cases=[(set(self.symptoms), 'Migraine')] * 50
+        ).save(weights, knowledge_version=snapshot.version)
+        PredictionHistory.objects.create(
+            patient=self.patient, symptoms=json.dumps(self.symptoms), disease_name='Flu', confidence_score=10,
+            patient_age=30,
+        )
+        with override_settings(PREDICTION_ENGINE='bayes', PREDICTION_BAYES_MODEL=weights):
+            reset_model()
+            served = get_model().predict(self.symptoms)
+            changes = self.rescore('--engine', 'bayes')
+        self.assertEqual(served['disease_name'], 'Migraine')
+        self.assertEqual(len(changes), 1)
+        _, _, new_disease, _, new_confidence = changes[0].split(',')
+        self.assertEqual((new_disease, float(new_confidence)), ('Migraine', served['confidence']))
+
+
+def random_knowledge(seed, n_diseases=60, n_symptoms=40, weighted=False):
+    """A {disease: symptoms} map with many identical profiles (ties) and optional weights."""
+    rng = random.Random(seed)
+    symptoms = [f'symptom_{i}' for i in range(n_symptoms)]
+    disease_symptom_map = {}
+    for i in range(n_diseases):
+        if i and rng.random() < 0.2:
+            # Same profile as an earlier disease: ties must go to the first one
+            disease_symptom_map[f'Disease {i}'] = disease_symptom_map[f'Disease {rng.randrange(i)}']
+        else:
+            disease_symptom_map[f'Disease {i}'] = rng.sample(symptoms, rng.randint(1, 12))
+    # Binary fractions, so every engine sums the weights exactly
+    weights = {
+        name: {s: rng.choice((0.5, 1.5, 2.0)) for s in profile if rng.random() < 0.5}
+        for name, profile in disease_symptom_map.items()
+    } if weighted else None
+    queries = [frozenset(rng.sample(symptoms + ['unknown_a', 'unknown_b'], rng.randint(1, 8))) for _ in range(300)]
+    return disease_symptom_map, weights, queries
+
+
+class EngineParityTests(SimpleTestCase):
+    """Every compiled engine must return exactly what the original per-disease loop returns."""
+
+    def knowledge(self):
+        snapshot = builtin_snapshot()
+        rng = random.Random(0)
+        vocabulary = sorted(snapshot.symptoms)
+        builtin_queries = [frozenset(rng.sample(vocabulary, rng.randint(1, 6))) for _ in range(200)]
+        yield 'builtin', snapshot.disease_symptom_map, None, builtin_queries
+        yield 'random', *random_knowledge(1)
+        yield 'random weighted', *random_knowledge(2, weighted=True)
+
+    def engines(self, disease_symptom_map, weights, directory):
+        for name in available_engines():
+            if name not in ('loop', 'bayes'):
+                yield name, ENGINES[name](disease_symptom_map, weights)
+        if 'matrix' in available_engines():
+            path = os.path.join(directory, 'model.bin')
+            write_artifact(path, disease_symptom_map, weights)
+            yield 'artifact', MappedEngine(path)
+
+    def test_best_and_top_k_match_the_reference_loop(self):
+        for label, disease_symptom_map, weights, queries in self.knowledge():
+            reference = ReferenceEngine(disease_symptom_map, weights)
+            expected_best = [reference.best(q) for q in queries]
+            expected_top = [reference.top_k(q, 5) for q in queries]
+            with TemporaryDirectory() as directory:
+                for name, engine in self.engines(disease_symptom_map, weights, directory):
+                    with self.subTest(knowledge=label, engine=name):
+                        self.assertEqual([engine.best(q) for q in queries], expected_best)
+                        self.assertEqual([engine.top_k(q, 5) for q in queries], expected_top)
+                        self.assertEqual(engine.best_many(queries), expected_best)
+                        if hasattr(engine, 'top_k_many'):
+                            self.assertEqual(engine.top_k_many(queries, 5), expected_top)
+
+
+class MicroBatchingParityTests(SimpleTestCase):
+    def test_batched_scoring_matches_the_reference_loop(self):
+        disease_symptom_map, weights, queries = random_knowledge(3)
+        reference = ReferenceEngine(disease_symptom_map, weights)
+        model = DiseasePredictionModel(KnowledgeSnapshot(0, 'test', MappingProxyType(disease_symptom_map)))
+        self.addCleanup(reset_batcher)
+        with override_settings(PREDICTION_BATCH_WINDOW_MS=1, PREDICTION_ENGINE='index'):
+            reset_batcher()
+            for query in queries[:50]:
+                best = model.score(query)
+                self.assertEqual(best and best[0], reference.best(query))
+                ranked = model.score(query, 3)
+                self.assertEqual(
+                    [(d['disease_name'], d['confidence']) for d in ranked[1]] if ranked else [],
+                    [(name, round(min(99, score), 2)) for name, score, _ in reference.top_k(query, 3)],
+                )
+            # Every distinct (symptoms, top_k) pair missed the prediction cache and went through the batcher
+            self.assertEqual(batcher_stats()['requests'], 2 * len(set(queries[:50])))
+
+
+class KnowledgeChangeTests(TestCase):
+    """Edits to diseases, symptoms and their links reach the per-process caches without waiting for a TTL."""
+
+    def setUp(self):
+        reset_model()
+        disease_cache.invalidate()
+        recommendation_cache.invalidate()
+        self.flu = Disease.objects.create(name='Flu', description='', severity_level='low', specialist_required='GP')
+
+    def link(self, disease, *symptoms):
+        for name in symptoms:
+            symptom, _ = Symptom.objects.get_or_create(name=name, defaults={'description': ''})
+            DiseaseSymptom.objects.create(disease=disease, symptom=symptom)
+
+    def test_saved_disease_is_visible_to_the_disease_cache(self):
+        self.assertEqual(disease_cache.get('flu'), self.flu)
+        self.assertIsNone(disease_cache.get('Measles'))
+        measles = Disease.objects.create(name='Measles', description='', severity_level='high', specialist_required='GP')
+        self.assertEqual(disease_cache.get('measles'), measles)
+
+    def test_saved_recommendation_replaces_the_cached_bundle(self):
+        self.assertEqual(recommendation_cache.get(self.flu)['precautions'], [])
+        DiseasePrecaution.objects.create(disease=self.flu, precaution='Rest')
+        self.assertEqual(recommendation_cache.get(self.flu)['precautions'], ['Rest'])
+
+    def test_knowledge_change_rebuilds_the_model_with_an_empty_prediction_cache(self):
+        self.link(self.flu, 'Fever', 'Cough', 'Fatigue')
+        old_model = get_model()
+        self.assertEqual(old_model.predict(['fever', 'cough'])['disease'], self.flu)
+        self.assertEqual(old_model.cache.stats()['size'], 1)
+
+        cold = Disease.objects.create(name='Cold', description='', severity_level='low', specialist_required='GP')
+        version = current_version()
+        self.link(cold, 'Fever', 'Cough')
+        self.assertGreater(current_version(), version)
+
+        with mock.patch('prediction.registry.threading.Thread', SynchronousThread), \
+                mock.patch('prediction.registry.connections'):
+            # The request that notices the change is still served by the old model
+            self.assertIs(get_model(), old_model)
+        model = get_model()
+        self.assertIsNot(model, old_model)
+        self.assertEqual(model.knowledge_version, current_version())
+        self.assertEqual(model.cache.stats()['size'], 0)
+        self.assertEqual(model.predict(['fever', 'cough'])['disease'], cold)
+
+
+class KnowledgeRecordParsingTests(SimpleTestCase):
+    def records(self, text, fmt, record_type=None):
+        return list(iter_records(StringIO(text), fmt, record_type))
+
+    def test_detect_format_ignores_gzip_suffix(self):
+        self.assertEqual(detect_format('catalog.csv.gz'), 'csv')
+        self.assertEqual(detect_format('catalog.ndjson'), 'jsonl')
+        self.assertEqual(detect_format('catalog.json.gz'), 'json')
+
+    def test_json_array_is_read_element_by_element(self):
+        records = [{'type': 'symptom', 'name': f'symptom {i}', 'description': 'x' * i} for i in range(50)]
+        # A small chunk size makes records straddle the reads
+        self.assertEqual(list(iter_json(StringIO(json.dumps(records)), chunk_size=16)), records)
+
+    def test_json_file_of_objects_is_read_as_json_lines(self):
+        text = '{"type": "symptom", "name": "Fever"}\n\n{"type": "symptom", "name": "Cough"}\n'
+        self.assertEqual([r['name'] for r in self.records(text, 'json')], ['Fever', 'Cough'])
+
+    def test_malformed_input_names_the_problem(self):
+        with self.assertRaisesMessage(ValueError, 'Line 2'):
+            self.records('{"type": "symptom"}\n{"type": \n', 'jsonl')
+        with self.assertRaisesMessage(ValueError, 'Truncated or malformed JSON array.'):
+            self.records('[{"type": "symptom"}, {"type": ', 'json')
+
+    def test_csv_drops_empty_cells_and_fills_in_the_type(self):
+        text = 'name,description,weight\nFever,,\nCough,Dry cough,2\n'
+        self.assertEqual(self.records(text, 'csv', 'symptom'), [
+            {'name': 'Fever', 'type': 'symptom'},
+            {'name': 'Cough', 'description': 'Dry cough', 'weight': '2', 'type': 'symptom'},
+        ])
+
+
+class ImportKnowledgeCommandTests(TestCase):
+    RECORDS = [
+        {'type': 'disease', 'name': 'Flu', 'description': 'Influenza', 'severity_level': 'medium',
+         'specialist_required': 'GP'},
+        {'type': 'symptom', 'name': 'Fever', 'description': ''},
+        {'type': 'symptom', 'name': 'Cough', 'description': ''},
+        {'type': 'disease_symptom', 'disease': 'Flu', 'symptom': 'Fever', 'weight': 2},
+        {'type': 'disease_symptom', 'disease': 'Flu', 'symptom': 'Cough'},
+        {'type': 'precaution', 'disease': 'Flu', 'precaution': 'Rest', 'priority': 1},
+        {'type': 'disease_symptom', 'disease': 'Flu', 'symptom': 'Rash'},
+        {'type': 'disease_symptom', 'disease': 'Flu', 'symptom': 'Fever', 'weight': 'heavy'},
+        {'type': 'symptom', 'description': 'no name'},
+        {'type': 'allergy', 'name': 'Pollen'},
+        ['not', 'a', 'record'],
+    ]
+
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'catalog.jsonl')
+        with open(self.path, 'w', encoding='utf-8') as f:
+            f.writelines(json.dumps(record) + '\n' for record in self.RECORDS)
+
+    def run_import(self, *args):
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_knowledge', self.path, *args, stdout=stdout, stderr=stderr)
+        return stdout.getvalue(), stderr.getvalue()
+
+    def test_import_upserts_valid_records_and_reports_the_rest(self):
+        version = current_version()
+        stdout, stderr = self.run_import('--chunk-size', '2')
+        self.assertEqual(current_version(), version + 1)
+
+        self.assertEqual(dict(DiseaseSymptom.objects.values_list('symptom__name', 'weight')),
+                         {'Fever': 2.0, 'Cough': 1.0})
+        self.assertEqual(list(DiseasePrecaution.objects.values_list('precaution', flat=True)), ['Rest'])
+        self.assertIn('symptom: 2 created, 0 updated, 0 unchanged, 1 skipped', stdout)
+        self.assertIn('disease_symptom: 2 created, 0 updated, 0 unchanged, 2 skipped', stdout)
+        self.assertIn('Imported 11 record(s)', stdout)
+        for error in ("no symptom named 'Rash'", 'invalid disease_symptom record', 'symptom record without',
+                      "unknown record type 'allergy'", 'not a record: ["not", "a", "record"]'):
+            self.assertIn(error, stderr)
+
+    def test_records_that_are_not_objects_are_rejected(self):
+        with open(self.path, 'w', encoding='utf-8') as f:
+            json.dump([1, 'Fever', ['Cough'], {'name': 'Chills', 'description': ''}], f)
+        stdout, stderr = StringIO(), StringIO()
+        call_command('import_knowledge', self.path, '--format', 'json', '--type', 'symptom',
+                     stdout=stdout, stderr=stderr)
+        self.assertEqual(list(Symptom.objects.values_list('name', flat=True)), ['Chills'])
+        self.assertIn('symptom: 1 created', stdout.getvalue())
+        for error in ('not a record: 1', 'not a record: "Fever"', 'not a record: ["Cough"]'):
+            self.assertIn(error, stderr.getvalue())
+
+    def test_import_clears_the_process_caches(self):
+        Disease.objects.create(name='Flu', description='', severity_level='low', specialist_required='GP')
+        flu = disease_cache.get('flu')
+        self.assertEqual(recommendation_cache.get(flu)['precautions'], [])
+        self.run_import()
+        self.assertEqual(disease_cache.get('flu').description, 'Influenza')
+        self.assertEqual(recommendation_cache.get(flu)['precautions'], ['Rest'])
+
+    def test_reimport_changes_nothing(self):
+        self.run_import()
+        version = current_version()
+        stdout, _ = self.run_import()
+        self.assertEqual(current_version(), version)
+        self.assertIn('disease: 0 created, 0 updated, 1 unchanged, 0 skipped', stdout)
+
+    def test_export_round_trips(self):
+        self.run_import()
+        export_path = self.path.replace('.jsonl', '.out.jsonl.gz')
+        call_command('export_knowledge', export_path, stdout=StringIO())
+        with open_text(export_path) as fp:
+            exported = list(iter_records(fp, 'jsonl'))
+        self.assertEqual(len(exported), 6)
+        self.assertIn({'type': 'disease_symptom', 'disease': 'Flu', 'symptom': 'Fever', 'weight': 2.0}, exported)
+
+
+class ModelArtifactTests(TestCase):
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = os.path.join(directory.name, 'model.bin')
+        reset_model()
+        self.addCleanup(reset_model)
+
+    def write(self, version, disease_symptom_map=None):
+        write_artifact(self.path, disease_symptom_map or {'Decoy': frozenset({'fever', 'cough'})},
+                       knowledge_version=version)
+
+    def test_unusable_files_raise_artifact_error(self):
+        with self.assertRaisesMessage(ArtifactError, 'No artifact'):
+            MappedEngine(self.path)
+        for content in (b'', b'not an artifact at all', MAGIC + (FORMAT_VERSION + 1).to_bytes(4, 'little') * 2):
+            with open(self.path, 'wb') as f:
+                f.write(content)
+            with self.assertRaises(ArtifactError):
+                MappedEngine(self.path)
+        self.write(0)
+        with open(self.path, 'r+b') as f:
+            f.truncate(os.path.getsize(self.path) - 8)
+        with self.assertRaisesMessage(ArtifactError, 'Truncated artifact'):
+            MappedEngine(self.path)
+
+    def write_header(self, header):
+        header = json.dumps(header).encode('utf-8')
+        with open(self.path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<II', FORMAT_VERSION, len(header)) + header + b'\0' * 64)
+
+    def test_malformed_headers_raise_artifact_error(self):
+        self.write(0)
+        header = read_header(self.path)
+        missing_field = {k: v for k, v in header.items() if k != 'knowledge_version'}
+        missing_array = dict(header, arrays={k: v for k, v in header['arrays'].items() if k != 'indptr'})
+        for malformed in ([], {}, missing_field, missing_array, dict(header, arrays=[1, 2]),
+                          dict(header, arrays={'indptr': [0, 'not a dtype', 1]}),
+                          dict(header, arrays={'indptr': [-8, '<i8', 1]}),
+                          dict(header, knowledge_version='one')):
+            with self.subTest(header=malformed):
+                self.write_header(malformed)
+                with self.assertRaises(ArtifactError):
+                    MappedEngine(self.path)
+        with open(self.path, 'r+b') as f:
+            f.truncate(len(MAGIC) + 8 + 10)
+        with self.assertRaisesMessage(ArtifactError, 'Corrupt artifact header'):
+            MappedEngine(self.path)
+
+    def test_artifact_with_a_malformed_header_is_rewritten(self):
+        self.write_header({'arrays': {}, 'source': ''})
+        with override_settings(PREDICTION_MODEL_ARTIFACT=self.path):
+            model = get_model()
+        self.assertEqual(model.knowledge_version, current_version())
+        self.assertEqual(len(model.get_engine().diseases), len(builtin_snapshot().disease_symptom_map))
+
+    def test_stale_artifact_is_rewritten_from_current_knowledge(self):
+        self.write(current_version() - 1)
+        with override_settings(PREDICTION_MODEL_ARTIFACT=self.path):
+            model = get_model()
+        self.assertEqual(model.knowledge_version, current_version())
+        self.assertEqual(MappedEngine(self.path).knowledge_version, current_version())
+        self.assertNotIn('Decoy', model.get_engine().diseases)
+        self.assertEqual(len(model.get_engine().diseases), len(builtin_snapshot().disease_symptom_map))
+
+    def test_corrupt_artifact_is_rewritten(self):
+        with open(self.path, 'wb') as f:
+            f.write(b'garbage')
+        with override_settings(PREDICTION_MODEL_ARTIFACT=self.path):
+            model = get_model()
+        self.assertEqual(model.knowledge_version, current_version())
+
+    def test_current_artifact_is_mapped_as_is(self):
+        self.write(current_version())
+        with override_settings(PREDICTION_MODEL_ARTIFACT=self.path):
+            model = get_model()
+        self.assertEqual(list(model.get_engine().diseases), ['Decoy'])
+
+
+@override_settings(PREDICTION_AUTOCOMPLETE_LIMIT=3)
+class SymptomAutocompleteEndpointTests(PatientClientTestCase):
+    def setUp(self):
+        super().setUp()
+        symptom_autocomplete.invalidate()
+        for name in ('Chest pain', 'Chills', 'Back pain', 'Cheek swelling', 'Chest_tightness', 'Cough'):
+            Symptom.objects.create(name=name, description=f'{name} ' + 'word ' * 30)
+
+    def search(self, **params):
+        response = self.client.get(reverse('prediction:symptom_autocomplete'), params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def names(self, **params):
+        return [result['name'] for result in self.search(**params)['results']]
+
+    def test_names_starting_with_the_query_come_before_later_words(self):
+        self.assertEqual(self.names(q='ches'), ['Chest pain', 'Chest_tightness'])
+        self.assertEqual(self.names(q='PAIN'), ['Back pain', 'Chest pain'])
+        self.assertEqual(self.names(q='chest t'), ['Chest_tightness'])
+        self.assertEqual(self.names(q='tight'), ['Chest_tightness'])
+        self.assertEqual(self.names(q='fever'), [])
+
+    def test_limit_is_clamped_to_the_configured_maximum(self):
+        self.assertEqual(self.names(q='c', limit='2'), ['Cheek swelling', 'Chest pain'])
+        self.assertEqual(len(self.names(q='c', limit='50')), 3)
+        self.assertEqual(len(self.names(q='c', limit='0')), 1)
+        self.assertEqual(len(self.names(q='c', limit='many')), 3)
+
+    def test_descriptions_are_shortened(self):
+        data = self.search(q='cough', limit='1')
+        self.assertEqual(data['query'], 'cough')
+        self.assertEqual(len(data['results'][0]['description'].split()), 15)
+        self.assertTrue(data['results'][0]['description'].endswith('…'))
+
+    def test_saved_and_deleted_symptoms_show_up_immediately(self):
+        self.assertEqual(self.names(q='ch', limit='3'), ['Cheek swelling', 'Chest pain', 'Chest_tightness'])
+        loads = symptom_autocomplete.stats()['loads']
+        Symptom.objects.create(name='Chapped lips', description='')
+        Symptom.objects.filter(name='Cheek swelling').delete()
+        self.assertEqual(self.names(q='ch', limit='3'), ['Chapped lips', 'Chest pain', 'Chest_tightness'])
+        self.assertEqual(symptom_autocomplete.stats()['loads'], loads + 1)
+
+    def test_requires_login(self):
+        self.client.logout()
+        response = self.client.get(reverse('prediction:symptom_autocomplete'), {'q': 'ch'})
+        self.assertEqual(response.status_code, 302)
+
+
+def brute_force_information_gain(disease_symptom_map, present, absent, slip):
+    """Information gain in bits of each symptom, from explicit posteriors over every disease."""
+    profiles = [set(profile) for profile in disease_symptom_map.values()]
+
+    def likelihood(profile, symptom, answer):
+        listed = symptom in profile
+        return 1 - slip if listed == answer else slip
+
+    def entropy(weights):
+        total = sum(weights)
+        return -sum(w / total * math.log2(w / total) for w in weights if w)
+
+    prior = []
+    for profile in profiles:
+        weight = 1.0
+        for symptom in present:
+            weight *= likelihood(profile, symptom, True)
+        for symptom in absent:
+            weight *= likelihood(profile, symptom, False)
+        prior.append(weight)
+    total = sum(prior)
+    prior = [w / total for w in prior]
+
+    gains = {}
+    for symptom in set().union(*profiles) - set(present) - set(absent):
+        expected = 0.0
+        for answer in (True, False):
+            joint = [p * likelihood(profile, symptom, answer) for p, profile in zip(prior, profiles)]
+            expected += sum(joint) * entropy(joint)
+        gains[symptom] = entropy(prior) - expected
+    return gains
+
+
+class QuestionSelectorTests(SimpleTestCase):
+    def test_information_gain_matches_brute_force(self):
+        for seed in range(5):
+            disease_symptom_map, _, queries = random_knowledge(seed)
+            for slip in (0.05, 0.2):
+                selector = QuestionSelector(MatrixEngine(disease_symptom_map), slip)
+                for query in queries[:20]:
+                    present = sorted(query)[:4]
+                    absent = sorted(query)[4:]
+                    gain, _, _ = selector.information_gain(present, absent)
+                    expected = brute_force_information_gain(disease_symptom_map, present, absent, slip)
+                    for symptom, value in expected.items():
+                        self.assertAlmostEqual(gain[selector.engine.symptom_ids[symptom]], value, delta=1e-12)
+                    asked = [selector.engine.symptom_ids[s] for s in query if s in selector.engine.symptom_ids]
+                    self.assertTrue(all(gain[i] == float('-inf') for i in asked))
+
+    def test_suggestions_are_ranked_with_ties_in_name_order(self):
+        selector = QuestionSelector(MatrixEngine({'A': ['x', 'y'], 'B': ['x', 'z'], 'C': ['w']}))
+        questions = selector.suggest(['x'], limit=5)['questions']
+        self.assertEqual([q['symptom'] for q in questions], ['y', 'z', 'w'])
+        self.assertEqual(questions[0]['information_gain'], questions[1]['information_gain'])
+
+
+class NextQuestionEndpointTests(PatientClientTestCase):
+    def test_suggests_unasked_symptoms(self):
+        response = self.post_json('next_question', {'symptoms': ['Fever', 'cough'], 'absent': ['rash'], 'limit': 2})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertGreater(data['entropy'], 0)
+        self.assertEqual(len(data['questions']), 2)
+        for question in data['questions']:
+            self.assertNotIn(question['symptom'], ('fever', 'cough', 'rash'))
+            self.assertEqual(set(question), {'symptom', 'label', 'information_gain', 'p_yes'})
+        self.assertGreaterEqual(data['questions'][0]['information_gain'], data['questions'][1]['information_gain'])
+
+    def test_rejects_bad_payloads(self):
+        for body in ('not json', json.dumps({'symptoms': 'fever'}), json.dumps({'absent': None}),
+                     json.dumps({'limit': 0}), json.dumps({'limit': 11}), json.dumps({'limit': 'two'})):
+            with self.subTest(body=body):
+                response = self.client.post(reverse('prediction:next_question'), body,
+                                            content_type='application/json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_doctors_are_refused(self):
+        self.user.user_type = 'doctor'
+        self.user.save()
+        self.assertEqual(self.post_json('next_question', {'symptoms': ['fever']}).status_code, 403)
+
+
+class ModelRegistryTests(TestCase):
+    def setUp(self):
+        reset_model()
+        self.addCleanup(reset_model)
+
+    def test_model_is_built_once_and_shared(self):
+        model = warm_model()
+        self.assertIs(get_model(), model)
+        predict_disease(['fever', 'cough'])
+        predict_disease(['cough', 'fever'])
+        self.assertEqual(model.cache.stats()['hits'], 1)
+        reset_model()
+        self.assertIsNot(get_model(), model)
+
+    def test_concurrent_first_calls_build_one_model(self):
+        def slow_build():
+            time.sleep(0.05)
+            return object(), {}
+
+        with mock.patch('prediction.registry._build', side_effect=slow_build) as build:
+            with ThreadPoolExecutor(8) as pool:
+                models = list(pool.map(lambda _: get_model(), range(8)))
+        self.assertEqual(build.call_count, 1)
+        self.assertEqual(len({id(model) for model in models}), 1)
+
+    def test_stats_describe_the_built_model(self):
+        self.assertEqual(model_stats(), {})
+        model = get_model()
+        stats = model_stats()
+        self.assertEqual(stats['engine'], 'index')
+        self.assertEqual(stats['pid'], os.getpid())
+        self.assertEqual(stats['knowledge_version'], current_version())
+        self.assertEqual(stats['knowledge_source'], 'builtin')
+        self.assertEqual(stats['diseases'], len(builtin_snapshot().disease_symptom_map))
+        self.assertGreater(stats['memory_bytes'], 0)
+        self.assertLessEqual(stats['load_seconds'], stats['build_seconds'])
+        self.assertEqual(stats['prediction_cache'], model.cache.stats())
+
+    def test_unchanged_knowledge_version_keeps_the_model(self):
+        model = get_model()
+        mark_stale()
+        with mock.patch('prediction.registry.threading.Thread') as thread:
+            self.assertIs(get_model(), model)
+        thread.assert_not_called()
+        self.assertIsNot(refresh_model(), model)
+
+
+class FallbackCatalogTests(SimpleTestCase):
+    def test_lookups_ignore_case_and_surrounding_space(self):
+        disease = get_fallback_disease_info('  common COLD ')
+        self.assertEqual(disease.name, 'Common Cold')
+        self.assertEqual(disease.description, fallback_info()['Common Cold']['description'])
+        self.assertIs(get_fallback_disease_info('common cold'), disease)
+        for name in ('Measles', '', None, 42):
+            with self.subTest(name=name):
+                self.assertIsNone(get_fallback_disease_info(name))
+                self.assertIs(get_fallback_recommendations(name), EMPTY_RECOMMENDATIONS)
+
+    def test_payloads_are_prebuilt_and_immutable(self):
+        recommendations = get_fallback_recommendations('GERD')
+        self.assertIs(get_fallback_recommendations('gerd'), recommendations)
+        self.assertEqual(list(recommendations['precautions']), fallback_info()['GERD']['precautions'])
+        self.assertIsInstance(recommendations['diet']['recommended'], tuple)
+        self.assertIsInstance(recommendations['exercises'], tuple)
+        with self.assertRaises(FrozenInstanceError):
+            get_fallback_disease_info('GERD').name = 'Heartburn'
+
+
+class PredictionLRUTests(SimpleTestCase):
+    def test_counts_hits_misses_and_evictions(self):
+        cache = PredictionLRU(2)
+        self.assertIsNone(cache.get('a'))
+        cache.put('a', 1)
+        cache.put('b', None)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertIsNone(cache.get('b', 'missing'))
+        # 'b' was read after 'a', so 'a' is the least recently used
+        cache.put('c', 3)
+        self.assertEqual(cache.get('a', 'missing'), 'missing')
+        self.assertEqual(cache.get('b', 'missing'), None)
+        self.assertEqual(cache.stats(), {
+            'size': 2, 'maxsize': 2, 'hits': 3, 'misses': 2, 'hit_ratio': 0.6, 'evictions': 1,
+        })
+
+    def test_zero_size_disables_caching(self):
+        cache = PredictionLRU(0)
+        cache.put('a', 1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+@override_settings(PREDICTION_BATCH_WINDOW_MS=0)
+class PredictionMemoizationTests(SimpleTestCase):
+    def setUp(self):
+        self.model = DiseasePredictionModel(builtin_snapshot())
+
+    def test_equivalent_symptom_lists_share_one_entry(self):
+        first = self.model.score(['fever', 'cough', 'fatigue'])
+        with mock.patch.object(self.model, '_score') as score:
+            for symptoms in (['Cough', 'fatigue', 'FEVER'], ['cough', 'cough', 'fever', 'fatigue'],
+                             ['coughing', 'tired', 'fever']):
+                with self.subTest(symptoms=symptoms):
+                    self.assertIs(self.model.score(symptoms), first)
+        score.assert_not_called()
+        self.assertEqual(self.model.cache.stats()['size'], 1)
+
+    def test_top_k_and_no_match_results_are_cached_separately(self):
+        self.model.score(['fever', 'cough'])
+        self.model.score(['fever', 'cough'], top_k=3)
+        self.assertIsNone(self.model.score(['not_a_symptom']))
+        self.assertIsNone(self.model.score(['not_a_symptom']))
+        self.assertEqual(self.model.cache.stats()['size'], 3)
+        self.assertEqual(self.model.cache.stats()['hits'], 1)
+
+
+class KnowledgeSnapshotTests(TestCase):
+    def setUp(self):
+        reset_model()
+        self.addCleanup(reset_model)
+
+    def disease(self, name):
+        return Disease.objects.create(name=name, description='', severity_level='low', specialist_required='GP')
+
+    def symptom(self, name):
+        return Symptom.objects.create(name=name, description='')
+
+    def test_builtin_map_is_used_without_links(self):
+        snapshot = load_snapshot()
+        self.assertEqual(snapshot.source, 'builtin')
+        self.assertEqual(snapshot.version, current_version())
+        self.assertEqual(dict(snapshot.disease_symptom_map), dict(builtin_snapshot().disease_symptom_map))
+
+    def test_links_replace_the_builtin_map(self):
+        cold, flu = self.disease('Cold'), self.disease('Flu')
+        fever, chest_pain = self.symptom('Fever'), self.symptom('Chest Pain')
+        DiseaseSymptom.objects.create(disease=flu, symptom=fever, weight=2.0)
+        DiseaseSymptom.objects.create(disease=flu, symptom=chest_pain)
+        DiseaseSymptom.objects.create(disease=cold, symptom=fever)
+
+        snapshot = load_snapshot()
+        self.assertEqual(snapshot.source, 'database')
+        self.assertEqual(snapshot.version, current_version())
+        # In disease id order, with normalized symptom names and only the non-default weights
+        self.assertEqual(list(snapshot.disease_symptom_map.items()),
+                         [('Cold', ('fever',)), ('Flu', ('fever', 'chest_pain'))])
+        self.assertEqual({name: dict(w) for name, w in snapshot.weights.items()}, {'Flu': {'fever': 2.0}})
+        with self.assertRaises(TypeError):
+            snapshot.disease_symptom_map['Measles'] = ('rash',)
+        with self.assertRaises(FrozenInstanceError):
+            snapshot.version += 1
+
+    def test_knowledge_edits_bump_the_version_and_recommendations_do_not(self):
+        flu, fever = self.disease('Flu'), self.symptom('Fever')
+        version = current_version()
+        link = DiseaseSymptom.objects.create(disease=flu, symptom=fever)
+        link.delete()
+        fever.name = 'High fever'
+        fever.save()
+        self.assertEqual(current_version(), version + 3)
+        DiseasePrecaution.objects.create(disease=flu, precaution='Rest')
+        self.assertEqual(current_version(), version + 3)
+
+    def test_failed_background_rebuild_keeps_the_current_model(self):
+        model = get_model()
+        DiseaseSymptom.objects.create(disease=self.disease('Flu'), symptom=self.symptom('Fever'))
+        with mock.patch('prediction.registry.threading.Thread', SynchronousThread), \
+                mock.patch('prediction.registry.connections'), \
+                mock.patch('prediction.knowledge.load_snapshot', side_effect=RuntimeError('database gone')), \
+                self.assertLogs('prediction.registry', 'ERROR'):
+            get_model()
+        self.assertIs(get_model(), model)
+
+
+class LazyFallbackInfoTests(SimpleTestCase):
+    def test_catalog_is_not_loaded_on_import(self):
+        code = ('import django; django.setup(); import prediction.ml_model as m; import prediction.views; '
+                'print(m._fallback_info is None)')
+        # A fresh interpreter, with the settings module manage.py put in the environment
+        result = subprocess.run([sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True)
+        self.assertEqual(result.stdout.strip(), 'True', result.stderr)
+
+    def test_module_attribute_loads_the_catalog_once(self):
+        from . import ml_model
+
+        with mock.patch.object(ml_model, '_fallback_info', None), \
+                mock.patch('prediction.ml_model.open', wraps=open) as opened:
+            from .ml_model import DISEASE_FALLBACK_INFO
+            self.assertIs(ml_model.DISEASE_FALLBACK_INFO, DISEASE_FALLBACK_INFO)
+            self.assertIs(fallback_info(), DISEASE_FALLBACK_INFO)
+        opened.assert_called_once()
+        self.assertIn('Migraine', DISEASE_FALLBACK_INFO)
+        with self.assertRaises(TypeError):
+            DISEASE_FALLBACK_INFO['Measles'] = {}
+        with self.assertRaisesMessage(AttributeError, "has no attribute 'DISEASE_INFO'"):
+            ml_model.DISEASE_INFO
+
+
+class BitsetEngineTests(SimpleTestCase):
+    def test_count_masks_give_each_diseases_match_count(self):
+        disease_symptom_map, _, queries = random_knowledge(7, n_diseases=300, n_symptoms=3000)
+        engine = BitsetEngine(disease_symptom_map)
+        for query in queries[:50]:
+            counts = {}
+            for match_count, mask in engine.count_masks(query):
+                for disease_id in range(len(engine.diseases)):
+                    if mask >> disease_id & 1:
+                        counts[engine.diseases[disease_id]] = match_count
+            expected = {name: len(set(profile) & query) for name, profile in disease_symptom_map.items()}
+            self.assertEqual(counts, {name: n for name, n in expected.items() if n})
+
+    def test_matches_the_reference_on_a_large_catalog(self):
+        for weighted in (False, True):
+            disease_symptom_map, weights, _ = random_knowledge(11, n_diseases=500, n_symptoms=5000, weighted=weighted)
+            # Queries drawn from real profiles, so many diseases match two or more symptoms
+            rng = random.Random(11)
+            profiles = list(disease_symptom_map.values())
+            queries = [frozenset(rng.sample(rng.choice(profiles), 1) + rng.sample(rng.choice(profiles), 1)
+                                 + rng.sample(rng.choice(profiles), 1)) for _ in range(200)]
+            bitset, reference = BitsetEngine(disease_symptom_map, weights), ReferenceEngine(disease_symptom_map, weights)
+            with self.subTest(weighted=weighted):
+                for query in queries:
+                    self.assertEqual(bitset.best(query), reference.best(query))
+                    self.assertEqual(bitset.top_k(query, 5), reference.top_k(query, 5))
+
+    def test_available_without_numpy(self):
+        with mock.patch('prediction.engine.np', None):
+            self.assertIn('bitset', available_engines())
+            self.assertNotIn('matrix', available_engines())
+
+    @override_settings(PREDICTION_BATCH_WINDOW_MS=0)
+    def test_selected_by_the_engine_setting(self):
+        symptoms = ['fever', 'cough', 'fatigue']
+        with override_settings(PREDICTION_ENGINE='index'):
+            expected = DiseasePredictionModel(builtin_snapshot()).score(symptoms, top_k=3)
+        with override_settings(PREDICTION_ENGINE='bitset'):
+            model = DiseasePredictionModel(builtin_snapshot())
+            self.assertIsInstance(model.get_engine(), BitsetEngine)
+            self.assertEqual(model.score(symptoms, top_k=3), expected)
+
+
+class BenchmarkWorkloadTests(SimpleTestCase):
+    def test_workloads_are_reproducible(self):
+        catalog = synthetic_catalog(50, n_symptoms=300, symptoms_per_disease=12, seed=3)
+        self.assertEqual(catalog, synthetic_catalog(50, n_symptoms=300, symptoms_per_disease=12, seed=3))
+        self.assertNotEqual(catalog, synthetic_catalog(50, n_symptoms=300, symptoms_per_disease=12, seed=4))
+        self.assertEqual(len(catalog), 50)
+        self.assertTrue(all(profile and len(set(profile)) == len(profile) for profile in catalog.values()))
+
+        queries = synthetic_queries(catalog, 200, selected=(2, 4), seed=5)
+        self.assertEqual(queries, synthetic_queries(catalog, 200, selected=(2, 4), seed=5))
+        vocabulary = {s for profile in catalog.values() for s in profile}
+        for query in queries:
+            self.assertLessEqual(len(query), 5)
+            self.assertTrue(set(query) <= vocabulary)
+
+    def test_latency_stats_use_nearest_rank_percentiles(self):
+        stats = latency_stats([i * 1000 for i in range(1, 101)])
+        self.assertEqual(stats, {
+            'calls': 100, 'mean_us': 50.5, 'p50_us': 50.0, 'p95_us': 95.0, 'p99_us': 99.0, 'max_us': 100.0,
+            'throughput_per_s': 19802.0,
+        })
+        self.assertEqual(latency_stats([]), {'calls': 0})
+
+    def test_time_calls_warms_up_untimed(self):
+        calls, prepared = [], []
+        samples = time_calls(calls.append, [1, 2, 3], warmup=2, before=prepared.append)
+        self.assertEqual(calls, [1, 2, 1, 2, 3])
+        self.assertEqual(prepared, calls)
+        self.assertEqual(len(samples), 3)
+
+    def test_measure_allocations_reports_retained_memory(self):
+        kept = []
+        allocations = measure_allocations(lambda n: kept.append(bytearray(n)), [10000] * 10)
+        self.assertGreaterEqual(allocations['retained_bytes'], 100000)
+        self.assertGreaterEqual(allocations['peak_bytes'], allocations['retained_bytes'])
+
+    def test_engine_layer_reports_every_engine(self):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.json')
+            call_command('bench_prediction', '--layers', 'engines', '--diseases', '20', '--symptoms', '100',
+                         '--queries', '30', '--engines', 'index', 'bitset', '--json', path, stdout=StringIO())
+            with open(path, encoding='utf-8') as f:
+                results = json.load(f)
+        [catalog] = results['catalogs']
+        self.assertEqual((catalog['diseases'], catalog['queries']), (20, 30))
+        self.assertEqual(set(catalog['engines']), {'index', 'bitset'})
+        self.assertEqual(catalog['engines']['index']['calls'], 30)
+        self.assertIn('speedup_vs_loop', catalog['engines']['bitset'])
+
+
+class RecordingModel:
+    """Stands in for DiseasePredictionModel in batcher tests: records every _score_many call."""
+
+    def __init__(self, fail=False):
+        self.calls = []
+        self.fail = fail
+
+    def _score_many(self, symptom_sets, top_k):
+        self.calls.append((list(symptom_sets), top_k))
+        if self.fail:
+            raise ValueError('engine failed')
+        return [(sorted(symptoms), top_k) for symptoms in symptom_sets]
+
+
+class MicroBatcherTests(SimpleTestCase):
+    def test_requests_within_the_window_share_one_engine_call(self):
+        batcher = MicroBatcher(0.2, 64)
+        model = RecordingModel()
+        futures = [batcher.submit(model, frozenset({f's{i}'}), None) for i in range(10)]
+        self.assertEqual([f.result(timeout=5) for f in futures], [([f's{i}'], None) for i in range(10)])
+        self.assertEqual(len(model.calls), 1)
+        stats = batcher.stats()
+        self.assertEqual((stats['requests'], stats['batches'], stats['batch_sizes']), (10, 1, {10: 1}))
+        self.assertEqual(stats['queue_delay_us']['samples'], 10)
+
+    def test_batches_are_capped_and_split_by_model_and_top_k(self):
+        batcher = MicroBatcher(0.2, 4)
+        first, second = RecordingModel(), RecordingModel()
+        futures = [batcher.submit(first, frozenset({'a'}), None) for _ in range(5)]
+        futures += [batcher.submit(first, frozenset({'b'}), 3), batcher.submit(second, frozenset({'c'}), None)]
+        for future in futures:
+            future.result(timeout=5)
+        self.assertEqual(batcher.stats()['batch_sizes'], {3: 1, 4: 1})
+        self.assertEqual([len(sets) for sets, _ in first.calls], [4, 1, 1])
+        self.assertEqual(first.calls[2], ([frozenset({'b'})], 3))
+        self.assertEqual(len(second.calls), 1)
+
+    def test_engine_errors_reach_every_caller(self):
+        batcher = MicroBatcher(0.05, 64)
+        model = RecordingModel(fail=True)
+        with self.assertLogs('prediction.batching', 'ERROR'):
+            futures = [batcher.submit(model, frozenset({'a'}), None), batcher.submit(model, frozenset({'b'}), None)]
+            for future in futures:
+                with self.assertRaisesMessage(ValueError, 'engine failed'):
+                    future.result(timeout=5)
+        self.assertEqual(batcher.stats()['errors'], 1)
+
+    def test_batcher_follows_the_window_setting(self):
+        self.addCleanup(reset_batcher)
+        reset_batcher()
+        with override_settings(PREDICTION_BATCH_WINDOW_MS=0):
+            self.assertIsNone(get_batcher())
+            self.assertEqual(batcher_stats(), {})
+        with override_settings(PREDICTION_BATCH_WINDOW_MS=2, PREDICTION_BATCH_MAX_SIZE=8):
+            batcher = get_batcher()
+            self.assertIs(get_batcher(), batcher)
+            self.assertEqual((batcher.window, batcher.max_size), (0.002, 8))
+            reset_batcher()
+            self.assertIsNot(get_batcher(), batcher)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views
 
@@ -5,9 +6,19 @@ app_name = 'prediction'
 
 urlpatterns = [
     path('check-symptoms/', views.check_symptoms, name='check_symptoms'),
-    path('predict/', views.predict_disease_view, name='predict_disease'),
+    path('symptoms/autocomplete/', views.symptom_autocomplete_view, name='symptom_autocomplete'),
+    path('live/', views.live_scoring, name='live_scoring'),
+    path('next-question/', views.next_question, name='next_question'),
+    path(
+        'predict/',
+        views.predict_disease_async_view if getattr(settings, 'PREDICTION_ASYNC_VIEW', False)
+        else views.predict_disease_view,
+        name='predict_disease',
+    ),
+    path('predict/async/', views.predict_disease_async_view, name='predict_disease_async'),
     path('result/', views.disease_result, name='disease_result'),
     path('disease/<str:disease_name>/', views.disease_detail, name='disease_detail'),
     path('history/', views.prediction_history, name='prediction_history'),
     path('add-custom-symptom/', views.add_custom_symptom, name='add_custom_symptom'),
+    path('stats/', views.prediction_stats, name='prediction_stats'),
 ]
\ No newline at end of file
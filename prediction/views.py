@@ -2,20 +2,31 @@ from urllib.parse import unquote
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib import messages
+from django.conf import settings
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
+from asgiref.sync import sync_to_async
 import json
 
 from .models import Symptom, Disease, PredictionHistory
 from .ml_model import (
+    EMPTY_RECOMMENDATIONS,
+    apredict_disease,
+    aget_disease_recommendations,
     predict_disease,
     get_disease_recommendations,
     get_fallback_disease_info,
     get_fallback_recommendations,
 )
-from accounts.models import DoctorProfile
-from datetime import date
+from .cache import disease_cache, recommendation_cache
+from .autocomplete import symptom_autocomplete
+from .batching import batcher_stats
+from .extraction import symptom_extractor
+from .live import live_update
+from .registry import get_model, model_stats
+from accounts.models import DoctorProfile, PatientProfile
 
 
 @login_required
@@ -25,15 +36,141 @@ def check_symptoms(request):
         messages.error(request, 'Only patients can check symptoms.')
         return redirect('home')
 
-    symptoms = Symptom.objects.all()
-
+    # Symptoms are fetched by the page from symptom_autocomplete as the patient types
     return render(
         request,
         'prediction/check_symptoms.html',
-        {'symptoms': symptoms}
+        {
+            'symptom_count': symptom_autocomplete.count(),
+            'autocomplete_limit': getattr(settings, 'PREDICTION_AUTOCOMPLETE_LIMIT', 20),
+        }
+    )
+
+
+@login_required
+def symptom_autocomplete_view(request):
+    """Symptoms whose name (or a word of it) starts with ?q=, from the per-process prefix index."""
+    query = request.GET.get('q', '')[:100]
+    max_limit = getattr(settings, 'PREDICTION_AUTOCOMPLETE_LIMIT', 20)
+    try:
+        limit = min(max(int(request.GET.get('limit', max_limit)), 1), max_limit)
+    except ValueError:
+        limit = max_limit
+    return JsonResponse({
+        'query': query,
+        'results': [
+            {'name': name, 'description': description}
+            for name, description in symptom_autocomplete.search(query, limit)
+        ],
+    })
+
+
+# Longest free-text description ('text' field of a predict payload) that is scanned for symptoms
+MAX_SYMPTOM_TEXT_LENGTH = 10000
+
+
+def _text_symptoms(data):
+    """Symptom names found in the optional free-text 'text' field of a predict payload."""
+    text = data.get('text')
+    if not isinstance(text, str) or not text.strip():
+        return []
+    return [
+        symptom_extractor.label(name)
+        for name in symptom_extractor.extract(text[:MAX_SYMPTOM_TEXT_LENGTH])
+    ]
+
+
+def _parse_prediction_request(data, text_symptoms=()):
+    """
+    Validate a predict payload; text_symptoms (see _text_symptoms) are added to the selected ones.
+    Returns (symptoms, top_k, None), or (None, None, error JsonResponse).
+    """
+    selected_symptoms = data.get('symptoms', [])
+
+    # Normalize payload: support list of raw strings, objects like {value: 'x'},
+    # or accidentally-serialized DOM-like objects from older templates.
+    if not isinstance(selected_symptoms, list):
+        return None, None, JsonResponse({'error': 'Invalid symptoms payload'}, status=400)
+
+    cleaned_symptoms = []
+    for item in selected_symptoms:
+        # if client sent checkbox elements as objects, try common fields
+        if isinstance(item, dict):
+            # check common keys
+            val = item.get('value') or item.get('name') or item.get('text')
+            if val is None:
+                # fallback to string representation
+                val = str(item)
+            cleaned_symptoms.append(str(val))
+        else:
+            # ensure it's a string
+            cleaned_symptoms.append(str(item))
+
+    # Remove empty strings and duplicates
+    selected_symptoms = [s for s in map(lambda x: x.strip(), cleaned_symptoms) if s]
+    selected_keys = {s.casefold() for s in selected_symptoms}
+    selected_symptoms.extend(s for s in text_symptoms if s.casefold() not in selected_keys)
+
+    if not selected_symptoms:
+        return None, None, JsonResponse({'error': 'Please select at least one symptom'}, status=400)
+
+    # Optional differential diagnosis: number of ranked diseases to return
+    top_k = data.get('top_k')
+    if top_k is not None:
+        max_top_k = getattr(settings, 'PREDICTION_MAX_TOP_K', 10)
+        try:
+            top_k = int(top_k)
+        except (TypeError, ValueError):
+            top_k = 0
+        if not 1 <= top_k <= max_top_k:
+            return None, None, JsonResponse(
+                {'error': f'top_k must be a whole number between 1 and {max_top_k}'},
+                status=400
+            )
+    return selected_symptoms, top_k, None
+
+
+def _no_prediction_response():
+    return JsonResponse(
+        {'error': 'Could not predict disease. Please select at least two symptoms for a reliable prediction.'},
+        status=400
+    )
+
+
+def _prediction_history(patient_profile, selected_symptoms, prediction, disease_obj, patient_age):
+    """Unsaved PredictionHistory row for a prediction."""
+    return PredictionHistory(
+        patient=patient_profile,
+        symptoms=json.dumps(selected_symptoms),
+        predicted_disease=disease_obj,
+        disease_name=disease_obj.name if disease_obj else prediction.get('disease_name', ''),
+        confidence_score=prediction.get('confidence'),
+        differential=(
+            json.dumps(prediction['differential'])
+            if 'differential' in prediction else ''
+        ),
+        patient_age=patient_age
     )
 
 
+def _prediction_response(user, prediction, disease_obj, patient_age, recommendations):
+    response_data = {
+        'disease_name': (
+            disease_obj.name
+            if disease_obj else prediction.get('disease_name')
+        ),
+        'confidence': prediction.get('confidence'),
+        'severity': prediction.get('severity'),
+        'specialist': prediction.get('specialist'),
+        'patient_name': user.get_full_name(),
+        'patient_age': patient_age,
+        'recommendations': recommendations,
+    }
+    if 'differential' in prediction:
+        response_data['differential'] = prediction['differential']
+    return JsonResponse(response_data)
+
+
 @login_required
 @require_POST
 def predict_disease_view(request):
@@ -46,41 +183,15 @@ def predict_disease_view(request):
 
     try:
         data = json.loads(request.body)
-        selected_symptoms = data.get('symptoms', [])
-
-        # Normalize payload: support list of raw strings, objects like {value: 'x'},
-        # or accidentally-serialized DOM-like objects from older templates.
-        if not isinstance(selected_symptoms, list):
-            return JsonResponse({'error': 'Invalid symptoms payload'}, status=400)
-
-        cleaned_symptoms = []
-        for item in selected_symptoms:
-            # if client sent checkbox elements as objects, try common fields
-            if isinstance(item, dict):
-                # check common keys
-                val = item.get('value') or item.get('name') or item.get('text')
-                if val is None:
-                    # fallback to string representation
-                    val = str(item)
-                cleaned_symptoms.append(str(val))
-            else:
-                # ensure it's a string
-                cleaned_symptoms.append(str(item))
-
-        # Remove empty strings and duplicates
-        selected_symptoms = [s for s in map(lambda x: x.strip(), cleaned_symptoms) if s]
-
-        if not selected_symptoms:
-            return JsonResponse({'error': 'Please select at least one symptom'}, status=400)
+        selected_symptoms, top_k, error = _parse_prediction_request(data, _text_symptoms(data))
+        if error:
+            return error
 
         # Predict disease using ML model
-        prediction = predict_disease(selected_symptoms)
+        prediction = predict_disease(selected_symptoms, top_k=top_k)
 
         if not prediction:
-            return JsonResponse(
-                {'error': 'Could not predict disease. Please select at least two symptoms for a reliable prediction.'},
-                status=400
-            )
+            return _no_prediction_response()
 
         patient_profile = getattr(request.user, 'patient_profile', None)
 
@@ -89,73 +200,161 @@ def predict_disease_view(request):
             if isinstance(prediction.get('disease'), Disease)
             else None
         )
-        disease_name_str = (
-            disease_obj.name if disease_obj else prediction.get('disease_name', '')
-        )
+        patient_age = patient_profile.age if patient_profile else 0
 
         # Save prediction history if we can identify a patient profile.
         # Some users may have `user_type='patient'` but no PatientProfile object yet;
         # in that case skip saving to avoid a server error.
-        patient_age = 0
         if patient_profile:
-            try:
-                dob = getattr(patient_profile, 'date_of_birth', None)
-                today = date.today()
-                patient_age = (
-                    today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-                ) if dob else 0
-            except Exception:
-                patient_age = 0
-
-            PredictionHistory.objects.create(
-                patient=patient_profile,
-                symptoms=json.dumps(selected_symptoms),
-                predicted_disease=disease_obj,
-                disease_name=disease_name_str,
-                confidence_score=prediction.get('confidence'),
-                patient_age=patient_age
-            )
+            _prediction_history(patient_profile, selected_symptoms, prediction, disease_obj, patient_age).save()
 
         # Get recommendations - always return a structure, even if empty
         recommendations = (
             get_disease_recommendations(disease_obj)
-            if disease_obj else {
-                'precautions': [],
-                'diet': {'recommended': [], 'avoid': []},
-                'exercises': [],
-                'medicines': []
-            }
+            if disease_obj else EMPTY_RECOMMENDATIONS
         )
 
-        # Calculate patient age for response
-        try:
-            dob = patient_profile.date_of_birth
-            today = date.today()
-            patient_age = (
-                today.year - dob.year - ((today.month, today.day) < (dob.month, dob.day))
-            ) if dob else 0
-        except Exception:
-            patient_age = 0
-
-        response_data = {
-            'disease_name': (
-                disease_obj.name
-                if disease_obj else prediction.get('disease_name')
-            ),
-            'confidence': prediction.get('confidence'),
-            'severity': prediction.get('severity'),
-            'specialist': prediction.get('specialist'),
-            'patient_name': request.user.get_full_name(),
-            'patient_age': patient_age,
-            'recommendations': recommendations,
-        }
+        return _prediction_response(request.user, prediction, disease_obj, patient_age, recommendations)
+
+    except Exception as e:
+        return JsonResponse({'error': str(e)}, status=500)
+
 
-        return JsonResponse(response_data)
+@login_required
+@require_POST
+async def predict_disease_async_view(request):
+    """
+    predict_disease_view for ASGI deployments: the ORM work uses the async ORM and
+    scoring runs on a bounded thread pool, so a request holds no thread while it waits.
+    """
+    user = await request.auser()
+    if user.user_type != 'patient':
+        return JsonResponse(
+            {'error': 'Only patients can use this feature'},
+            status=403
+        )
+
+    try:
+        data = json.loads(request.body)
+        # The extractor loads the Symptom table on first use
+        text_symptoms = await sync_to_async(_text_symptoms)(data) if data.get('text') else ()
+        selected_symptoms, top_k, error = _parse_prediction_request(data, text_symptoms)
+        if error:
+            return error
+
+        prediction = await apredict_disease(selected_symptoms, top_k=top_k)
+
+        if not prediction:
+            return _no_prediction_response()
+
+        patient_profile = await PatientProfile.objects.filter(user=user).afirst()
+
+        disease_obj = (
+            prediction['disease']
+            if isinstance(prediction.get('disease'), Disease)
+            else None
+        )
+        patient_age = patient_profile.age if patient_profile else 0
+
+        if patient_profile:
+            await _prediction_history(
+                patient_profile, selected_symptoms, prediction, disease_obj, patient_age
+            ).asave()
+
+        recommendations = (
+            await aget_disease_recommendations(disease_obj)
+            if disease_obj else EMPTY_RECOMMENDATIONS
+        )
+
+        return _prediction_response(user, prediction, disease_obj, patient_age, recommendations)
 
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
+@login_required
+@require_POST
+def live_scoring(request):
+    """
+    Apply symptom toggles ({'add': [...], 'remove': [...]}, optionally 'reset': true to start
+    over from 'add') to the session's live state and return the current top candidates.
+    """
+    if request.user.user_type != 'patient':
+        return JsonResponse(
+            {'error': 'Only patients can use this feature'},
+            status=403
+        )
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON payload'}, status=400)
+    add, remove = data.get('add', []), data.get('remove', [])
+    if not isinstance(add, list) or not isinstance(remove, list):
+        return JsonResponse({'error': 'add and remove must be lists of symptoms'}, status=400)
+
+    max_top_k = getattr(settings, 'PREDICTION_MAX_TOP_K', 10)
+    try:
+        top_k = int(data.get('top_k', getattr(settings, 'PREDICTION_LIVE_TOP_K', 5)))
+    except (TypeError, ValueError):
+        top_k = 0
+    if not 1 <= top_k <= max_top_k:
+        return JsonResponse({'error': f'top_k must be a whole number between 1 and {max_top_k}'}, status=400)
+
+    if request.session.session_key is None:
+        request.session.save()
+    return JsonResponse(live_update(
+        request.session.session_key,
+        add=[str(s).strip() for s in add if str(s).strip()],
+        remove=[str(s).strip() for s in remove if str(s).strip()],
+        reset=bool(data.get('reset')),
+        top_k=top_k,
+    ))
+
+
+@login_required
+@require_POST
+def next_question(request):
+    """
+    Suggest the symptoms to ask about next: those whose answer is expected to narrow the
+    candidate diseases most, given {'symptoms': [...confirmed], 'absent': [...denied]}.
+    """
+    if request.user.user_type != 'patient':
+        return JsonResponse(
+            {'error': 'Only patients can use this feature'},
+            status=403
+        )
+
+    try:
+        data = json.loads(request.body)
+    except ValueError:
+        return JsonResponse({'error': 'Invalid JSON payload'}, status=400)
+    present, absent = data.get('symptoms', []), data.get('absent', [])
+    if not isinstance(present, list) or not isinstance(absent, list):
+        return JsonResponse({'error': 'symptoms and absent must be lists of symptoms'}, status=400)
+    try:
+        limit = int(data.get('limit', 3))
+    except (TypeError, ValueError):
+        limit = 0
+    if not 1 <= limit <= 10:
+        return JsonResponse({'error': 'limit must be a whole number between 1 and 10'}, status=400)
+
+    model = get_model()
+    try:
+        selector = model.question_selector
+    except ImportError:
+        return JsonResponse({'error': 'Question suggestions are not available on this server'}, status=503)
+    canonicalize = model.canonicalizer.canonicalize_all
+    suggestion = selector.suggest(
+        canonicalize(str(s) for s in present),
+        canonicalize(str(s) for s in absent),
+        limit,
+    )
+    for question in suggestion['questions']:
+        question['label'] = symptom_extractor.label(question['symptom'])
+    return JsonResponse(suggestion)
+
+
 @login_required
 def disease_result(request):
     """Show disease prediction result with recommendations"""
@@ -213,7 +412,7 @@ def disease_detail(request, disease_name):
         messages.error(request, 'Disease name is missing.')
         return redirect('prediction:check_symptoms')
 
-    disease = Disease.objects.filter(name__iexact=name).first()
+    disease = disease_cache.get(name)
 
     if disease:
         recommendations = get_disease_recommendations(disease)
@@ -339,4 +538,17 @@ def add_custom_symptom(request):
         return JsonResponse(
             {'success': False, 'message': str(e)},
             status=500
-        )
\ No newline at end of file
+        )
+
+
+@staff_member_required
+def prediction_stats(request):
+    """Per-process prediction model and cache stats for staff."""
+    return JsonResponse({
+        'model': model_stats(),
+        'disease_cache': disease_cache.stats(),
+        'recommendation_cache': recommendation_cache.stats(),
+        'batching': batcher_stats(),
+        'symptom_autocomplete': symptom_autocomplete.stats(),
+        'symptom_extractor': symptom_extractor.stats(),
+    })